@@ -0,0 +1,58 @@
+"""
+Compare per-row date parsing time for city_scrapers.dates against dateutil on the
+date strings in the spider test fixtures.
+
+    python -m benchmarks.bench_dates
+"""
+
+import json
+import re
+import timeit
+from os.path import dirname, join
+
+from dateutil.parser import parse
+
+from city_scrapers.dates import clear_cache, parse_datetime
+
+FILES_DIR = join(dirname(dirname(__file__)), "tests", "files")
+REPEAT = 5
+
+
+def fixture_strings():
+    """Return the date strings each spider parses, keyed by source"""
+    with open(join(FILES_DIR, "cinoh_city_council.json")) as f:
+        legistar = [row["Meeting Date"] for row in json.load(f)]
+    with open(join(FILES_DIR, "cinoh_Civil_Service.json")) as f:
+        boarddocs = [row["numberdate"] for row in json.load(f) if row.get("numberdate")]
+    with open(join(FILES_DIR, "cinoh_Hamilton_Commission.html")) as f:
+        cells = re.findall(r'data-sortable-type="mtgTime"[^>]*>([^<]*)<', f.read())
+    onbase = [cell for cell in cells if cell.strip()]
+    return {"legistar": legistar, "boarddocs": boarddocs, "onbase": onbase}
+
+
+def per_row_us(func, strings):
+    """Best time per string in microseconds over REPEAT runs"""
+    timer = timeit.Timer(lambda: [func(text) for text in strings])
+    return min(timer.repeat(REPEAT, number=1)) / len(strings) * 1e6
+
+
+def cold_parse_datetime(text):
+    clear_cache()
+    return parse_datetime(text, fuzzy=True)
+
+
+def main():
+    print(f"{'source':<10} {'rows':>5} {'dateutil':>10} {'cold':>8} {'cached':>8}")
+    for source, strings in fixture_strings().items():
+        baseline = per_row_us(lambda text: parse(text, fuzzy=True), strings)
+        cold = per_row_us(cold_parse_datetime, strings)
+        clear_cache()
+        cached = per_row_us(lambda text: parse_datetime(text, fuzzy=True), strings)
+        print(
+            f"{source:<10} {len(strings):>5} {baseline:>8.1f}us {cold:>6.1f}us "
+            f"{cached:>6.1f}us  ({baseline / cold:.0f}x / {baseline / cached:.0f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Export time, end-of-crawl flush time, output size and peak traced memory for
+jsonlines feeds staged to a temporary file and copied at the end (as the Azure
+feed storage from city_scrapers_core does) vs. streamed with FileChunkedFeedStorage,
+uncompressed and gzipped.
+
+    python -m benchmarks.bench_feeds [meetings]
+"""
+
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from scrapy.exporters import JsonLinesItemExporter
+from scrapy.extensions.postprocessing import PostProcessingManager
+
+from city_scrapers.feeds import FileChunkedFeedStorage
+from city_scrapers.spiders.cinoh_city_council import CinohCityCouncilSpider
+
+from .generators import legistar_rows
+
+GZIP = {
+    "postprocessing": ["scrapy.extensions.postprocessing.GzipPlugin"],
+    "gzip_compresslevel": 6,
+}
+
+
+class StagedWriter:
+    """Writes to a temporary file and copies it to the destination when finished"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = tempfile.TemporaryFile()
+
+    def write(self, data):
+        return self.file.write(data)
+
+    def finish(self):
+        self.file.seek(0)
+        with open(self.path, "wb") as f:
+            shutil.copyfileobj(self.file, f)
+        self.file.close()
+
+
+def chunked_writer(path):
+    return FileChunkedFeedStorage(path.as_uri()).open(None)
+
+
+def export(items, writer, feed_options):
+    """Return export and finish seconds"""
+    file = writer
+    if feed_options:
+        file = PostProcessingManager(
+            feed_options["postprocessing"], writer, feed_options
+        )
+    start = time.perf_counter()
+    exporter = JsonLinesItemExporter(file)
+    exporter.start_exporting()
+    for item in items:
+        exporter.export_item(item)
+    exporter.finish_exporting()
+    if feed_options:
+        file.close()
+    exported = time.perf_counter()
+    writer.finish()
+    return exported - start, time.perf_counter() - exported
+
+
+def main(count):
+    spider = CinohCityCouncilSpider()
+    items = list(spider.parse_legistar(legistar_rows(count)))
+    print(f"{count} meetings")
+    print(
+        f"{'storage':<16} {'export s':>9} {'finish s':>9} {'bytes':>11} {'peak KiB':>9}"
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, make_writer, feed_options in [
+            ("staged", StagedWriter, None),
+            ("chunked", chunked_writer, None),
+            ("staged gzip", StagedWriter, GZIP),
+            ("chunked gzip", chunked_writer, GZIP),
+        ]:
+            path = Path(tmp_dir) / f"{name.replace(' ', '_')}.json"
+            tracemalloc.start()
+            export_s, finish_s = export(items, make_writer(path), feed_options)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(
+                f"{name:<16} {export_s:>9.3f} {finish_s:>9.3f} "
+                f"{path.stat().st_size:>11,} {peak / 1024:>9,.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
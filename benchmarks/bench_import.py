@@ -0,0 +1,60 @@
+"""
+Compare startup time for scrapy commands with ManifestSpiderLoader against Scrapy's
+SpiderLoader, which imports every spider module. Each command runs in a new process
+and the best wall time of a few runs is reported, along with the time to import
+scrapy alone.
+
+    python -m benchmarks.bench_import
+"""
+
+import os
+import subprocess
+import sys
+import time
+from os.path import dirname
+
+ROOT = dirname(dirname(__file__))
+REPEAT = 10
+
+COMMANDS = {
+    "import scrapy": [sys.executable, "-c", "import scrapy"],
+    "scrapy list": [sys.executable, "-m", "scrapy", "list"],
+    "scrapy settings": [
+        sys.executable,
+        "-m",
+        "scrapy",
+        "settings",
+        "--get",
+        "BOT_NAME",
+    ],
+}
+LOADERS = {
+    "manifest": [],
+    "import all": ["-s", "SPIDER_LOADER_CLASS=scrapy.spiderloader.SpiderLoader"],
+}
+
+
+def best_ms(args):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        subprocess.run(args, cwd=ROOT, env=env, check=True, capture_output=True)
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    print(f"{'command':<16} {'manifest':>10} {'import all':>11}")
+    for name, args in COMMANDS.items():
+        if name == "import scrapy":
+            print(f"{name:<16} {best_ms(args):>8.0f}ms")
+            continue
+        manifest, import_all = (
+            best_ms(args + loader_args) for loader_args in LOADERS.values()
+        )
+        print(f"{name:<16} {manifest:>8.0f}ms {import_all:>9.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
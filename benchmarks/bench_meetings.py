@@ -0,0 +1,96 @@
+"""
+Memory held by synthetic meetings kept as Meeting items and as CompactMeetings,
+measured as the traced allocation after building them, and the time it takes to
+build them and to hash them like the incremental and diff pipelines do.
+
+    python -m benchmarks.bench_meetings [count ...]
+"""
+
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from city_scrapers_core.constants import CITY_COUNCIL, COMMITTEE, PASSED, TENTATIVE
+from city_scrapers_core.items import Meeting
+
+from city_scrapers.items import CompactMeeting
+from city_scrapers.store import meeting_hash
+
+LOCATIONS = [
+    "Council Chambers, Room 300",
+    "Room 115, City Hall",
+    "Virtual Meeting",
+]
+LINKS = ["Meeting Details", "Agenda", "Minutes", "Video"]
+SOURCE = "https://cincinnatioh.legistar.com/Calendar.aspx"
+
+
+def meetings(item_class, count):
+    """Build meetings like the city council spider does, one every few hours"""
+    now = datetime.now()
+    start = now - timedelta(hours=4 * count // 2)
+    for i in range(count):
+        meeting_start = start + timedelta(hours=4 * i)
+        meeting = item_class(
+            title="Cincinnati City Council" if i % 5 == 0 else f"Committee {i % 40}",
+            description="",
+            classification=CITY_COUNCIL if i % 5 == 0 else COMMITTEE,
+            start=meeting_start,
+            end=None,
+            all_day=False,
+            time_notes="",
+            status=PASSED if meeting_start < now else TENTATIVE,
+            location={
+                "address": "801 Plum St. Cincinnati, OH 45202",
+                "name": LOCATIONS[i % len(LOCATIONS)],
+            },
+            links=[
+                {
+                    "title": title,
+                    "href": f"https://cincinnatioh.legistar.com/View.ashx?M={title[0]}"
+                    f"&ID={i}",
+                }
+                for title in LINKS[: 1 + i % len(LINKS)]
+            ],
+            source=SOURCE,
+        )
+        meeting["id"] = f"cinoh_city_council/{meeting_start:%Y%m%d%H%M}/x/{i}"
+        yield meeting
+
+
+def measure(item_class, count):
+    # timed separately, since tracing slows down every allocation
+    start = time.perf_counter()
+    kept = list(meetings(item_class, count))
+    build_sec = time.perf_counter() - start
+    del kept
+
+    tracemalloc.start()
+    kept = list(meetings(item_class, count))
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for item in kept:
+        meeting_hash(item)
+    hash_sec = time.perf_counter() - start
+    return held, build_sec, hash_sec
+
+
+def main(counts):
+    print(
+        f"{'meetings':>9} {'item':<14} {'MB held':>8} {'bytes each':>10} "
+        f"{'build s':>8} {'hash s':>7}"
+    )
+    for count in counts:
+        for item_class in (Meeting, CompactMeeting):
+            held, build_sec, hash_sec = measure(item_class, count)
+            print(
+                f"{count:>9,} {item_class.__name__:<14} {held / 1024 ** 2:>8.1f} "
+                f"{held / count:>10,.0f} {build_sec:>8.2f} {hash_sec:>7.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [100_000])
@@ -0,0 +1,61 @@
+"""
+Rows/sec for extracting OnBase meeting rows with per-row CSS queries (the previous
+approach), the compiled single-pass extractor, and incremental parsing, on scaled
+copies of tests/files/cinoh_Hamilton_Commission.html.
+
+    python -m benchmarks.bench_onbase [rows ...]
+"""
+
+import sys
+import time
+
+from scrapy.http import HtmlResponse
+
+from city_scrapers.spiders.cinoh_Hamilton_Commission import (
+    iter_rows,
+    iter_rows_incremental,
+)
+
+from .generators import onbase_html
+
+URL = "https://hcjfsonbase.jfs.hamilton-co.org/OnBaseAgendaOnline"
+
+
+def css_rows(response):
+    for item in response.css(".meeting-row"):
+        yield (
+            item.css(".visible-xs::text").get(),
+            item.css("td::text")[2].get(),
+            item.css("::attr(href)").get(),
+        )
+
+
+def compiled_rows(response):
+    return iter_rows(response.selector.root)
+
+
+def incremental_rows(response):
+    return iter_rows_incremental(response.body)
+
+
+def rows_per_sec(extract, body):
+    # A new response each time so document parsing is included in the timing
+    response = HtmlResponse(URL, body=body, encoding="utf-8")
+    start = time.perf_counter()
+    count = sum(1 for _ in extract(response))
+    return count / (time.perf_counter() - start)
+
+
+def main(sizes):
+    print(f"{'rows':>8} {'css':>10} {'compiled':>10} {'incremental':>12}")
+    for rows in sizes:
+        body = onbase_html(rows)
+        css, compiled, incremental = (
+            rows_per_sec(extract, body)
+            for extract in (css_rows, compiled_rows, incremental_rows)
+        )
+        print(f"{rows:>8} {css:>10,.0f} {compiled:>10,.0f} {incremental:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [100, 1_000, 10_000])
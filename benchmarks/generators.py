@@ -0,0 +1,72 @@
+"""
+Synthetic versions of the spider fixtures in tests/files scaled to any number of
+records. Dates are relative to today so every record falls inside the window the
+spiders keep.
+"""
+
+import json
+import re
+from datetime import datetime, timedelta
+from itertools import cycle, islice
+from os.path import dirname, join
+
+FILES_DIR = join(dirname(dirname(__file__)), "tests", "files")
+ONBASE_ROW_RE = re.compile(
+    r'<tr id="meeting-\d+-row" class="meeting-row".*?</tr>', re.S
+)
+
+
+def _load_json(name):
+    with open(join(FILES_DIR, name)) as f:
+        return json.load(f)
+
+
+def _dates(count, days, end=None):
+    """Spread count datetimes evenly over the given number of days, newest first"""
+    end = end or datetime.now() + timedelta(days=days // 2)
+    step = timedelta(days=days) / max(count, 1)
+    return (end - step * i for i in range(count))
+
+
+def legistar_rows(count, days=730):
+    """Legistar calendar rows in the shape passed to parse_legistar"""
+    templates = _load_json("cinoh_city_council.json")
+    rows = []
+    for i, (template, start) in enumerate(zip(cycle(templates), _dates(count, days))):
+        row = dict(template)
+        row["Meeting Date"] = start.strftime("%m/%d/%Y")
+        row["Meeting Time"] = start.strftime("%I:%M %p").lstrip("0")
+        row["iCalendar"] = {"url": f"{template['iCalendar']['url']}&row={i}"}
+        rows.append(row)
+    return rows
+
+
+def boarddocs_meetings(count, days=150):
+    """BoardDocs BD-GetMeetingsList JSON body with every meeting in the last
+    six months"""
+    templates = [
+        row for row in _load_json("cinoh_Civil_Service.json") if row.get("numberdate")
+    ]
+    end = datetime.now()
+    rows = []
+    for i, (template, start) in enumerate(
+        zip(cycle(templates), _dates(count, days, end=end))
+    ):
+        row = dict(template)
+        row["numberdate"] = start.strftime("%Y%m%d")
+        row["unique"] = f"{template['unique'][:6]}{i:06d}"
+        rows.append(row)
+    return json.dumps(rows).encode()
+
+
+def onbase_html(count):
+    """OnBase Agenda Online page with the fixture's meeting rows repeated"""
+    with open(join(FILES_DIR, "cinoh_Hamilton_Commission.html")) as f:
+        html = f.read()
+    matches = list(ONBASE_ROW_RE.finditer(html))
+    rows = [match.group(0) for match in matches]
+    return (
+        html[: matches[0].start()]
+        + "\n".join(islice(cycle(rows), count))
+        + html[matches[-1].end() :]
+    ).encode()
@@ -0,0 +1,185 @@
+"""
+Offline parse benchmarks for each spider, driven by scaled synthetic versions of the
+test fixtures and including the status and ID stage. Each benchmark runs in its own
+process and reports items/sec, peak RSS and peak traced allocation per item (with
+the parsed items kept in memory), and the run fails if any of them regress past the
+threshold compared to benchmarks/baseline.json.
+
+    python -m benchmarks.run                  # compare against the baseline
+    python -m benchmarks.run --size 1000000   # scale up (baseline is per size)
+    python -m benchmarks.run --update-baseline
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from os.path import dirname, join
+
+from scrapy.http import HtmlResponse, TextResponse
+
+from city_scrapers.spiders.cinoh_city_council import CinohCityCouncilSpider
+from city_scrapers.spiders.cinoh_Civil_Service import CinohCivilServiceSpider
+from city_scrapers.spiders.cinoh_Hamilton_Commission import (
+    CinohHamiltonCommissionSpider,
+)
+from city_scrapers.status import set_status_and_ids
+
+from .generators import boarddocs_meetings, legistar_rows, onbase_html
+
+BASELINE_PATH = join(dirname(__file__), "baseline.json")
+DEFAULT_SIZE = 10_000
+DEFAULT_THRESHOLD = 0.25
+
+
+def city_council(size):
+    rows = legistar_rows(size)
+    spider = CinohCityCouncilSpider()
+    return lambda: set_status_and_ids(spider, spider.parse_legistar(rows))
+
+
+def civil_service(size):
+    body = boarddocs_meetings(size)
+    spider = CinohCivilServiceSpider()
+    url = "https://go.boarddocs.com/oh/csc/Board.nsf/BD-GetMeetingsList"
+    return lambda: set_status_and_ids(
+        spider, spider.parse(TextResponse(url, body=body, encoding="utf-8"))
+    )
+
+
+def hamilton_commission(size):
+    body = onbase_html(size)
+    spider = CinohHamiltonCommissionSpider()
+    url = spider.start_urls[0]
+    return lambda: set_status_and_ids(
+        spider, spider.parse(HtmlResponse(url, body=body, encoding="utf-8"))
+    )
+
+
+BENCHMARKS = {
+    "cinoh_city_council": city_council,
+    "cinoh_Civil_Service": civil_service,
+    "cinoh_Hamilton_Commission": hamilton_commission,
+}
+
+# metric name and whether higher values are better
+METRICS = {
+    "items_per_sec": True,
+    "peak_rss_mb": False,
+    "alloc_bytes_per_item": False,
+}
+
+
+def measure(name, size):
+    """Run one benchmark in the current process and return its metrics"""
+    run = BENCHMARKS[name](size)
+
+    start = time.perf_counter()
+    items = sum(1 for _ in run())
+    elapsed = time.perf_counter() - start
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    # items are kept so the allocation includes what each one holds on to
+    tracemalloc.start()
+    kept = list(run())
+    _, peak_traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+
+    return {
+        "items": items,
+        "items_per_sec": round(items / elapsed),
+        "peak_rss_mb": round(peak_rss_mb, 1),
+        "alloc_bytes_per_item": round(peak_traced / max(items, 1)),
+    }
+
+
+def measure_in_subprocess(name, size):
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.run", "--child", name, "--size", str(size)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def regressions(results, baseline, threshold):
+    """List metrics that are worse than the baseline by more than the threshold"""
+    failures = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            change = (result[metric] - expected[metric]) / expected[metric]
+            if (-change if higher_is_better else change) > threshold:
+                failures.append(
+                    f"{name} {metric}: {result[metric]} vs. baseline "
+                    f"{expected[metric]} ({change:+.0%})"
+                )
+    return failures
+
+
+def load_baseline(size):
+    try:
+        with open(BASELINE_PATH) as f:
+            return json.load(f).get(str(size), {})
+    except FileNotFoundError:
+        return {}
+
+
+def update_baseline(size, results):
+    try:
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = {}
+    baseline[str(size)] = results
+    with open(BASELINE_PATH, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", type=int, default=DEFAULT_SIZE)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--child", choices=BENCHMARKS, help=argparse.SUPPRESS)
+    parser.add_argument("benchmarks", nargs="*", choices=[[], *BENCHMARKS])
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.size)))
+        return 0
+
+    results = {}
+    print(f"{'spider':<26} {'items':>8} {'items/sec':>10} {'RSS MB':>8} {'B/item':>8}")
+    for name in args.benchmarks or BENCHMARKS:
+        result = results[name] = measure_in_subprocess(name, args.size)
+        print(
+            f"{name:<26} {result['items']:>8} {result['items_per_sec']:>10,} "
+            f"{result['peak_rss_mb']:>8} {result['alloc_bytes_per_item']:>8,}"
+        )
+
+    if args.update_baseline:
+        update_baseline(args.size, results)
+        print(f"Baseline for size {args.size} written to {BASELINE_PATH}")
+        return 0
+
+    baseline = load_baseline(args.size)
+    if not baseline:
+        print(f"No baseline for size {args.size}, run with --update-baseline")
+        return 0
+    failures = regressions(results, baseline, args.threshold)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
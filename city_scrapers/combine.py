@@ -0,0 +1,145 @@
+"""
+Helpers for combining per-spider feeds into the latest and upcoming feeds.
+
+Each spider's feed is sorted once into a "run" file of ``<start>\\t<meeting JSON>``
+lines kept in the state directory. Runs are merged with a heap, so combining only
+ever holds one meeting per spider in memory, and a spider's run is reused as long
+as its feed is unchanged.
+"""
+
+import heapq
+import json
+import os
+import zlib
+from hashlib import sha1
+from pathlib import Path
+
+from city_scrapers.store import state_path
+
+# Combined outputs, all written in the same pass over the merged meetings
+LATEST_JSONLINES = "latest.json"
+LATEST_ARRAY = "latest.array.json"
+UPCOMING_JSONLINES = "upcoming.json"
+
+
+def iter_lines(chunks, gzipped=False):
+    """Yield decoded lines from an iterable of byte chunks, optionally gzipped"""
+    decompressor = zlib.decompressobj(wbits=31) if gzipped else None
+    remainder = b""
+    for chunk in chunks:
+        if decompressor is not None:
+            chunk = decompressor.decompress(chunk)
+        lines = (remainder + chunk).split(b"\n")
+        remainder = lines.pop()
+        for line in lines:
+            yield line.decode("utf-8")
+    if decompressor is not None:
+        remainder += decompressor.flush()
+    if remainder:
+        yield remainder.decode("utf-8")
+
+
+def iter_file_chunks(path, chunk_size=1024 * 1024):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def file_hash(path):
+    digest = sha1()
+    for chunk in iter_file_chunks(path):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class RunCache:
+    """
+    Sorted runs of each spider's latest feed in the state directory, with a manifest
+    of the feed name and content hash (or storage version) each run was built from.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.directory / "manifest.json"
+        self.manifest = {}
+        if self.manifest_path.exists():
+            self.manifest = json.loads(self.manifest_path.read_text())
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(state_path(settings, "combine"))
+
+    def run_path(self, spider_name):
+        return self.directory / f"{spider_name}.run"
+
+    def is_current(self, spider_name, feed_name, feed_hash):
+        expected = {"feed": feed_name, "hash": feed_hash}
+        return (
+            self.manifest.get(spider_name) == expected
+            and self.run_path(spider_name).exists()
+        )
+
+    def build(self, spider_name, feed_name, feed_hash, lines, start_key):
+        """Sort a spider's feed lines by start into its run file"""
+        rows = []
+        for line in lines:
+            if line.strip():
+                meeting = json.loads(line)
+                rows.append((meeting[start_key], line.strip()))
+        rows.sort(key=lambda row: row[0])
+        run_path = self.run_path(spider_name)
+        tmp_path = run_path.with_name(f"{run_path.name}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for start, line in rows:
+                f.write(f"{start}\t{line}\n")
+        os.replace(tmp_path, run_path)
+        self.manifest[spider_name] = {"feed": feed_name, "hash": feed_hash}
+
+    def save(self, spider_names):
+        """Save the manifest, dropping runs for spiders that no longer have feeds"""
+        for spider_name in set(self.manifest) - set(spider_names):
+            self.run_path(spider_name).unlink(missing_ok=True)
+            del self.manifest[spider_name]
+        self.manifest_path.write_text(json.dumps(self.manifest, sort_keys=True))
+
+    def merged(self, spider_names):
+        """Yield (start, meeting JSON) for every spider's meetings, sorted by start"""
+        files = [open(self.run_path(name), encoding="utf-8") for name in spider_names]
+        try:
+            runs = [(line.rstrip("\n").split("\t", 1) for line in f) for f in files]
+            yield from heapq.merge(*runs, key=lambda row: row[0])
+        finally:
+            for f in files:
+                f.close()
+
+
+def write_outputs(merged, output_dir, upcoming_after):
+    """
+    Write the combined jsonlines feed, the same meetings as a JSON array and the
+    jsonlines feed of meetings starting after ``upcoming_after`` (an ISO datetime
+    string) in one pass. Returns the paths written and the number of meetings.
+    """
+    output_dir = Path(output_dir)
+    paths = {
+        name: output_dir / name
+        for name in (LATEST_JSONLINES, LATEST_ARRAY, UPCOMING_JSONLINES)
+    }
+    files = {name: open(path, "w", encoding="utf-8") for name, path in paths.items()}
+    count = 0
+    try:
+        files[LATEST_ARRAY].write("[")
+        for start, line in merged:
+            files[LATEST_JSONLINES].write(f"{line}\n")
+            files[LATEST_ARRAY].write(f"{',' if count else ''}\n{line}")
+            if start[:19] > upcoming_after:
+                files[UPCOMING_JSONLINES].write(f"{line}\n")
+            count += 1
+        files[LATEST_ARRAY].write("\n]\n")
+    finally:
+        for f in files.values():
+            f.close()
+    return paths, count
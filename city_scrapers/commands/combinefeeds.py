@@ -0,0 +1,202 @@
+import logging
+import math
+import os
+import re
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from urllib.parse import quote, urlparse
+
+from city_scrapers_core.commands.combinefeeds import Command as CombineFeedsCommand
+from scrapy.utils.url import file_uri_to_path
+
+from city_scrapers.combine import (
+    RunCache,
+    file_hash,
+    iter_file_chunks,
+    iter_lines,
+    write_outputs,
+)
+from city_scrapers.store import MeetingIndex
+
+logger = logging.getLogger(__name__)
+
+MAX_DAYS_PREVIOUS = 3
+# Feeds are JSON lines, optionally compressed (see CITY_SCRAPERS_FEED_COMPRESSION)
+FEED_EXTENSIONS = (".json.gz", ".json.zst", ".json")
+
+
+class Command(CombineFeedsCommand):
+    """
+    Combines feeds by streaming each spider's feed into a sorted run and merging the
+    runs, rather than loading every meeting into memory. Feeds that haven't changed
+    since the last combine (by content hash, or blob ETag on Azure) reuse their
+    previous run without being downloaded. Supports Azure and local file:// feeds,
+    and falls back to city_scrapers_core for other storages.
+
+    With CITY_SCRAPERS_INCREMENTAL, feeds only have a spider's new and changed
+    meetings, so each spider's run is built from the meetings in the local meeting
+    index that were seen in its last crawl instead.
+    """
+
+    def run(self, args, opts):
+        scheme = urlparse(self.settings.get("FEED_URI") or "").scheme
+        if scheme == "file":
+            self.combine_local()
+        elif scheme == "azure":
+            self.combine_azure()
+        else:
+            super().run(args, opts)
+
+    def feed_name_re(self):
+        """
+        Return a regex for feed file names, from the last part of FEED_URI with any
+        of the feed extensions, so other files next to feeds (like profiling
+        reports) aren't taken for them. Placeholders like %(name)s don't match dots.
+        """
+        name = self.settings.get("FEED_URI").rsplit("/", 1)[-1]
+        for extension in FEED_EXTENSIONS:
+            if name.endswith(extension):
+                name = name[: -len(extension)]
+                break
+        pattern = re.sub(r"%\\\(\w+\\\)[sd]", "[^.]+", re.escape(name))
+        extensions = "|".join(re.escape(extension) for extension in FEED_EXTENSIONS)
+        return re.compile(f"^{pattern}(?:{extensions})$")
+
+    def recent_paths(self, list_paths):
+        """
+        Return the most recent feed path for each spider from the last few days, using
+        the CITY_SCRAPERS_DIFF_FEED_PREFIX date format. Spiders that "scrapy schedule"
+        skipped keep their last feed, so this looks back at least as far as
+        CITY_SCRAPERS_SCHEDULE_MAX_STALENESS.
+        """
+        feed_name_re = self.feed_name_re()
+        feed_prefix = self.settings.get("CITY_SCRAPERS_DIFF_FEED_PREFIX", "%Y/%m/%d")
+        max_days = max(
+            MAX_DAYS_PREVIOUS,
+            math.ceil(
+                self.settings.getfloat("CITY_SCRAPERS_SCHEDULE_MAX_STALENESS", 0)
+            ),
+        )
+        paths = []
+        for days_previous in range(max_days + 1):
+            prefix = (datetime.now() - timedelta(days=days_previous)).strftime(
+                feed_prefix
+            )
+            paths.extend(
+                path
+                for path in list_paths(prefix)
+                if feed_name_re.match(path.rsplit("/", 1)[-1])
+            )
+        return self.get_spider_paths(paths)
+
+    def spider_name(self, path):
+        for spider in self.crawler_process.spider_loader.list():
+            if f"{spider}." in path:
+                return spider
+
+    def combine(self, feeds, open_lines):
+        """
+        Update the sorted runs for a list of (spider, feed path, feed hash) and write
+        the merged outputs to a temporary directory, returning it and the output
+        paths. ``open_lines`` returns an iterable of lines for a feed path.
+        """
+        runs = RunCache.from_settings(self.settings)
+        index = None
+        if self.settings.getbool("CITY_SCRAPERS_INCREMENTAL"):
+            index = MeetingIndex.from_settings(self.settings)
+        for spider, path, feed_hash in feeds:
+            if runs.is_current(spider, path, feed_hash):
+                logger.info("Feed %s is unchanged, reusing its sorted run", path)
+                continue
+            if index is not None and index.has_items(spider):
+                lines = index.latest_items(spider)
+            else:
+                lines = open_lines(path)
+            runs.build(spider, path, feed_hash, lines, self.start_key)
+        if index is not None:
+            index.close()
+        spiders = [spider for spider, _, _ in feeds]
+        runs.save(spiders)
+
+        output_dir = tempfile.mkdtemp(prefix="combinefeeds-")
+        upcoming_after = (datetime.now() - timedelta(days=1)).isoformat()[:19]
+        paths, count = write_outputs(runs.merged(spiders), output_dir, upcoming_after)
+        logger.info("Combined %d meetings from %d feeds", count, len(feeds))
+        return output_dir, paths
+
+    def combine_local(self):
+        # Feeds are under the part of the URI before the first placeholder, which
+        # is where the combined outputs are written as well
+        head = file_uri_to_path(self.settings.get("FEED_URI")).split("%(")[0]
+        root = Path(head) if head.endswith(os.sep) else Path(head).parent
+
+        def list_paths(prefix):
+            return sorted(
+                str(path.relative_to(root))
+                for path in root.glob(f"{prefix}*/**/*")
+                if path.is_file()
+            )
+
+        feeds = [
+            (self.spider_name(path), path, file_hash(root / path))
+            for path in self.recent_paths(list_paths)
+        ]
+
+        def open_lines(path):
+            return iter_lines(iter_file_chunks(root / path), path.endswith(".gz"))
+
+        output_dir, paths = self.combine(feeds, open_lines)
+        for _, path, _ in feeds:
+            # Copy latest results for each spider
+            shutil.copyfile(root / path, root / Path(path).name)
+        for name, path in paths.items():
+            shutil.move(path, root / name)
+        shutil.rmtree(output_dir)
+
+    def combine_azure(self):
+        from azure.storage.blob import ContainerClient, ContentSettings
+
+        feed_uri = self.settings.get("FEED_URI")
+        account_name, account_key = feed_uri[8::].split("@")[0].split(":")
+        container = feed_uri.split("@")[1].split("/")[0]
+        container_client = ContainerClient(
+            f"{account_name}.blob.core.windows.net",
+            container,
+            credential=account_key,
+        )
+
+        etags = {}
+
+        def list_paths(prefix):
+            for blob in container_client.list_blobs(name_starts_with=prefix):
+                etags[blob.name] = blob.etag
+            return [name for name in etags if name.startswith(prefix)]
+
+        feeds = [
+            (self.spider_name(name), name, etags[name])
+            for name in self.recent_paths(list_paths)
+        ]
+
+        def open_lines(name):
+            downloader = container_client.get_blob_client(name).download_blob()
+            return iter_lines(downloader.chunks(), name.endswith(".gz"))
+
+        output_dir, paths = self.combine(feeds, open_lines)
+        for _, blob_name, _ in feeds:
+            # Copy latest results for each spider
+            spider_blob = container_client.get_blob_client(blob_name.split("/")[-1])
+            spider_blob.start_copy_from_url(
+                f"https://{account_name}.blob.core.windows.net"
+                f"/{quote(container)}/{blob_name}"
+            )
+        for name, path in paths.items():
+            with open(path, "rb") as f:
+                container_client.upload_blob(
+                    name,
+                    f,
+                    content_settings=ContentSettings(cache_control="no-cache"),
+                    overwrite=True,
+                )
+        shutil.rmtree(output_dir)
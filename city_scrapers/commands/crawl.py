@@ -0,0 +1,17 @@
+from scrapy.commands.crawl import Command as CrawlCommand
+
+
+class Command(CrawlCommand):
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument(
+            "--full",
+            dest="full",
+            action="store_true",
+            help="output every meeting even when running in incremental mode",
+        )
+
+    def process_options(self, args, opts):
+        super().process_options(args, opts)
+        if opts.full:
+            self.settings.set("CITY_SCRAPERS_INCREMENTAL_FULL", True, "cmdline")
@@ -0,0 +1,115 @@
+import logging
+import time
+
+from scrapy import signals
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+
+logger = logging.getLogger(__name__)
+
+
+class SpiderRun:
+    """Tracks wall-clock time and outcome for one spider in a shared process"""
+
+    def __init__(self, name, crawler):
+        self.name = name
+        self.crawler = crawler
+        self.start = None
+        self.end = None
+        self.failed = False
+        self.reason = ""
+        self.items = 0
+        self.errors = 0
+        # Scrapy holds weak references to signal handlers, so bound methods on an
+        # object the command keeps around are used rather than closures
+        crawler.signals.connect(self.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+
+    @property
+    def elapsed(self):
+        if self.start is None:
+            return 0.0
+        return (self.end or time.monotonic()) - self.start
+
+    def spider_opened(self, spider):
+        self.start = time.monotonic()
+
+    def spider_closed(self, spider, reason):
+        self.end = time.monotonic()
+        self.reason = reason
+
+    def crawl_finished(self, _):
+        self.items = self.crawler.stats.get_value("item_scraped_count", 0)
+        self.errors = self.crawler.stats.get_value("log_count/ERROR", 0)
+
+    def crawl_failed(self, failure):
+        self.failed = True
+        self.reason = failure.getErrorMessage()
+        logger.error(
+            "Spider %s failed",
+            self.name,
+            exc_info=(failure.type, failure.value, failure.getTracebackObject()),
+        )
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+
+    def syntax(self):
+        return "[options] [spider ...]"
+
+    def short_desc(self):
+        return "Run all spiders (or the ones listed) concurrently in one process"
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument(
+            "--full",
+            dest="full",
+            action="store_true",
+            help="output every meeting even when running in incremental mode",
+        )
+
+    def process_options(self, args, opts):
+        super().process_options(args, opts)
+        if opts.full:
+            self.settings.set("CITY_SCRAPERS_INCREMENTAL_FULL", True, "cmdline")
+
+    def run(self, args, opts):
+        spider_list = self.crawler_process.spider_loader.list()
+        unknown = [name for name in args if name not in spider_list]
+        if unknown:
+            raise UsageError(f"Unknown spider(s): {', '.join(unknown)}")
+        runs = [self.crawl_spider(name) for name in args or spider_list]
+        self.crawler_process.start()
+        print(format_summary(runs))
+        if any(run.failed for run in runs):
+            self.exitcode = 1
+
+    def crawl_spider(self, name):
+        """Schedule a spider on the shared CrawlerProcess. Failures are recorded on the
+        returned SpiderRun instead of stopping the other spiders.
+        """
+        crawler = self.crawler_process.create_crawler(name)
+        run = SpiderRun(name, crawler)
+        deferred = self.crawler_process.crawl(crawler)
+        deferred.addCallbacks(run.crawl_finished, run.crawl_failed)
+        return run
+
+
+def format_summary(runs):
+    """Format a plain-text table of wall-clock time, item and error counts and outcome
+    for each spider, slowest first.
+    """
+    width = max([len("spider")] + [len(run.name) for run in runs])
+    header = f"{'spider':<{width}}  {'seconds':>8}  {'items':>6}  {'errors':>6}"
+    lines = [f"{header}  status"]
+    for run in sorted(runs, key=lambda run: run.elapsed, reverse=True):
+        status = "failed" if run.failed else "ok"
+        if run.reason:
+            status = f"{status} ({run.reason})"
+        lines.append(
+            f"{run.name:<{width}}  {run.elapsed:>8.1f}  {run.items:>6}  "
+            f"{run.errors:>6}  {status}"
+        )
+    return "\n".join(lines)
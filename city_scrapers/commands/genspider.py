@@ -0,0 +1,8 @@
+from city_scrapers.loader import LazyCommand
+
+
+class Command(LazyCommand):
+    command_path = "city_scrapers_core.commands.genspider.Command"
+    requires_project = False
+    default_settings = {"LOG_ENABLED": False}
+    description = "Generate a new spider and test file for a City Scrapers project"
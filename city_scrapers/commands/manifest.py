@@ -0,0 +1,39 @@
+import json
+
+from scrapy.commands import ScrapyCommand
+from scrapy.spiderloader import SpiderLoader
+
+from city_scrapers.loader import DEFAULT_MANIFEST, build_manifest, read_manifest
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    default_settings = {"LOG_ENABLED": False}
+
+    def short_desc(self):
+        return "Write the spider manifest used by ManifestSpiderLoader"
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument(
+            "--check",
+            dest="check",
+            action="store_true",
+            help="exit with an error if the manifest is out of date instead",
+        )
+
+    def run(self, args, opts):
+        path = self.settings.get("CITY_SCRAPERS_SPIDER_MANIFEST") or DEFAULT_MANIFEST
+        spider_modules = self.settings.getlist("SPIDER_MODULES")
+        manifest = build_manifest(
+            SpiderLoader.from_settings(self.settings), spider_modules
+        )
+        if opts.check:
+            if read_manifest(path) != manifest:
+                print(f"{path} is out of date, run 'scrapy manifest' to update it")
+                self.exitcode = 1
+            return
+        with open(path, "w") as f:
+            json.dump(manifest, f, indent=2)
+            f.write("\n")
+        print(f"Wrote {len(manifest['spiders'])} spiders to {path}")
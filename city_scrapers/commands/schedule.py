@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta
+
+from scrapy.exceptions import UsageError
+from twisted.internet import defer
+
+from city_scrapers.commands.crawlall import Command as CrawlAllCommand
+from city_scrapers.commands.crawlall import SpiderRun, format_summary
+from city_scrapers.schedule import (
+    FORCED,
+    assign_lanes,
+    format_plan,
+    longest_first,
+    plan_spiders,
+)
+from city_scrapers.store import CrawlHistory
+
+
+class ScheduledRun(SpiderRun):
+    """SpiderRun that also keeps the hash of the meetings the spider found"""
+
+    content_hash = None
+
+    def crawl_finished(self, _):
+        super().crawl_finished(_)
+        self.content_hash = self.crawler.stats.get_value("content/hash")
+
+
+class Command(CrawlAllCommand):
+    """
+    Runs the spiders that are due according to how often their sources have changed
+    (see city_scrapers.schedule), longest first, and records each run in the crawl
+    history in the state directory. Runs are recorded as starting when the schedule
+    was made, so daily runs are compared a day apart however long a spider waited.
+    """
+
+    def short_desc(self):
+        return "Run the spiders (or the ones listed) that are due to be checked"
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument(
+            "--parallel",
+            dest="parallel",
+            type=int,
+            default=0,
+            help="run at most this many spiders at once (default: all of them)",
+        )
+        parser.add_argument(
+            "--all",
+            dest="all",
+            action="store_true",
+            help="run every spider, whether or not it's due",
+        )
+        parser.add_argument(
+            "--dry-run",
+            dest="dry_run",
+            action="store_true",
+            help="print which spiders would run without running them",
+        )
+
+    def process_options(self, args, opts):
+        super().process_options(args, opts)
+        self.settings.set("CITY_SCRAPERS_CONTENT_HASH", True, "cmdline")
+
+    def run(self, args, opts):
+        spider_list = self.crawler_process.spider_loader.list()
+        unknown = [name for name in args if name not in spider_list]
+        if unknown:
+            raise UsageError(f"Unknown spider(s): {', '.join(unknown)}")
+
+        now = datetime.now()
+        history = CrawlHistory.from_settings(self.settings)
+        plans = plan_spiders(
+            history,
+            args or spider_list,
+            now,
+            timedelta(
+                days=self.settings.getfloat("CITY_SCRAPERS_SCHEDULE_MAX_STALENESS")
+            ),
+            self.settings.getint("CITY_SCRAPERS_SCHEDULE_MIN_RUNS"),
+            timedelta(days=self.settings.getfloat("CITY_SCRAPERS_SCHEDULE_WINDOW")),
+        )
+        if opts.all:
+            plans = [plan._replace(due=True, reason=FORCED) for plan in plans]
+        due = [plan for plan in plans if plan.due]
+        print(format_plan(longest_first(due) + [p for p in plans if not p.due]))
+        if opts.dry_run or not due:
+            history.close()
+            return
+
+        runs = []
+        for lane in assign_lanes(due, opts.parallel):
+            runs.extend(self.crawl_lane(lane))
+        self.crawler_process.start()
+
+        for run in runs:
+            # runs with errors may have missed meetings, so they aren't compared
+            if run.failed or run.reason != "finished" or run.errors:
+                continue
+            if run.content_hash:
+                history.record(run.name, now, run.elapsed, run.content_hash, run.items)
+        history.close()
+        print(format_summary(runs))
+        if any(run.failed for run in runs):
+            self.exitcode = 1
+
+    def crawl_lane(self, names):
+        """Schedule spiders to run one after another on the shared CrawlerProcess"""
+        runs = [
+            ScheduledRun(name, self.crawler_process.create_crawler(name))
+            for name in names
+        ]
+        lane = defer.succeed(None)
+        for run in runs:
+            lane.addCallback(self.start_run, run)
+        return runs
+
+    def start_run(self, _, run):
+        deferred = self.crawler_process.crawl(run.crawler)
+        deferred.addCallbacks(run.crawl_finished, run.crawl_failed)
+        return deferred
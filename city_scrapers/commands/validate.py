@@ -0,0 +1,9 @@
+from city_scrapers.loader import LazyCommand
+
+
+class Command(LazyCommand):
+    command_path = "city_scrapers_core.commands.validate.Command"
+    requires_project = True
+    description = (
+        "Run a spider with validations, or validate all changed spiders in a PR"
+    )
@@ -0,0 +1,104 @@
+"""
+Date parsing shared by the spiders. Formats the agency sources are known to use are
+matched with precompiled patterns, repeated strings are served from a bounded LRU
+cache, and dateutil is only used when nothing else matches.
+"""
+
+import re
+from collections import Counter
+from datetime import date, datetime
+from functools import lru_cache
+
+CACHE_SIZE = 4096
+
+# BoardDocs numberdate, e.g. "20241107"
+NUMBERDATE_RE = re.compile(r"(\d{4})(\d{2})(\d{2})")
+# Legistar and OnBase dates with an optional time, e.g. "10/17/2024",
+# "10/17/2024 12:30 PM" or "1/7/2025 10:00:00 AM"
+US_DATETIME_RE = re.compile(
+    r"(\d{1,2})/(\d{1,2})/(\d{4})"
+    r"(?:\s+(\d{1,2}):(\d{2})(?::(\d{2}))?\s*([AaPp])\.?[Mm]\.?)?"
+)
+
+# Counts of strings parsed by a fast path vs. dateutil, not including cache hits
+counters = Counter()
+
+
+def _parse_fast(text):
+    match = NUMBERDATE_RE.fullmatch(text)
+    if match:
+        return datetime(*map(int, match.groups()))
+    match = US_DATETIME_RE.fullmatch(text)
+    if match:
+        month, day, year, hour, minute, second, meridiem = match.groups()
+        if hour is None:
+            return datetime(int(year), int(month), int(day))
+        hour = int(hour) % 12
+        if meridiem in "Pp":
+            hour += 12
+        return datetime(
+            int(year), int(month), int(day), hour, int(minute), int(second or 0)
+        )
+    return None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse(text, fuzzy):
+    try:
+        parsed = _parse_fast(text)
+    except ValueError:
+        # matched the pattern but isn't a real date, let dateutil decide
+        parsed = None
+    if parsed is not None:
+        counters["fast"] += 1
+        return parsed
+    from dateutil.parser import parse
+
+    counters["fallback"] += 1
+    return parse(text, fuzzy=fuzzy)
+
+
+def parse_datetime(text, fuzzy=False):
+    """
+    Parse a date or datetime string from one of the agency sources as a naive
+    datetime, using dateutil (optionally fuzzy) for unrecognized formats.
+    """
+    return _parse(text.strip(), fuzzy)
+
+
+def parse_stats():
+    """
+    Return how many strings were parsed by a fast path, fell back to dateutil or were
+    served from the cache.
+    """
+    cache_info = _parse.cache_info()
+    return {
+        "fast": counters["fast"],
+        "fallback": counters["fallback"],
+        "cache_hits": cache_info.hits,
+        "cache_misses": cache_info.misses,
+    }
+
+
+def clear_cache():
+    """Clear the parse cache and reset the counters."""
+    _parse.cache_clear()
+    counters.clear()
+
+
+def date_windows(start, end, size="year"):
+    """
+    Split the dates from start up to (but not including) end into consecutive
+    (start, end) windows aligned to calendar years or months.
+    """
+    if size not in ("year", "month"):
+        raise ValueError(f"Unknown window size {size!r}, expected year or month")
+    while start < end:
+        if size == "year":
+            window_end = date(start.year + 1, 1, 1)
+        elif start.month == 12:
+            window_end = date(start.year + 1, 1, 1)
+        else:
+            window_end = date(start.year, start.month + 1, 1)
+        yield start, min(window_end, end)
+        start = window_end
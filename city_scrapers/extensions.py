@@ -0,0 +1,249 @@
+import cProfile
+import json
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
+from functools import wraps
+from inspect import isasyncgenfunction, isgenerator
+from pathlib import Path
+from urllib.parse import urlparse
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.defer import deferred_f_from_coro_f
+from scrapy.utils.misc import load_object
+from scrapy.utils.project import data_path
+
+from city_scrapers.stats import Histogram
+
+
+class ProfilingExtension:
+    """
+    Times downloads, spider callbacks and helper methods, downloader and spider
+    middleware hooks and pipeline process_item calls, and writes a JSON report for
+    each spider next to its feed output (or to the profile data directory) when
+    CITY_SCRAPERS_PROFILE is enabled.
+
+    Spider methods are timed inclusively, so "parse" includes the "parse_legistar"
+    call it makes. Asynchronous pipelines and middleware are timed until they
+    return, not until their result is ready. Spider middleware output is timed per
+    step of the generator it returns, and like spider methods each step includes the
+    callback and the middleware before it.
+
+    Setting CITY_SCRAPERS_PROFILE_SPIDER to a spider name also runs cProfile on a
+    CITY_SCRAPERS_PROFILE_SAMPLE fraction of that spider's callbacks and saves the
+    stats as <spider>.pstats.
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        settings = crawler.settings
+        self.methods = settings.getlist("CITY_SCRAPERS_PROFILE_METHODS")
+        self.profile_spider = settings.get("CITY_SCRAPERS_PROFILE_SPIDER")
+        self.profile_sample = settings.getfloat("CITY_SCRAPERS_PROFILE_SAMPLE", 1.0)
+        self.timings = {}
+        self.profiler = None
+        self.profiling = False
+        self.profiled = 0
+        self.bytes_downloaded = 0
+        self.start = None
+        self.output_dir = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("CITY_SCRAPERS_PROFILE"):
+            raise NotConfigured
+        ext = cls(crawler)
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(
+            ext.response_downloaded, signal=signals.response_downloaded
+        )
+        return ext
+
+    def histogram(self, name):
+        if name not in self.timings:
+            self.timings[name] = Histogram()
+        return self.timings[name]
+
+    def spider_opened(self, spider):
+        self.start = time.perf_counter()
+        # when the feeds are opened, so the report goes next to them
+        self.output_dir = report_dir(self.crawler.settings, spider)
+        if spider.name == self.profile_spider:
+            self.profiler = cProfile.Profile()
+        for name in self.methods:
+            method = getattr(spider, name, None)
+            if callable(method):
+                setattr(spider, name, self.timed(f"spider/{name}", method))
+
+        engine = self.crawler.engine
+        downloadermw = engine.downloader.middleware
+        for hook in ("process_request", "process_response", "process_exception"):
+            downloadermw.methods[hook] = deque(
+                self.timed(f"downloadermw/{component_name(method)}", method)
+                for method in downloadermw.methods[hook]
+            )
+        spidermw = engine.scraper.spidermw
+        spidermw.methods["process_spider_input"] = deque(
+            self.timed(f"spidermw/{component_name(method)}", method)
+            for method in spidermw.methods["process_spider_input"]
+        )
+        spidermw.methods["process_spider_output"] = deque(
+            self.timed_spider_output(method)
+            for method in spidermw.methods["process_spider_output"]
+        )
+        itemproc = engine.scraper.itemproc
+        itemproc.methods["process_item"] = deque(
+            deferred_f_from_coro_f(
+                self.timed(
+                    f"pipeline/{component_name(pipe.process_item)}", pipe.process_item
+                )
+            )
+            for pipe in itemproc.middlewares
+            if hasattr(pipe, "process_item")
+        )
+
+    def timed_spider_output(self, method):
+        """
+        Time a process_spider_output hook. Scrapy keeps (sync, async) pairs for
+        middleware with a process_spider_output_async as well, and async generators
+        are left as they are.
+        """
+        if isinstance(method, tuple):
+            return (self.timed_spider_output(method[0]), method[1])
+        if method is None or isasyncgenfunction(method):
+            return method
+        return self.timed(f"spidermw/{component_name(method)}", method)
+
+    def timed(self, name, func):
+        """Wrap a function so each call (and each step of a generator) is timed"""
+        histogram = self.histogram(name)
+        profile = self.profiler is not None and name.startswith("spider/")
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            # only the outermost sampled call turns the profiler on and off
+            profiler = None
+            if profile and not self.profiling:
+                if random.random() < self.profile_sample:
+                    profiler = self.profiler
+                    self.profiled += 1
+            start = time.perf_counter()
+            self.enable(profiler)
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                self.disable(profiler)
+                elapsed = time.perf_counter() - start
+            if not isgenerator(result):
+                histogram.add(elapsed)
+                return result
+            return self.timed_generator(histogram, result, elapsed, profiler)
+
+        return wrapper
+
+    def timed_generator(self, histogram, gen, elapsed, profiler):
+        while True:
+            start = time.perf_counter()
+            self.enable(profiler)
+            try:
+                value = next(gen)
+            except StopIteration:
+                return
+            finally:
+                self.disable(profiler)
+                elapsed += time.perf_counter() - start
+                # record the whole call once the generator is exhausted or fails
+                if gen.gi_frame is None:
+                    histogram.add(elapsed)
+            yield value
+
+    def enable(self, profiler):
+        if profiler is not None:
+            self.profiling = True
+            profiler.enable()
+
+    def disable(self, profiler):
+        if profiler is not None:
+            profiler.disable()
+            self.profiling = False
+
+    def response_downloaded(self, response, request, spider):
+        self.bytes_downloaded += len(response.body)
+        if "download_latency" in request.meta:
+            self.histogram("download").add(request.meta["download_latency"])
+
+    def spider_closed(self, spider, reason):
+        elapsed = time.perf_counter() - self.start
+        stats = self.crawler.stats
+        items = stats.get_value("item_scraped_count", 0, spider=spider)
+        report = {
+            "spider": spider.name,
+            "finish_reason": reason,
+            "elapsed_s": round(elapsed, 3),
+            "items": items,
+            "items_per_sec": round(items / elapsed, 3) if elapsed else 0,
+            "responses": stats.get_value("response_received_count", 0, spider=spider),
+            "bytes_downloaded": self.bytes_downloaded,
+            "profiled_calls": self.profiled,
+            "timings": {
+                name: histogram.to_dict()
+                for name, histogram in sorted(self.timings.items())
+                if histogram.count
+            },
+        }
+        output_dir = self.output_dir
+        output_dir.mkdir(parents=True, exist_ok=True)
+        report_path = output_dir / f"{spider.name}.profile.json"
+        report_path.write_text(json.dumps(report, indent=2))
+        spider.logger.info("Wrote profiling report to %s", report_path)
+        if self.profiler is not None:
+            self.profiler.dump_stats(str(output_dir / f"{spider.name}.pstats"))
+
+
+def component_name(method):
+    owner = getattr(method, "__self__", None)
+    if owner is None:
+        return method.__qualname__
+    return f"{type(owner).__name__}.{method.__name__}"
+
+
+def feed_uri_params(settings, spider, feed_options=None):
+    """
+    Return the parameters a feed URI is formatted with, the same way as Scrapy's
+    FeedExporter: every spider attribute, the time, the first batch, and anything
+    the feed's ``uri_params`` function (or FEED_URI_PARAMS) changes.
+    """
+    params = {key: getattr(spider, key) for key in dir(spider)}
+    utc_now = datetime.now(tz=timezone.utc)
+    params["time"] = utc_now.replace(microsecond=0).isoformat().replace(":", "-")
+    params["batch_time"] = utc_now.isoformat().replace(":", "-")
+    params["batch_id"] = 1
+    uri_params_function = (feed_options or {}).get("uri_params") or settings.get(
+        "FEED_URI_PARAMS"
+    )
+    if not uri_params_function:
+        return params
+    new_params = load_object(uri_params_function)(params, spider)
+    return new_params if new_params is not None else params
+
+
+def report_dir(settings, spider):
+    """
+    Return the directory of the spider's first local feed, or the profile data
+    directory if none of the feeds are written to disk.
+    """
+    feeds = settings.getdict("FEEDS") or {settings.get("FEED_URI"): {}}
+    for uri, feed_options in feeds.items():
+        if not uri:
+            continue
+        uri = str(uri) % feed_uri_params(settings, spider, feed_options)
+        parsed = urlparse(uri)
+        if parsed.scheme == "file":
+            return Path(parsed.path).parent
+        if len(parsed.scheme) <= 1:
+            # no scheme, or a Windows drive letter
+            return Path(uri).parent
+    return Path(data_path(settings.get("CITY_SCRAPERS_PROFILE_DIR", "profile")))
@@ -0,0 +1,246 @@
+"""
+Feed storages that upload a feed in chunks while items are still being exported,
+instead of staging the whole file and uploading it when the spider closes, and a
+zstd postprocessing plugin to use alongside Scrapy's GzipPlugin.
+"""
+
+import base64
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from scrapy import signals
+from scrapy.extensions.feedexport import build_storage
+from scrapy.utils.url import file_uri_to_path
+from twisted.internet import defer
+from twisted.python.failure import Failure
+
+# Uploads are at least this many bytes, apart from the last one
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+# Chunks that can be waiting to upload before scraped items wait for them
+MAX_PENDING_CHUNKS = 2
+
+
+def deferred_from_future(future):
+    """Return a Deferred that fires in the reactor thread when a future is done"""
+    from twisted.internet import reactor
+
+    deferred = defer.Deferred()
+
+    def done(future):
+        try:
+            result = future.result()
+        except Exception:
+            reactor.callFromThread(deferred.errback, Failure())
+        else:
+            reactor.callFromThread(deferred.callback, result)
+
+    future.add_done_callback(done)
+    return deferred
+
+
+class ZstdPlugin:
+    """
+    Compresses feed data with zstd as it's written. Requires the zstandard package.
+
+    Accepted ``feed_options`` parameters:
+
+    - `zstd_compresslevel`
+    """
+
+    def __init__(self, file, feed_options):
+        import zstandard
+
+        self.file = file
+        self.feed_options = feed_options
+        compressor = zstandard.ZstdCompressor(
+            level=self.feed_options.get("zstd_compresslevel", 3)
+        )
+        self.zstdfile = compressor.stream_writer(self.file, closefd=False)
+
+    def write(self, data):
+        return self.zstdfile.write(data)
+
+    def close(self):
+        self.zstdfile.close()
+
+
+class ChunkWriter:
+    """
+    File-like object returned by ChunkedFeedStorage.open. Buffers writes and hands
+    each full chunk to a background thread to upload, so memory use is bounded by
+    the chunk size rather than the feed size. Writes never wait for uploads; the
+    storage slows down scraping with ``wait`` instead when uploads fall behind.
+    """
+
+    def __init__(self, storage, chunk_size):
+        self.storage = storage
+        self.chunk_size = chunk_size
+        self.buffer = bytearray()
+        self.chunks = 0
+        self.uploads = []
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.uploads.append(self.executor.submit(storage.start_upload))
+
+    def write(self, data):
+        self.buffer += data
+        if len(self.buffer) >= self.chunk_size:
+            self.send_chunk()
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def send_chunk(self):
+        data, self.buffer = bytes(self.buffer), bytearray()
+        self.uploads.append(
+            self.executor.submit(self.storage.upload_chunk, self.chunks, data)
+        )
+        self.chunks += 1
+
+    def wait(self):
+        """
+        Return a Deferred that fires once at most MAX_PENDING_CHUNKS uploads are
+        waiting. Upload errors are raised when the feed is committed.
+        """
+        pending = [upload for upload in self.uploads if not upload.done()]
+        if len(pending) <= MAX_PENDING_CHUNKS:
+            return defer.succeed(None)
+        # uploads run in order, so this is done once the rest are few enough
+        deferred = deferred_from_future(pending[-MAX_PENDING_CHUNKS - 1])
+        return deferred.addErrback(lambda failure: None)
+
+    def finish(self):
+        """
+        Upload the last chunk and commit the upload in the background, returning a
+        future for the commit
+        """
+        if self.buffer:
+            self.send_chunk()
+        commit = self.executor.submit(self.commit)
+        self.executor.shutdown(wait=False)
+        return commit
+
+    def commit(self):
+        # every upload was submitted before this, so they're all done
+        for upload in self.uploads:
+            upload.result()
+        self.storage.commit_upload(self.chunks)
+
+
+class ChunkedFeedStorage:
+    """
+    Base feed storage for backends that support chunked or multipart uploads.
+    Subclasses implement start_upload, upload_chunk and commit_upload, which are
+    called in order from a single background thread. Items wait in item_scraped
+    while more than MAX_PENDING_CHUNKS chunks are waiting to upload.
+
+    The chunk size comes from the ``chunk_size`` feed option, falling back to the
+    CITY_SCRAPERS_FEED_CHUNK_SIZE setting.
+    """
+
+    def __init__(self, uri, *, feed_options=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.uri = uri
+        self.chunk_size = int((feed_options or {}).get("chunk_size", chunk_size))
+
+        self.writer = None
+
+    @classmethod
+    def from_crawler(cls, crawler, uri, *, feed_options=None):
+        storage = build_storage(
+            cls,
+            uri,
+            feed_options=feed_options,
+            chunk_size=crawler.settings.getint(
+                "CITY_SCRAPERS_FEED_CHUNK_SIZE", DEFAULT_CHUNK_SIZE
+            ),
+        )
+        crawler.signals.connect(storage.item_scraped, signal=signals.item_scraped)
+        return storage
+
+    def open(self, spider):
+        self.writer = ChunkWriter(self, self.chunk_size)
+        return self.writer
+
+    def item_scraped(self, item, spider):
+        if self.writer is not None:
+            return self.writer.wait()
+
+    def store(self, file):
+        return deferred_from_future(file.finish())
+
+    def start_upload(self):
+        pass
+
+    def upload_chunk(self, index, data):
+        raise NotImplementedError
+
+    def commit_upload(self, chunks):
+        pass
+
+
+class FileChunkedFeedStorage(ChunkedFeedStorage):
+    """
+    Local stand-in for remote chunked storage. Chunks are appended to a ".part" file
+    that replaces the feed path once the upload is committed, so readers never see
+    a partial feed.
+    """
+
+    def __init__(self, uri, *, feed_options=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        super().__init__(uri, feed_options=feed_options, chunk_size=chunk_size)
+        self.path = Path(file_uri_to_path(uri))
+        self.part_path = self.path.with_name(f"{self.path.name}.part")
+        self.part_file = None
+
+    def start_upload(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.part_file = open(self.part_path, "wb")
+
+    def upload_chunk(self, index, data):
+        self.part_file.write(data)
+
+    def commit_upload(self, chunks):
+        self.part_file.close()
+        os.replace(self.part_path, self.path)
+
+
+class AzureChunkedFeedStorage(ChunkedFeedStorage):
+    """
+    Writes a feed to Azure Blob Storage as staged blocks that are committed once
+    the feed is finished. Accepts the same URIs as
+    :class:`city_scrapers_core.extensions.AzureBlobFeedStorage`.
+    """
+
+    def __init__(self, uri, *, feed_options=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        from azure.storage.blob import BlobClient
+
+        super().__init__(uri, feed_options=feed_options, chunk_size=chunk_size)
+        container = uri.split("@")[1].split("/")[0]
+        filename = "/".join(uri.split("@")[1].split("/")[1::])
+        account_name, account_key = uri[8::].split("@")[0].split(":")
+
+        self.account_name = account_name
+        self.account_key = account_key
+        self.container = container
+        self.filename = filename
+        self.blob_client = BlobClient(
+            f"https://{self.account_name}.blob.core.windows.net",
+            self.container,
+            self.filename,
+            credential=self.account_key,
+        )
+
+    @staticmethod
+    def block_id(index):
+        # block IDs in a blob must all be the same length
+        return base64.b64encode(f"{index:08d}".encode()).decode()
+
+    def upload_chunk(self, index, data):
+        self.blob_client.stage_block(self.block_id(index), data)
+
+    def commit_upload(self, chunks):
+        from azure.storage.blob import BlobBlock
+
+        self.blob_client.commit_block_list(
+            [BlobBlock(block_id=self.block_id(index)) for index in range(chunks)]
+        )
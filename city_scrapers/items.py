@@ -0,0 +1,159 @@
+"""
+A compact alternative to city_scrapers_core's Meeting item for spiders that produce
+a lot of meetings, most of which are only compared or dropped by the pipelines.
+"""
+
+import sys
+from collections import namedtuple
+from collections.abc import MutableMapping
+
+from city_scrapers_core.items import Meeting
+from itemadapter import ItemAdapter
+from itemadapter.adapter import AdapterInterface
+
+FIELDS = tuple(Meeting.fields)
+
+Location = namedtuple("Location", ["name", "address"])
+Link = namedtuple("Link", ["title", "href"])
+
+# One Location for each distinct name and address, shared by every meeting there
+_locations = {}
+
+
+def compact_location(location):
+    """
+    Return the shared Location for a location dict with only a name and address, or
+    the dict itself if it has anything else
+    """
+    if not isinstance(location, dict) or location.keys() != {"name", "address"}:
+        return location
+    key = (location["name"], location["address"])
+    compact = _locations.get(key)
+    if compact is None:
+        compact = _locations[key] = Location(
+            *(sys.intern(value) if isinstance(value, str) else value for value in key)
+        )
+    return compact
+
+
+def compact_links(links):
+    """
+    Return a tuple of Links for a list of link dicts with only a title and href, or
+    the list itself if any of them has anything else
+    """
+    if not isinstance(links, list) or any(
+        not isinstance(link, dict) or link.keys() != {"title", "href"} for link in links
+    ):
+        return links
+    return tuple(Link(sys.intern(link["title"]), link["href"]) for link in links)
+
+
+class CompactMeeting(MutableMapping):
+    """
+    Meeting with the same fields and dict-like interface, stored in slots instead of
+    a dict of values. Locations are shared Location tuples, links are tuples of
+    Links and sources are interned, and they're only turned back into dicts and
+    lists when they're read. Fields that haven't been set are missing, like they are
+    on a Meeting.
+
+    CompactMeetings are registered with itemadapter, so Scrapy accepts and exports
+    them like any other item. Use ``to_meeting`` where a Meeting is needed.
+    city_scrapers_core's diff pipelines only handle Meetings, so
+    MeetingStatusMiddleware converts them when one of those is enabled.
+    """
+
+    __slots__ = FIELDS + ("_id",)
+    jsonschema = Meeting.jsonschema
+
+    def __init__(self, *args, **kwargs):
+        if args or kwargs:
+            self.update(*args, **kwargs)
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        try:
+            value = getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+        if key == "location" and isinstance(value, Location):
+            return {"name": value.name, "address": value.address}
+        if key == "links" and isinstance(value, tuple):
+            return [{"title": link.title, "href": link.href} for link in value]
+        return value
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(f"CompactMeeting does not support field: {key}")
+        if key == "location":
+            value = compact_location(value)
+        elif key == "links":
+            value = compact_links(value)
+        elif key == "source" and isinstance(value, str):
+            value = sys.intern(value)
+        setattr(self, key, value)
+
+    def __delitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        try:
+            delattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __iter__(self):
+        return (key for key in self.__slots__ if hasattr(self, key))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    def copy(self):
+        return type(self)(self)
+
+    def to_meeting(self):
+        """Return the same meeting as a Meeting item"""
+        values = dict(self)
+        ocd_id = values.pop("_id", None)
+        meeting = Meeting(values)
+        if ocd_id is not None:
+            # Meeting doesn't have an _id field, so bypass __setitem__ like
+            # DiffPipeline does
+            meeting._values["_id"] = ocd_id
+        return meeting
+
+
+class CompactMeetingAdapter(AdapterInterface):
+    """itemadapter support for CompactMeeting"""
+
+    @classmethod
+    def is_item_class(cls, item_class):
+        return issubclass(item_class, CompactMeeting)
+
+    @classmethod
+    def get_field_names_from_class(cls, item_class):
+        return list(FIELDS)
+
+    def __getitem__(self, field_name):
+        return self.item[field_name]
+
+    def __setitem__(self, field_name, value):
+        self.item[field_name] = value
+
+    def __delitem__(self, field_name):
+        del self.item[field_name]
+
+    def __iter__(self):
+        return iter(self.item)
+
+    def __len__(self):
+        return len(self.item)
+
+
+if CompactMeetingAdapter not in ItemAdapter.ADAPTER_CLASSES:
+    ItemAdapter.ADAPTER_CLASSES.appendleft(CompactMeetingAdapter)
+
+# Item types the project's pipelines and middleware handle as meetings
+MEETING_TYPES = (Meeting, CompactMeeting)
@@ -0,0 +1,160 @@
+"""
+Loading spiders and commands without importing everything up front.
+
+ManifestSpiderLoader finds spiders from a generated manifest instead of importing
+every spider module. The manifest maps each spider name to its module and class,
+with its agency and timezone, and records a hash of every spider module it was
+generated from. It's written with ``scrapy manifest``. If the spider modules no
+longer match the hashes, or there's no manifest, every module is imported as usual.
+
+LazyCommand wraps a city_scrapers_core command so its module (and dependencies
+like requests or jsonschema) is only imported when that command runs, since
+Scrapy imports every command module on startup.
+"""
+
+import importlib
+import importlib.util
+import json
+import logging
+import pkgutil
+from functools import cached_property
+from hashlib import sha1
+from pathlib import Path
+
+from scrapy.commands import ScrapyCommand
+from scrapy.interfaces import ISpiderLoader
+from scrapy.spiderloader import SpiderLoader
+from scrapy.utils.misc import load_object
+from zope.interface import implementer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MANIFEST = str(Path(__file__).parent / "spiders" / "manifest.json")
+
+
+def module_hashes(spider_modules):
+    """
+    Return a dict of each module in the SPIDER_MODULES packages to a hash of its
+    source, without importing the modules themselves
+    """
+    hashes = {}
+    for package in spider_modules:
+        spec = importlib.util.find_spec(package)
+        modules = [(package, spec.origin)]
+        for module in pkgutil.walk_packages(
+            spec.submodule_search_locations or [], f"{package}."
+        ):
+            modules.append((module.name, importlib.util.find_spec(module.name).origin))
+        for name, path in modules:
+            hashes[name] = sha1(Path(path).read_bytes()).hexdigest()
+    return hashes
+
+
+def build_manifest(spider_loader, spider_modules):
+    """Build a manifest from a spider loader that has imported every spider"""
+    spiders = {}
+    for name in sorted(spider_loader.list()):
+        spidercls = spider_loader.load(name)
+        spiders[name] = {
+            "module": spidercls.__module__,
+            "class": spidercls.__name__,
+            "agency": getattr(spidercls, "agency", None),
+            "timezone": getattr(spidercls, "timezone", None),
+        }
+    return {"modules": module_hashes(spider_modules), "spiders": spiders}
+
+
+def read_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+@implementer(ISpiderLoader)
+class ManifestSpiderLoader:
+    """
+    Lists spiders from the manifest at CITY_SCRAPERS_SPIDER_MANIFEST and imports a
+    spider's module only when that spider is loaded. Falls back to Scrapy's
+    SpiderLoader when the manifest is missing or out of date.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.spider_modules = settings.getlist("SPIDER_MODULES")
+        self.path = settings.get("CITY_SCRAPERS_SPIDER_MANIFEST") or DEFAULT_MANIFEST
+        self.fallback = None
+        self.manifest = read_manifest(self.path)
+        if self.manifest is None:
+            logger.warning("No spider manifest at %s, importing all spiders", self.path)
+            self.fallback = SpiderLoader.from_settings(settings)
+        elif self.manifest["modules"] != module_hashes(self.spider_modules):
+            logger.warning(
+                "Spider manifest %s is out of date, importing all spiders. Update "
+                "it with 'scrapy manifest'.",
+                self.path,
+            )
+            self.fallback = SpiderLoader.from_settings(settings)
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(settings)
+
+    def list(self):
+        if self.fallback is not None:
+            return self.fallback.list()
+        return list(self.manifest["spiders"])
+
+    def load(self, spider_name):
+        if self.fallback is not None:
+            return self.fallback.load(spider_name)
+        try:
+            entry = self.manifest["spiders"][spider_name]
+        except KeyError:
+            raise KeyError(f"Spider not found: {spider_name}")
+        module = importlib.import_module(entry["module"])
+        return getattr(module, entry["class"])
+
+    def find_by_request(self, request):
+        # only used by "scrapy fetch" and "scrapy shell" with a URL
+        if self.fallback is None:
+            self.fallback = SpiderLoader.from_settings(self.settings)
+        return self.fallback.find_by_request(request)
+
+
+class LazyCommand(ScrapyCommand):
+    """
+    Command that imports the command at ``command_path`` the first time it's used.
+    Subclasses repeat the wrapped command's ``requires_project``,
+    ``default_settings``, ``syntax`` and ``description``, which Scrapy reads for
+    every command.
+    """
+
+    command_path = None
+    description = ""
+
+    @cached_property
+    def command(self):
+        return load_object(self.command_path)()
+
+    def syntax(self):
+        return self.command.syntax()
+
+    def short_desc(self):
+        return self.description
+
+    def long_desc(self):
+        return self.description
+
+    def add_options(self, parser):
+        self.command.settings = self.settings
+        self.command.add_options(parser)
+
+    def process_options(self, args, opts):
+        self.command.process_options(args, opts)
+
+    def run(self, args, opts):
+        self.command.crawler_process = self.crawler_process
+        self.command.run(args, opts)
+        self.exitcode = self.command.exitcode
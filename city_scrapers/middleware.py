@@ -1,24 +1,646 @@
+import logging
+import queue
 import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from hashlib import sha1
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlparse
+from urllib.request import Request, urlopen
 
-from city_scrapers_core.items import Meeting
+from city_scrapers_core.constants import CANCELLED
+from scrapy import signals
+from scrapy.downloadermiddlewares.httpcache import HttpCacheMiddleware
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.extensions.httpcache import RFC2616Policy
+from scrapy.utils.conf import build_component_list
+from scrapy.utils.misc import load_object
 from scrapy_wayback_middleware import WaybackMiddleware
+from twisted.internet import threads
+
+from city_scrapers.items import MEETING_TYPES, CompactMeeting
+from city_scrapers.stats import Histogram
+from city_scrapers.status import set_status_and_ids
+from city_scrapers.store import ArchivedUrls, meeting_hash, state_path
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of the queue so the worker can finish once it's drained
+_CLOSE = object()
+
+
+class WaybackQueue:
+    """
+    Background thread that submits URLs to the Wayback Machine from a bounded queue.
+
+    URLs are taken off the queue in batches, submitted one at a time with at least
+    ``host_delay`` seconds between URLs from the same host, and every batch's
+    successful submissions are saved to the archived URL store together. Adding a
+    URL never blocks: if the queue is full the URL is dropped and will be picked
+    up on a later run.
+    """
+
+    def __init__(
+        self,
+        endpoint,
+        store_path,
+        stats,
+        spider,
+        queue_size=1000,
+        batch_size=20,
+        host_delay=1.0,
+        backoff=60.0,
+        timeout=30.0,
+        user_agent=None,
+    ):
+        self.endpoint = endpoint
+        self.store_path = store_path
+        self.stats = stats
+        self.spider = spider
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.host_delay = host_delay
+        self.backoff = backoff
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.pending = deque()
+        self.next_allowed = {}
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(
+            target=self.run, name="wayback-queue", daemon=True
+        )
+
+    def start(self):
+        self.thread.start()
+
+    def put(self, url):
+        """Queue a URL for archiving, returning False if the queue was full"""
+        try:
+            self.queue.put_nowait(url)
+        except queue.Full:
+            return False
+        return True
+
+    def close(self, timeout):
+        """
+        Wait up to ``timeout`` seconds for queued URLs to be submitted, then stop
+        and return how many were left unsubmitted. The submission in progress when
+        it stops is given up to the request timeout to finish. Blocks, so run it in
+        a thread from the reactor.
+        """
+        deadline = time.monotonic() + timeout
+        while self.thread.is_alive():
+            try:
+                self.queue.put(_CLOSE, timeout=max(deadline - time.monotonic(), 0))
+                break
+            except queue.Full:
+                if time.monotonic() >= deadline:
+                    break
+        self.thread.join(max(deadline - time.monotonic(), 0))
+        self.stopped.set()
+        self.thread.join(self.timeout)
+        remaining = len(self.pending)
+        while True:
+            try:
+                if self.queue.get_nowait() is not _CLOSE:
+                    remaining += 1
+            except queue.Empty:
+                return remaining
+
+    def run(self):
+        store = ArchivedUrls(self.store_path)
+        try:
+            while not self.stopped.is_set():
+                batch = self.next_batch()
+                if not batch:
+                    break
+                submitted = []
+                while batch and not self.stopped.is_set():
+                    url = batch.popleft()
+                    if self.submit(url):
+                        submitted.append(url)
+                self.pending.extendleft(reversed(batch))
+                if submitted:
+                    store.add(submitted, datetime.now())
+        finally:
+            store.close()
+
+    def next_batch(self):
+        """
+        Return up to ``batch_size`` URLs, waiting for the first one. Returns an empty
+        batch once the queue is closed and drained.
+        """
+        closed = False
+        while not self.pending and not closed:
+            try:
+                url = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                if self.stopped.is_set():
+                    return deque()
+                continue
+            if url is _CLOSE:
+                closed = True
+            else:
+                self.pending.append(url)
+        while len(self.pending) < self.batch_size and not closed:
+            try:
+                url = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if url is _CLOSE:
+                closed = True
+            else:
+                self.pending.append(url)
+        if closed:
+            # put the marker back so the next call returns once these are done
+            self.queue.put(_CLOSE)
+        batch = self.pending
+        self.pending = deque()
+        return batch
+
+    def wait_for_host(self, host):
+        """Wait until a URL from the host can be submitted, False if stopped"""
+        delay = self.next_allowed.get(host, 0) - time.monotonic()
+        if delay > 0 and self.stopped.wait(delay):
+            return False
+        self.next_allowed[host] = time.monotonic() + self.host_delay
+        return True
+
+    def submit(self, url):
+        if not self.wait_for_host(urlparse(url).netloc):
+            return False
+        headers = {"User-Agent": self.user_agent} if self.user_agent else {}
+        try:
+            with urlopen(
+                Request(self.endpoint + url, headers=headers), timeout=self.timeout
+            ):
+                pass
+        except HTTPError as e:
+            self.stats.inc_value("wayback/failed", spider=self.spider)
+            if e.code == 429:
+                # rate limited by the archive, wait before trying anything else
+                self.stats.inc_value("wayback/rate_limited", spider=self.spider)
+                self.stopped.wait(self.backoff)
+            return False
+        except (URLError, OSError) as e:
+            self.stats.inc_value("wayback/failed", spider=self.spider)
+            logger.debug("Failed to archive %s: %s", url, e)
+            return False
+        self.stats.inc_value("wayback/submitted", spider=self.spider)
+        return True
 
 
 class CityScrapersWaybackMiddleware(WaybackMiddleware):
+    """
+    Spider middleware that archives scraped pages and meeting links in the Wayback
+    Machine. URLs are submitted from a background WaybackQueue rather than as
+    Scrapy requests so items are never held up, and URLs archived within
+    WAYBACK_TTL_DAYS (on this or a previous run) are skipped.
+    """
+
+    MAX_LINKS = 3
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        middleware = super().from_crawler(crawler)
+        crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def spider_opened(self, spider):
+        settings = self.crawler.settings
+        store_path = state_path(settings, "wayback.db")
+        cutoff = datetime.now() - timedelta(days=settings.getfloat("WAYBACK_TTL_DAYS"))
+        store = ArchivedUrls(store_path)
+        self.seen = store.since(cutoff)
+        store.close()
+        self.queue = WaybackQueue(
+            settings.get("WAYBACK_ENDPOINT"),
+            store_path,
+            self.crawler.stats,
+            spider,
+            queue_size=settings.getint("WAYBACK_QUEUE_SIZE"),
+            batch_size=settings.getint("WAYBACK_BATCH_SIZE"),
+            host_delay=settings.getfloat("WAYBACK_HOST_DELAY"),
+            backoff=settings.getfloat("WAYBACK_BACKOFF"),
+            timeout=settings.getfloat("DOWNLOAD_TIMEOUT"),
+            user_agent=settings.get("USER_AGENT"),
+        )
+        self.queue.start()
+
+    def spider_closed(self, spider):
+        """Drain the queue in a thread, returning a Deferred the close waits for"""
+        drained = threads.deferToThread(
+            self.queue.close, self.crawler.settings.getfloat("WAYBACK_DRAIN_TIMEOUT")
+        )
+        drained.addCallback(self.count_dropped, spider)
+        return drained
+
+    def count_dropped(self, remaining, spider):
+        if remaining:
+            self.crawler.stats.inc_value("wayback/dropped", remaining, spider=spider)
+
+    def process_spider_output(self, response, result, spider):
+        """Queue the page and item URLs for archiving while passing results through"""
+        if response.request.method == "GET":
+            self.enqueue(response.url, spider)
+        for item in result:
+            for url in self.get_item_urls(item):
+                self.enqueue(url, spider)
+            yield item
+
+    def enqueue(self, url, spider):
+        if not url or "web.archive.org" in url:
+            return
+        stats = self.crawler.stats
+        if url in self.seen:
+            stats.inc_value("wayback/skipped", spider=spider)
+            return
+        self.seen.add(url)
+        if self.queue.put(url):
+            stats.inc_value("wayback/queued", spider=spider)
+        else:
+            stats.inc_value("wayback/dropped", spider=spider)
+
     def get_item_urls(self, item):
-        MAX_LINKS = 3
-        if isinstance(item, Meeting):
+        if isinstance(item, MEETING_TYPES):
             links = []
             if "legistar" in item["source"] and "Calendar.aspx" not in item["source"]:
                 links = [item["source"]]
             links.extend(
-                random.sample(
-                    [link.get("href") for link in item.get("links", [])], MAX_LINKS
-                )
+                self.sample([link.get("href") for link in item.get("links", [])])
             )
             return links
         if isinstance(item, dict):
-            return random.sample(
-                [doc.get("url") for doc in item.get("documents", [])], MAX_LINKS
-            )
+            return self.sample([doc.get("url") for doc in item.get("documents", [])])
         return []
+
+    def sample(self, urls):
+        """Pick up to MAX_LINKS of the URLs at random"""
+        urls = [url for url in urls if url]
+        return random.sample(urls, min(len(urls), self.MAX_LINKS))
+
+
+class MeetingStatusMiddleware:
+    """
+    Spider middleware that sets the status and ID of the meetings each callback
+    yields without them, as a batch with one reference time (see
+    city_scrapers.status), before the other middleware and pipelines see them.
+
+    city_scrapers_core's DiffPipeline and its storage subclasses only handle Meeting
+    items, so CompactMeetings are turned into Meetings when one of them is in
+    ITEM_PIPELINES.
+    """
+
+    def __init__(self, to_meeting=False):
+        self.to_meeting = to_meeting
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        # Imported here since city_scrapers_core.pipelines loads jsonschema
+        from city_scrapers_core.pipelines import DiffPipeline
+
+        pipelines = build_component_list(crawler.settings.getwithbase("ITEM_PIPELINES"))
+        return cls(
+            to_meeting=any(
+                issubclass(load_object(pipeline), DiffPipeline)
+                for pipeline in pipelines
+            )
+        )
+
+    def process_spider_output(self, response, result, spider):
+        items = set_status_and_ids(spider, result)
+        if not self.to_meeting:
+            return items
+        return (
+            item.to_meeting() if isinstance(item, CompactMeeting) else item
+            for item in items
+        )
+
+
+class ContentHashMiddleware:
+    """
+    Spider middleware that hashes every meeting a spider yields, before any
+    pipelines, and sets the combined hash as the "content/hash" stat when the
+    spider closes, so a run can be compared against the last one. Meetings are
+    hashed in any order, and only whether a meeting is cancelled is included of its
+    status, since "passed" and "tentative" change with the date rather than the
+    source. Enabled by CITY_SCRAPERS_CONTENT_HASH, which "scrapy schedule" sets.
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.hashes = []
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("CITY_SCRAPERS_CONTENT_HASH"):
+            raise NotConfigured
+        middleware = cls(crawler)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def process_spider_output(self, response, result, spider):
+        for item in result:
+            if isinstance(item, MEETING_TYPES):
+                self.hashes.append(content_hash(item))
+            yield item
+
+    def spider_closed(self, spider):
+        digest = sha1()
+        for item_hash in sorted(self.hashes):
+            digest.update(item_hash.encode())
+        self.crawler.stats.set_value("content/hash", digest.hexdigest(), spider=spider)
+        self.crawler.stats.set_value(
+            "content/meetings", len(self.hashes), spider=spider
+        )
+
+
+def content_hash(item):
+    normalized = dict(item)
+    normalized["status"] = item.get("status") == CANCELLED
+    return meeting_hash(normalized)
+
+
+class HostCircuit:
+    """
+    Circuit breaker for a host. After ``failures`` failed requests in a row the
+    circuit opens and requests fail fast for ``cooldown`` seconds. Then a single
+    probe request is let through: if it succeeds the circuit closes, and if it
+    fails the circuit opens again for twice as long, up to ``max_cooldown``.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failures=5, cooldown=30.0, max_cooldown=300.0):
+        self.max_failures = failures
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.open_until = 0.0
+
+    def allow(self, now):
+        """Return whether a request can be sent, letting one probe through once
+        the cooldown has passed
+        """
+        if self.state == self.CLOSED:
+            return True
+        if now >= self.open_until:
+            # another probe if the last one didn't come back within the cooldown
+            self.state = self.HALF_OPEN
+            self.open_until = now + self.cooldown
+            return True
+        return False
+
+    def success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.cooldown = self.base_cooldown
+
+    def failure(self, now):
+        """Record a failed request, returning True if it opened the circuit"""
+        self.failures += 1
+        if self.state == self.HALF_OPEN:
+            self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+        elif self.failures < self.max_failures or self.state == self.OPEN:
+            return False
+        self.state = self.OPEN
+        self.open_until = now + self.cooldown
+        return True
+
+
+class HostThrottleMiddleware:
+    """
+    Downloader middleware that replaces AutoThrottle with per-host adaptive
+    concurrency and a circuit breaker for hosts that are down.
+
+    Each download slot (the host, unless a request sets its own) starts at
+    CONCURRENT_REQUESTS_PER_DOMAIN. It gains one concurrent request for every
+    round of responses faster than the host's target latency, and loses one for
+    each slower response. Errors halve its concurrency and double its delay. The
+    minimum, maximum and target latency come from CITY_SCRAPERS_HOST_* settings,
+    and CITY_SCRAPERS_HOST_PROFILES can override them by host.
+
+    Connection errors, timeouts, 5xx and 429 responses count as failures for the
+    host's HostCircuit. While the circuit is open, requests (including retries)
+    are ignored without being sent. Latency percentiles, errors, peak concurrency
+    and requests failed fast are added to the stats per host when the spider
+    closes.
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        settings = crawler.settings
+        self.default_profile = {
+            "min_concurrency": settings.getint("CITY_SCRAPERS_HOST_MIN_CONCURRENCY", 1),
+            "max_concurrency": settings.getint("CITY_SCRAPERS_HOST_MAX_CONCURRENCY", 8),
+            "target_latency": settings.getfloat(
+                "CITY_SCRAPERS_HOST_TARGET_LATENCY", 2.0
+            ),
+        }
+        self.profiles = settings.getdict("CITY_SCRAPERS_HOST_PROFILES")
+        self.min_delay = settings.getfloat("DOWNLOAD_DELAY")
+        self.max_delay = settings.getfloat("CITY_SCRAPERS_HOST_MAX_DELAY", 30.0)
+        self.circuit_args = {
+            "failures": settings.getint("CITY_SCRAPERS_CIRCUIT_FAILURES", 5),
+            "cooldown": settings.getfloat("CITY_SCRAPERS_CIRCUIT_COOLDOWN", 30.0),
+            "max_cooldown": settings.getfloat(
+                "CITY_SCRAPERS_CIRCUIT_MAX_COOLDOWN", 300.0
+            ),
+        }
+        self.circuits = {}
+        self.latencies = {}
+        self.successes = {}
+        self.peak_concurrency = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("CITY_SCRAPERS_HOST_THROTTLE"):
+            raise NotConfigured
+        middleware = cls(crawler)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def profile(self, host):
+        return {**self.default_profile, **self.profiles.get(host, {})}
+
+    def circuit(self, host):
+        if host not in self.circuits:
+            self.circuits[host] = HostCircuit(**self.circuit_args)
+        return self.circuits[host]
+
+    def process_request(self, request, spider):
+        host = urlparse(request.url).hostname or ""
+        if not self.circuit(host).allow(time.monotonic()):
+            self.crawler.stats.inc_value(f"hosts/{host}/failed_fast", spider=spider)
+            raise IgnoreRequest(f"Circuit open for {host}")
+
+    def process_response(self, request, response, spider):
+        if response.status >= 500 or response.status == 429:
+            self.failed(request, spider)
+        else:
+            self.succeeded(request, spider)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        if not isinstance(exception, IgnoreRequest):
+            self.failed(request, spider)
+
+    def succeeded(self, request, spider):
+        host = urlparse(request.url).hostname or ""
+        self.circuit(host).success()
+        latency = request.meta.get("download_latency")
+        if latency is None:
+            # not downloaded, e.g. served from the cache
+            return
+        if host not in self.latencies:
+            self.latencies[host] = Histogram()
+        self.latencies[host].add(latency)
+        slot_key, slot = self.slot(request)
+        if slot is None:
+            return
+        profile = self.profile(host)
+        if latency > profile["target_latency"]:
+            slot.concurrency = max(slot.concurrency - 1, profile["min_concurrency"])
+            self.successes[slot_key] = 0
+            return
+        # additive increase: one more request per round of fast responses
+        self.successes[slot_key] = self.successes.get(slot_key, 0) + 1
+        if self.successes[slot_key] >= slot.concurrency:
+            self.successes[slot_key] = 0
+            slot.concurrency = min(slot.concurrency + 1, profile["max_concurrency"])
+            slot.delay = max(slot.delay / 2, self.min_delay)
+        self.peak_concurrency[host] = max(
+            self.peak_concurrency.get(host, 0), slot.concurrency
+        )
+
+    def failed(self, request, spider):
+        host = urlparse(request.url).hostname or ""
+        stats = self.crawler.stats
+        stats.inc_value(f"hosts/{host}/errors", spider=spider)
+        if self.circuit(host).failure(time.monotonic()):
+            stats.inc_value(f"hosts/{host}/circuit_opened", spider=spider)
+            logger.warning("Too many failed requests to %s, pausing requests", host)
+            self.fail_queued(host, spider)
+        slot_key, slot = self.slot(request)
+        if slot is None:
+            return
+        profile = self.profile(host)
+        slot.concurrency = max(slot.concurrency // 2, profile["min_concurrency"])
+        slot.delay = min(max(slot.delay * 2, 0.5), self.max_delay)
+        self.successes[slot_key] = 0
+
+    def fail_queued(self, host, spider):
+        """
+        Ignore requests to a host that were already waiting in a downloader slot
+        when its circuit opened, rather than sending them after the slot's delay
+        """
+        engine = self.crawler.engine
+        if engine is None:
+            return
+        for slot in engine.downloader.slots.values():
+            waiting = deque()
+            while slot.queue:
+                request, deferred = slot.queue.popleft()
+                if urlparse(request.url).hostname != host:
+                    waiting.append((request, deferred))
+                    continue
+                self.crawler.stats.inc_value(f"hosts/{host}/failed_fast", spider=spider)
+                deferred.errback(IgnoreRequest(f"Circuit open for {host}"))
+            slot.queue.extend(waiting)
+
+    def slot(self, request):
+        key = request.meta.get("download_slot")
+        engine = self.crawler.engine
+        if key is None or engine is None:
+            return key, None
+        return key, engine.downloader.slots.get(key)
+
+    def spider_closed(self, spider):
+        stats = self.crawler.stats
+        for host, histogram in self.latencies.items():
+            for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+                stats.set_value(
+                    f"hosts/{host}/latency_{name}_ms",
+                    round(histogram.percentile(fraction), 3),
+                    spider=spider,
+                )
+            stats.set_value(f"hosts/{host}/responses", histogram.count, spider=spider)
+        for host, concurrency in self.peak_concurrency.items():
+            stats.set_value(
+                f"hosts/{host}/peak_concurrency", concurrency, spider=spider
+            )
+
+
+class RevalidatePolicy(RFC2616Policy):
+    """
+    HTTP cache policy that stores every successful response and revalidates it on
+    each request with If-None-Match/If-Modified-Since. If the server doesn't send
+    validators the response is downloaded again and compared with the cached body.
+
+    Cache keys come from Scrapy's request fingerprint, which includes the method
+    and body, so POST requests like the BoardDocs meetings list are keyed by their
+    form data (e.g. current_committee_id) as well as the URL.
+    """
+
+    def should_cache_response(self, response, request):
+        cc = self._parse_cachecontrol(response)
+        return response.status == 200 and b"no-store" not in cc
+
+    def is_cached_response_fresh(self, cachedresponse, request):
+        self._set_conditional_validators(request, cachedresponse)
+        return False
+
+    def is_cached_response_valid(self, cachedresponse, response, request):
+        if response.status == 304:
+            return True
+        if response.status != 200:
+            return super().is_cached_response_valid(cachedresponse, response, request)
+        return response.body == cachedresponse.body
+
+
+class ConditionalHttpCacheMiddleware(HttpCacheMiddleware):
+    """
+    HttpCacheMiddleware that flags responses that haven't changed since the last
+    crawl and records how much was saved by revalidating.
+
+    Unchanged responses have "unchanged" in their flags and
+    ``response.meta["httpcache_unchanged"]`` set. If CITY_SCRAPERS_SKIP_UNCHANGED is
+    enabled (or the request has a "skip_unchanged" meta key) the request is ignored
+    instead so the spider callback isn't run at all.
+    """
+
+    def __init__(self, settings, stats):
+        super().__init__(settings, stats)
+        self.skip_unchanged = settings.getbool("CITY_SCRAPERS_SKIP_UNCHANGED")
+
+    def process_response(self, request, response, spider):
+        cachedresponse = request.meta.get("cached_response")
+        result = super().process_response(request, response, spider)
+        if (
+            cachedresponse is None
+            or result is not cachedresponse
+            or response.status not in (200, 304)
+        ):
+            return result
+
+        if response.status == 304:
+            self.stats.inc_value("httpcache/not_modified", spider=spider)
+            self.stats.inc_value(
+                "httpcache/bytes_saved", len(cachedresponse.body), spider=spider
+            )
+        else:
+            self.stats.inc_value("httpcache/hash_match", spider=spider)
+        self.stats.inc_value("httpcache/unchanged", spider=spider)
+
+        request.meta["httpcache_unchanged"] = True
+        if request.meta.get("skip_unchanged", self.skip_unchanged):
+            raise IgnoreRequest(f"Response unchanged since last crawl: {request}")
+        cachedresponse.flags.append("unchanged")
+        return cachedresponse
@@ -0,0 +1 @@
+from .boarddocs import BoardDocsCommittee, BoardDocsMixin  # noqa
@@ -0,0 +1,191 @@
+from collections import namedtuple
+from datetime import datetime
+from urllib.parse import parse_qs, urlparse
+
+import scrapy
+from city_scrapers_core.constants import COMMISSION
+
+from city_scrapers.dates import parse_datetime
+from city_scrapers.items import CompactMeeting
+from city_scrapers.status import meeting_id
+from city_scrapers.utils import iter_json_array
+
+BOARDDOCS_URL = "https://go.boarddocs.com"
+
+# A BoardDocs committee: the board path in BoardDocs URLs (e.g. "oh/csc"), the
+# committee ID posted to BD-GetMeetingsList, and the agency name and location dict
+# used for its meetings
+BoardDocsCommittee = namedtuple(
+    "BoardDocsCommittee", ["board", "committee_id", "agency", "location"]
+)
+
+
+class BoardDocsMixin:
+    """
+    Mixin for spiders that scrape BoardDocs meetings lists. Spiders list one or more
+    BoardDocsCommittee entries in ``committees``, and the meetings lists for all of
+    them are requested at once and parsed the same way. When there's more than one,
+    meeting IDs include the committee ID, so meetings of different committees with
+    the same title and start don't collide, and DedupePipeline matches meetings on
+    their committee's agency.
+
+    Meetings can be enriched (see EnrichmentPipeline) with the titles of the
+    categories and items on their agendas as the description.
+
+    Each committee gets its own download slot, so AutoThrottle doesn't space out
+    requests to different committees on the same host. The requests still share the
+    downloader's persistent connections to go.boarddocs.com.
+    """
+
+    committees = []
+    classification = COMMISSION
+    # meetings are kept for this many months back
+    months_back = 6
+    # rows past the cutoff that have to be in order before parsing stops early
+    order_check_rows = 5
+    # the meetings list is an API behind the public page, which robots.txt disallows
+    custom_settings = {
+        "ROBOTSTXT_OBEY": False,
+    }
+
+    def start_requests(self):
+        for committee in self.committees:
+            yield scrapy.FormRequest(
+                f"{BOARDDOCS_URL}/{committee.board}/Board.nsf/BD-GetMeetingsList",
+                formdata={"current_committee_id": committee.committee_id},
+                callback=self.parse,
+                cb_kwargs={"committee": committee},
+                meta={"download_slot": f"boarddocs/{committee.committee_id}"},
+                dont_filter=True,
+            )
+
+    def parse(self, response, committee=None):
+        """
+        Parse a committee's meetings list, by default the first committee's.
+
+        The meetings list includes every meeting the committee has had, newest first,
+        so rows are read one at a time and parsing stops once a few rows in a row are
+        past the cutoff. If the list turns out not to be sorted the whole list is read.
+        """
+        from dateutil.relativedelta import relativedelta
+
+        committee = committee or self.committees[0]
+        lower_limit = datetime.now() - relativedelta(months=self.months_back)
+        previous_date = None
+        in_order = True
+        rows_past_cutoff = 0
+        count = 0
+
+        for item in iter_json_array(response.text):
+            numb = item.get("numberdate")
+
+            # skip if no date or meeting is too old
+            if numb is None:
+                continue
+            meeting_date = parse_datetime(numb)
+            if in_order and previous_date is not None and meeting_date > previous_date:
+                self.logger.warning("Meetings list isn't sorted, reading all rows")
+                in_order = False
+            previous_date = meeting_date
+            if meeting_date < lower_limit:
+                rows_past_cutoff += 1
+                if in_order and rows_past_cutoff > self.order_check_rows:
+                    break
+                continue
+
+            meeting = CompactMeeting(
+                title=item["name"],
+                description="",
+                classification=self.classification,
+                start=meeting_date,
+                end=None,
+                all_day=False,
+                time_notes="",
+                location=self._parse_location(item, committee),
+                links=self._parse_links(item, committee),
+                source=self._parse_source(committee),
+            )
+            if len(self.committees) > 1:
+                meeting["id"] = meeting_id(self.name, meeting, committee.committee_id)
+            count += 1
+
+            yield meeting
+
+        self._record_committee(response, committee, count)
+
+    def _record_committee(self, response, committee, count):
+        """Log and add stats for a committee's download time and meeting count"""
+        try:
+            latency = response.meta.get("download_latency")
+        except AttributeError:
+            # responses without a request, like test fixtures
+            latency = None
+        crawler = getattr(self, "crawler", None)
+        if crawler is not None:
+            prefix = f"boarddocs/{committee.committee_id}"
+            crawler.stats.set_value(f"{prefix}/meetings", count, spider=self)
+            if latency is not None:
+                crawler.stats.set_value(
+                    f"{prefix}/download_ms", round(latency * 1000), spider=self
+                )
+        self.logger.info(
+            "%s (%s): %d meetings, downloaded in %s",
+            committee.agency,
+            committee.committee_id,
+            count,
+            "unknown time" if latency is None else f"{latency * 1000:.0f} ms",
+        )
+
+    def meeting_agency(self, item):
+        """Return the agency of a meeting's committee, for DedupePipeline"""
+        for link in item["links"]:
+            if "/Download-AgendaDetailed?" not in link["href"]:
+                continue
+            query = parse_qs(urlparse(link["href"]).query)
+            for committee in self.committees:
+                if committee.committee_id == query["current_committee_id"][0]:
+                    return committee.agency
+        return self.agency
+
+    def _parse_location(self, item, committee):
+        return committee.location
+
+    def _parse_links(self, item, committee):
+        href = (
+            f"{BOARDDOCS_URL}/{committee.board}/Board.nsf/Download-AgendaDetailed?"
+            f"open&id={item['unique']}&current_committee_id={committee.committee_id}"
+        )
+        return [{"title": "Agenda", "href": href}]
+
+    def _parse_source(self, committee):
+        """
+        Link to the public meetings page rather than the meetings list API
+        """
+        return f"{BOARDDOCS_URL}/{committee.board}/Board.nsf/vpublic?open#tab-meetings"
+
+    def enrich_request(self, item):
+        """Request the meeting's agenda, for EnrichmentPipeline"""
+        for link in item["links"]:
+            if "/Download-AgendaDetailed?" not in link["href"]:
+                continue
+            url = urlparse(link["href"])
+            query = parse_qs(url.query)
+            committee_id = query["current_committee_id"][0]
+            return scrapy.FormRequest(
+                f"{BOARDDOCS_URL}{url.path.rsplit('/', 1)[0]}/BD-GetAgenda",
+                formdata={"id": query["id"][0], "current_committee_id": committee_id},
+                meta={"download_slot": f"boarddocs/{committee_id}"},
+            )
+        return None
+
+    def parse_enrichment(self, item, response):
+        """
+        Use the agenda's category and item titles as the description, one per line
+        """
+        titles = (
+            " ".join(" ".join(title.css("*::text").getall()).split())
+            for title in response.css(
+                ".wrap-category .category.name, .wrap-category .item .title"
+            )
+        )
+        return {"description": "\n".join(title for title in titles if title)}
@@ -0,0 +1,11 @@
+from .dedupe import DedupePipeline  # noqa
+from .diff import LocalDiffPipeline  # noqa
+from .enrich import EnrichmentPipeline  # noqa
+from .incremental import IncrementalPipeline  # noqa
+
+__all__ = [
+    "DedupePipeline",
+    "EnrichmentPipeline",
+    "IncrementalPipeline",
+    "LocalDiffPipeline",
+]
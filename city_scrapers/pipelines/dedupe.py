@@ -0,0 +1,228 @@
+import json
+import logging
+import re
+from datetime import datetime, timedelta
+from hashlib import sha1
+
+from city_scrapers_core.decorators import ignore_processed
+from scrapy import signals
+from scrapy.exceptions import DropItem, NotConfigured
+
+from ..items import MEETING_TYPES
+from ..store import DedupeIndex, state_path
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+# Words left out of title token sets, since they don't tell meetings apart
+STOP_WORDS = frozenset(
+    ["a", "an", "and", "for", "in", "meeting", "of", "on", "regular", "session", "the"]
+)
+
+
+def title_tokens(title):
+    return frozenset(TOKEN_RE.findall(title.lower())) - STOP_WORDS
+
+
+def normalize_agency(agency):
+    return " ".join(TOKEN_RE.findall(agency.lower()))
+
+
+def dedupe_parts(agency, item):
+    """
+    Return the normalized key of a meeting's agency, date, time and title tokens,
+    and the day, time and tokens it's fuzzy matched on. Meetings at midnight are
+    taken not to have a time.
+    """
+    start = item["start"]
+    day = start.date().isoformat()
+    time = "" if (start.hour, start.minute) == (0, 0) else start.strftime("%H:%M")
+    tokens = title_tokens(item["title"])
+    normalized = "|".join(
+        [
+            normalize_agency(agency),
+            day,
+            time,
+            " ".join(sorted(tokens)),
+        ]
+    )
+    return sha1(normalized.encode()).hexdigest(), day, time, tokens
+
+
+def similarity(tokens, other_tokens):
+    """
+    Jaccard similarity of two title token sets, or 0 if either is empty, like for
+    a title of only stop words ("Regular Meeting")
+    """
+    if not tokens or not other_tokens:
+        return 0.0
+    return len(tokens & other_tokens) / len(tokens | other_tokens)
+
+
+class DedupePipeline:
+    """
+    Drops meetings that duplicate a meeting from this or any other spider, in this
+    run or an earlier one, when CITY_SCRAPERS_DEDUPE is enabled. Meetings match when
+    they have the same normalized key (agency, date, time and title tokens), or
+    failing that when they're from the same agency on the same day at the same time
+    (or either has no time) and their title tokens are at least
+    CITY_SCRAPERS_DEDUPE_THRESHOLD similar. Titles of agencies in the same group of
+    CITY_SCRAPERS_DEDUPE_JOINT_AGENCIES are matched across them, for joint sessions.
+    Only meetings on the same day are compared, using the shared DedupeIndex in the
+    state directory.
+
+    The meeting first seen is kept and the links of its duplicates are merged into
+    it, in the same run if its spider hasn't output it yet and otherwise the next
+    time it's scraped. Meetings that haven't been seen for
+    CITY_SCRAPERS_DEDUPE_MAX_AGE days aren't matched against. Duplicates and merges
+    are counted in the stats and written to ``<spider>.dedupe.jsonl`` in the state
+    directory.
+    """
+
+    def __init__(
+        self,
+        crawler,
+        index,
+        threshold=0.8,
+        max_age=timedelta(days=7),
+        joint_agencies=(),
+    ):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.index = index
+        self.threshold = threshold
+        self.max_age = max_age
+        self.joint_agencies = [
+            frozenset(normalize_agency(agency) for agency in group)
+            for group in joint_agencies
+        ]
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("CITY_SCRAPERS_DEDUPE"):
+            raise NotConfigured
+        pipeline = cls(
+            crawler,
+            DedupeIndex.from_settings(settings),
+            threshold=settings.getfloat("CITY_SCRAPERS_DEDUPE_THRESHOLD", 0.8),
+            max_age=timedelta(
+                days=settings.getfloat("CITY_SCRAPERS_DEDUPE_MAX_AGE", 7)
+            ),
+            joint_agencies=settings.getlist("CITY_SCRAPERS_DEDUPE_JOINT_AGENCIES"),
+        )
+        crawler.signals.connect(pipeline.spider_closed, signal=signals.spider_closed)
+        return pipeline
+
+    def open_spider(self, spider):
+        self.decisions = []
+        self.seen_ids = set()
+
+    @ignore_processed
+    def process_item(self, item, spider):
+        if not isinstance(item, MEETING_TYPES):
+            return item
+        if item["id"] in self.seen_ids:
+            # e.g. from overlapping Legistar time windows
+            raise DropItem("Item has already been scraped")
+        self.seen_ids.add(item["id"])
+
+        now = datetime.now().isoformat()
+        # spiders for several agencies say which one a meeting is for
+        if hasattr(spider, "meeting_agency"):
+            spider_agency = spider.meeting_agency(item)
+        else:
+            spider_agency = spider.agency
+        agency = normalize_agency(spider_agency)
+        parts = dedupe_parts(spider_agency, item)
+        seen_order = self.index.seen_order(spider.name, item["id"])
+        match = self.match(agency, parts, seen_order)
+        if match is not None:
+            duplicate_of, how, score = match
+            self.index.save(
+                spider.name,
+                item["id"],
+                agency,
+                parts,
+                item["links"],
+                seen_order,
+                now,
+                duplicate_of,
+            )
+            self.stats.inc_value("dedupe/duplicates", spider=spider)
+            self.stats.inc_value(f"dedupe/duplicates/{how}", spider=spider)
+            self.decisions.append(
+                {
+                    "id": item["id"],
+                    "duplicate_of": {"spider": duplicate_of[0], "id": duplicate_of[1]},
+                    "match": how,
+                    "score": score,
+                }
+            )
+            raise DropItem(f"Meeting duplicates {duplicate_of[1]}")
+
+        self.index.save(
+            spider.name, item["id"], agency, parts, item["links"], seen_order, now, None
+        )
+        merged = self.merge_links(item, spider)
+        if merged:
+            self.stats.inc_value("dedupe/merged_links", merged, spider=spider)
+            self.decisions.append({"id": item["id"], "merged_links": merged})
+        return item
+
+    def match(self, agency, parts, seen_order):
+        """
+        Return ((spider, id), "key" or "title", score) for the meeting this one
+        duplicates, or None
+        """
+        key, day, time, tokens = parts
+        seen_since = (datetime.now() - self.max_age).isoformat()
+        rows = self.index.candidates(key, day, seen_order, seen_since)
+        best = None
+        for row in rows:
+            (
+                spider_name,
+                meeting_id,
+                same_key,
+                other_agency,
+                other_time,
+                other_tokens,
+            ) = row
+            if same_key:
+                return (spider_name, meeting_id), "key", 1.0
+            if not self.same_agency(agency, other_agency):
+                continue
+            if time and other_time and time != other_time:
+                continue
+            score = similarity(tokens, frozenset(other_tokens.split()))
+            if score >= self.threshold and (best is None or score > best[2]):
+                best = ((spider_name, meeting_id), "title", round(score, 3))
+        return best
+
+    def same_agency(self, agency, other_agency):
+        """Whether titles of two agencies' meetings are matched"""
+        if agency == other_agency:
+            return True
+        return any(
+            agency in group and other_agency in group for group in self.joint_agencies
+        )
+
+    def merge_links(self, item, spider):
+        """Add links from the meeting's duplicates, returning how many were added"""
+        links = list(item["links"])
+        hrefs = {link["href"] for link in links}
+        for link in self.index.duplicate_links(spider.name, item["id"]):
+            if link["href"] not in hrefs:
+                hrefs.add(link["href"])
+                links.append(link)
+        added = len(links) - len(item["links"])
+        item["links"] = links
+        return added
+
+    def spider_closed(self, spider):
+        self.index.close()
+        path = state_path(self.crawler.settings, f"{spider.name}.dedupe.jsonl")
+        with open(path, "w") as f:
+            for decision in self.decisions:
+                f.write(json.dumps(decision) + "\n")
+        logger.info("%d dedupe decisions written to %s", len(self.decisions), path)
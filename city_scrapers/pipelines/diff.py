@@ -0,0 +1,163 @@
+import logging
+import shutil
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlparse
+
+from city_scrapers_core.constants import CANCELLED
+from city_scrapers_core.items import Meeting
+from scrapy import signals
+from scrapy.exceptions import DontCloseSpider, DropItem
+from scrapy.http import Response
+from scrapy.utils.url import file_uri_to_path
+
+from ..store import DiffStore, state_path
+
+logger = logging.getLogger(__name__)
+
+
+class LocalDiffPipeline:
+    """
+    Drop-in replacement for city_scrapers_core's AzureDiffPipeline that compares
+    meetings against a local DiffStore instead of downloading and parsing the
+    previous feed. As with DiffPipeline, duplicate meetings are dropped, meetings
+    keep the OCD ID they were last output with, and upcoming meetings from previous
+    runs that weren't scraped this time are output again as cancelled once the
+    spider is idle.
+
+    Every meeting is saved to the store as it's scraped, so a run only reads the
+    stored IDs up front and the upcoming meetings at the end. If there's no store
+    for the spider yet it's seeded once from the previous feed on Azure.
+
+    Setting CITY_SCRAPERS_DIFF_SNAPSHOT_URI (a file:// or azure:// URI with a
+    %(name)s placeholder) keeps a remote copy of each spider's store, downloaded
+    when there's no local copy and uploaded when the spider closes.
+    """
+
+    def __init__(self, crawler, store, snapshot_uri=None):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.store = store
+        self.snapshot_uri = snapshot_uri
+        self.ocd_ids = store.ocd_ids()
+        self.scraped_ids = set()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        pipelines = crawler.settings.get("ITEM_PIPELINES", {})
+        if "city_scrapers_core.pipelines.OpenCivicDataPipeline" not in pipelines:
+            raise ValueError(
+                "An output format pipeline must be enabled for diff middleware"
+            )
+        settings = crawler.settings
+        spider_name = crawler.spider.name
+        path = state_path(settings, f"{spider_name}.diff.db")
+        snapshot_uri = settings.get("CITY_SCRAPERS_DIFF_SNAPSHOT_URI")
+        if snapshot_uri:
+            snapshot_uri = snapshot_uri % {"name": spider_name}
+            if not Path(path).exists():
+                download_snapshot(snapshot_uri, path)
+        store = DiffStore(path)
+        if len(store) == 0:
+            seed_store(crawler, store)
+        pipeline = cls(crawler, store, snapshot_uri=snapshot_uri)
+        crawler.signals.connect(pipeline.spider_idle, signal=signals.spider_idle)
+        crawler.signals.connect(pipeline.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(pipeline.spider_closed, signal=signals.spider_closed)
+        return pipeline
+
+    def process_item(self, item, spider):
+        if isinstance(item, dict) and "_id" in item:
+            # previous meetings are only output again once they've been compared
+            return item
+        if item["id"] in self.scraped_ids:
+            raise DropItem("Item has already been scraped")
+        self.scraped_ids.add(item["id"])
+        if item["id"] in self.ocd_ids:
+            self.stats.inc_value("diff/matched", spider=spider)
+            # Bypass __setitem__ call on Meeting to add uid
+            if isinstance(item, Meeting):
+                item._values["_id"] = self.ocd_ids[item["id"]]
+            else:
+                item["_id"] = self.ocd_ids[item["id"]]
+        return item
+
+    def item_scraped(self, item, response, spider):
+        if isinstance(item, dict) and "_id" in item:
+            self.store.save(item)
+
+    def spider_idle(self, spider):
+        """Output upcoming meetings that weren't scraped this run as cancelled"""
+        self.crawler.signals.disconnect(self.spider_idle, signal=signals.spider_idle)
+        now = datetime.now().isoformat()[:19]
+        vanished = [
+            item
+            for meeting_id, item in self.store.upcoming(now)
+            if meeting_id not in self.scraped_ids
+        ]
+        scraper = self.crawler.engine.scraper
+        for item in vanished:
+            self.stats.inc_value("diff/cancelled", spider=spider)
+            scraper._process_spidermw_output(
+                {**item, "status": CANCELLED}, None, Response(""), spider
+            )
+        raise DontCloseSpider
+
+    def spider_closed(self, spider):
+        self.store.close()
+        if self.snapshot_uri:
+            upload_snapshot(self.store.path, self.snapshot_uri)
+            logger.info("Uploaded diff store snapshot to %s", self.snapshot_uri)
+
+
+def seed_store(crawler, store):
+    """Fill an empty store from the spider's previous feed on Azure, if there is one"""
+    if urlparse(crawler.settings.get("FEED_URI") or "").scheme != "azure":
+        return
+    from city_scrapers_core.pipelines import AzureDiffPipeline
+
+    previous = AzureDiffPipeline(crawler, "ocd").load_previous_results()
+    for item in previous:
+        store.save(item)
+    store.commit()
+    crawler.stats.set_value("diff/seeded", len(previous))
+
+
+def _blob_client(uri):
+    from azure.storage.blob import BlobClient
+
+    account_name, account_key = uri[8::].split("@")[0].split(":")
+    container = uri.split("@")[1].split("/")[0]
+    blob_name = "/".join(uri.split("@")[1].split("/")[1::])
+    return BlobClient(
+        f"https://{account_name}.blob.core.windows.net",
+        container,
+        blob_name,
+        credential=account_key,
+    )
+
+
+def download_snapshot(uri, path):
+    """Copy a store snapshot to a local path, returning False if there isn't one"""
+    if urlparse(uri).scheme == "file":
+        snapshot_path = Path(file_uri_to_path(uri))
+        if not snapshot_path.exists():
+            return False
+        shutil.copyfile(snapshot_path, path)
+        return True
+    blob_client = _blob_client(uri)
+    if not blob_client.exists():
+        return False
+    with open(path, "wb") as f:
+        blob_client.download_blob().readinto(f)
+    return True
+
+
+def upload_snapshot(path, uri):
+    if urlparse(uri).scheme == "file":
+        snapshot_path = Path(file_uri_to_path(uri))
+        snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(path, snapshot_path)
+        return
+    with open(path, "rb") as f:
+        _blob_client(uri).upload_blob(f, overwrite=True)
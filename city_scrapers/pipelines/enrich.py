@@ -0,0 +1,127 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from city_scrapers_core.decorators import ignore_processed
+from scrapy import signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.httpobj import urlparse_cached
+from twisted.internet import defer
+
+from ..items import MEETING_TYPES
+from ..store import EnrichmentCache, meeting_hash
+
+logger = logging.getLogger(__name__)
+
+
+class EnrichmentPipeline:
+    """
+    Fetches a detail or agenda page for each new or changed meeting and merges the
+    fields the spider parses from it into the meeting, when CITY_SCRAPERS_ENRICH is
+    enabled. Spiders opt in with two methods: ``enrich_request(item)`` returns the
+    Request for a meeting's page (or None), and ``parse_enrichment(item, response)``
+    returns a dict of fields to set on the meeting.
+
+    Parsed fields are cached by meeting ID and hash, so a meeting that hasn't
+    changed since it was enriched gets the same fields again without a fetch. Pages
+    are downloaded through the engine, at most CITY_SCRAPERS_ENRICH_CONCURRENCY at
+    a time per host, and kept in a content-addressed cache in the state directory
+    for CITY_SCRAPERS_ENRICH_PAGE_TTL hours. Meetings that can't be enriched are
+    passed on as they were.
+    """
+
+    def __init__(self, crawler, cache, concurrency=2, page_ttl=timedelta(hours=20)):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.cache = cache
+        self.page_ttl = page_ttl
+        self.semaphores = defaultdict(lambda: defer.DeferredSemaphore(concurrency))
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("CITY_SCRAPERS_ENRICH"):
+            raise NotConfigured
+        pipeline = cls(
+            crawler,
+            EnrichmentCache.from_settings(settings),
+            concurrency=settings.getint("CITY_SCRAPERS_ENRICH_CONCURRENCY", 2),
+            page_ttl=timedelta(
+                hours=settings.getfloat("CITY_SCRAPERS_ENRICH_PAGE_TTL", 20)
+            ),
+        )
+        crawler.signals.connect(pipeline.spider_closed, signal=signals.spider_closed)
+        return pipeline
+
+    @ignore_processed
+    def process_item(self, item, spider):
+        if not isinstance(item, MEETING_TYPES) or not hasattr(spider, "enrich_request"):
+            return item
+        item_hash = meeting_hash(item)
+        fields = self.cache.get_fields(spider.name, item["id"], item_hash)
+        if fields is not None:
+            self.stats.inc_value("enrich/cached", spider=spider)
+            item.update(fields)
+            return item
+        request = spider.enrich_request(item)
+        if request is None:
+            return item
+        deferred = self.fetch(request, spider)
+        deferred.addCallback(self.enrich, item, item_hash, spider)
+        deferred.addErrback(self.enrich_failed, item, request, spider)
+        return deferred
+
+    def fetch(self, request, spider):
+        """Return a Deferred for the response to a request, from the page cache if
+        it was fetched recently
+        """
+        fingerprint = self.crawler.request_fingerprinter.fingerprint(request).hex()
+        cached = self.cache.get_page(fingerprint, datetime.now() - self.page_ttl)
+        if cached is not None:
+            self.stats.inc_value("enrich/page_cached", spider=spider)
+            url, content_type, body = cached
+            headers = {"Content-Type": content_type}
+            respcls = responsetypes.from_args(headers=headers, url=url, body=body)
+            return defer.succeed(
+                respcls(url=url, headers=headers, body=body, request=request)
+            )
+        semaphore = self.semaphores[urlparse_cached(request).netloc]
+        deferred = semaphore.run(self.crawler.engine.download, request)
+        deferred.addCallback(self.save_page, fingerprint, spider)
+        return deferred
+
+    def save_page(self, response, fingerprint, spider):
+        if response.status != 200:
+            raise IgnoreRequest(f"Got status {response.status}")
+        self.stats.inc_value("enrich/fetched", spider=spider)
+        self.cache.save_page(
+            fingerprint,
+            response.url,
+            response.headers.get("Content-Type", b"").decode("latin-1"),
+            response.body,
+            datetime.now(),
+        )
+        return response
+
+    def enrich(self, response, item, item_hash, spider):
+        fields = spider.parse_enrichment(item, response) or {}
+        item.update(fields)
+        self.cache.save_fields(
+            spider.name, item["id"], item_hash, fields, datetime.now()
+        )
+        self.stats.inc_value("enrich/enriched", spider=spider)
+        return item
+
+    def enrich_failed(self, failure, item, request, spider):
+        self.stats.inc_value("enrich/failed", spider=spider)
+        logger.warning(
+            "Couldn't enrich %s from %s: %s",
+            item["id"],
+            request.url,
+            failure.getErrorMessage(),
+        )
+        return item
+
+    def spider_closed(self, spider):
+        self.cache.close()
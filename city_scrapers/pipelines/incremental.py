@@ -0,0 +1,104 @@
+import json
+import logging
+from datetime import datetime
+
+from city_scrapers_core.decorators import ignore_processed
+from itemadapter import ItemAdapter
+from scrapy import signals
+from scrapy.exceptions import DropItem, NotConfigured
+from scrapy.utils.serialize import ScrapyJSONEncoder
+
+from ..items import MEETING_TYPES
+from ..store import UNCHANGED, VANISHED, MeetingIndex, meeting_hash, state_path
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalPipeline:
+    """
+    Pipeline for incremental crawls. Compares each meeting against the hash stored in
+    the local meeting index and drops the ones that haven't changed since the last
+    run, unless CITY_SCRAPERS_INCREMENTAL_FULL is set (``scrapy crawl --full``).
+
+    New, changed and vanished meetings are counted in the stats and written to
+    ``<spider>.changes.jsonl`` in the state directory. Meetings are only marked as
+    vanished after a crawl that finished cleanly, and only if they're upcoming.
+
+    The feed line of every meeting that's exported is kept in the index as well, so
+    combinefeeds can add the unchanged meetings back and leave vanished ones out.
+    """
+
+    def __init__(self, crawler, index, full=False):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.index = index
+        self.full = full
+        self.encoder = ScrapyJSONEncoder()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("CITY_SCRAPERS_INCREMENTAL"):
+            raise NotConfigured
+        pipeline = cls(
+            crawler,
+            MeetingIndex.from_settings(crawler.settings),
+            full=crawler.settings.getbool("CITY_SCRAPERS_INCREMENTAL_FULL"),
+        )
+        crawler.signals.connect(pipeline.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(pipeline.spider_closed, signal=signals.spider_closed)
+        return pipeline
+
+    def open_spider(self, spider):
+        self.started_at = datetime.now()
+        self.changes = []
+
+    @ignore_processed
+    def process_item(self, item, spider):
+        if not isinstance(item, MEETING_TYPES):
+            return item
+        change = self.index.record(
+            spider.name, item, meeting_hash(item), self.started_at
+        )
+        self.stats.inc_value(f"incremental/{change}", spider=spider)
+        if change == UNCHANGED:
+            if self.full:
+                return item
+            raise DropItem("Meeting is unchanged since the last run")
+        self.changes.append({"id": item["id"], "change": change})
+        return item
+
+    def item_scraped(self, item, spider):
+        """Keep the line of each meeting in the feed, after every other pipeline"""
+        if isinstance(item, MEETING_TYPES):
+            meeting_id = item.get("id")
+        elif isinstance(item, dict):
+            # Open Civic Data events from OpenCivicDataPipeline, or previous items
+            # re-emitted by a diff pipeline
+            extras = item.get("extras") or {}
+            meeting_id = extras.get("cityscrapers/id") or item.get("id")
+        else:
+            return
+        if meeting_id:
+            self.index.save_item(
+                spider.name,
+                meeting_id,
+                self.encoder.encode(ItemAdapter(item).asdict()),
+                self.started_at,
+            )
+
+    def spider_closed(self, spider, reason):
+        if reason == "finished":
+            for meeting_id in self.index.mark_vanished(
+                spider.name, self.started_at, self.started_at
+            ):
+                self.stats.inc_value(f"incremental/{VANISHED}", spider=spider)
+                self.changes.append({"id": meeting_id, "change": VANISHED})
+        self.index.close()
+
+        changes_path = state_path(self.crawler.settings, f"{spider.name}.changes.jsonl")
+        with open(changes_path, "w") as f:
+            for change in self.changes:
+                f.write(json.dumps(change) + "\n")
+        logger.info(
+            "%d changed meetings written to %s", len(self.changes), changes_path
+        )
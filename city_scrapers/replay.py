@@ -0,0 +1,205 @@
+"""
+Record-and-replay support for running crawls without the network.
+
+In record mode every request/response pair a spider sees is written to a single
+archive file per spider. In replay mode a download handler serves responses from
+that archive instead of downloading them, so a full crawl (including middleware
+and pipelines) runs offline and deterministically.
+
+Archive layout::
+
+    MAGIC
+    record, record, ...       zlib-compressed, one per response
+    index                     zlib-compressed JSON of fingerprint -> [offset, size]
+    index offset, MAGIC       footer, 8-byte big-endian offset then MAGIC
+
+Records are keyed by Scrapy's request fingerprint, which includes the method and
+body, so POST requests like the BoardDocs meetings list are replayed by form data.
+Each record also keeps the request's method, URL, headers and base64-encoded body,
+so the request that was recorded can be inspected or sent again.
+"""
+
+import base64
+import json
+import mmap
+import struct
+import zlib
+from pathlib import Path
+
+from scrapy import signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.project import data_path
+from w3lib.http import headers_dict_to_raw, headers_raw_to_dict
+
+MAGIC = b"CSARCHV1"
+FOOTER = struct.Struct(">Q")
+# Flags HttpCacheMiddleware and ConditionalHttpCacheMiddleware add to responses
+CACHE_FLAGS = ("cached", "unchanged")
+
+
+def archive_path(settings, spider_name, create=False):
+    """Return the path of a spider's response archive"""
+    archive_dir = Path(data_path(settings.get("CITY_SCRAPERS_ARCHIVE_DIR", "archive")))
+    if create:
+        archive_dir.mkdir(parents=True, exist_ok=True)
+    return str(archive_dir / f"{spider_name}.archive")
+
+
+class ArchiveWriter:
+    """Appends compressed responses to an archive and writes the index on close"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.index = {}
+
+    def add(self, fingerprint, request, response):
+        header = {
+            "url": response.url,
+            "status": response.status,
+            "headers": headers_dict_to_raw(response.headers).decode("latin-1"),
+            # replayed responses don't come from the HTTP cache
+            "flags": [flag for flag in response.flags if flag not in CACHE_FLAGS],
+            "protocol": response.protocol,
+            "request": {
+                "method": request.method,
+                "url": request.url,
+                "headers": headers_dict_to_raw(request.headers).decode("latin-1"),
+                "body": base64.b64encode(request.body).decode("ascii"),
+            },
+        }
+        record = zlib.compress(json.dumps(header).encode() + b"\n" + response.body)
+        self.index[fingerprint] = [self.file.tell(), len(record)]
+        self.file.write(record)
+
+    def close(self):
+        offset = self.file.tell()
+        self.file.write(zlib.compress(json.dumps(self.index).encode()))
+        self.file.write(FOOTER.pack(offset) + MAGIC)
+        self.file.close()
+
+
+class ArchiveReader:
+    """Memory-mapped archive that decompresses records only when they're requested"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        footer_start = len(self.data) - FOOTER.size - len(MAGIC)
+        if (
+            footer_start < len(MAGIC)
+            or self.data[: len(MAGIC)] != MAGIC
+            or self.data[-len(MAGIC) :] != MAGIC
+        ):
+            self.data.close()
+            raise ValueError(f"{path} is not a complete response archive")
+        (offset,) = FOOTER.unpack(self.data[footer_start : footer_start + FOOTER.size])
+        self.index = json.loads(zlib.decompress(self.data[offset:footer_start]))
+
+    def __contains__(self, fingerprint):
+        return fingerprint in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def get(self, fingerprint):
+        """Return the stored header dict and body for a fingerprint, or None"""
+        if fingerprint not in self.index:
+            return None
+        offset, size = self.index[fingerprint]
+        header, _, body = zlib.decompress(self.data[offset : offset + size]).partition(
+            b"\n"
+        )
+        return json.loads(header), body
+
+    def close(self):
+        self.data.close()
+
+
+class RecordMiddleware:
+    """
+    Downloader middleware that writes every response the spider gets to its archive
+    when CITY_SCRAPERS_RECORD is enabled. It's ordered before the HTTP cache, so
+    responses served from the cache are recorded in full, and 304 Not Modified
+    responses are recorded as the cached response they were revalidated to.
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.writer = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("CITY_SCRAPERS_RECORD"):
+            raise NotConfigured
+        middleware = cls(crawler)
+        crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def spider_opened(self, spider):
+        path = archive_path(self.crawler.settings, spider.name, create=True)
+        self.writer = ArchiveWriter(path)
+        spider.logger.info("Recording responses to %s", path)
+
+    def spider_closed(self, spider):
+        self.writer.close()
+
+    def process_response(self, request, response, spider):
+        fingerprint = self.crawler.request_fingerprinter.fingerprint(request).hex()
+        self.writer.add(fingerprint, request, response)
+        self.crawler.stats.inc_value("record/responses", spider=spider)
+        self.crawler.stats.inc_value("record/bytes", len(response.body), spider=spider)
+        return response
+
+
+class ReplayDownloadHandler:
+    """
+    Download handler that serves responses from the spider's recorded archive.
+    Requests that weren't recorded are ignored.
+    """
+
+    lazy = False
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        path = archive_path(crawler.settings, crawler.spidercls.name)
+        try:
+            self.archive = ArchiveReader(path)
+        except FileNotFoundError:
+            raise NotConfigured(
+                f"No response archive at {path}, record one with "
+                "CITY_SCRAPERS_RECORD=true"
+            )
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def download_request(self, request, spider):
+        fingerprint = self.crawler.request_fingerprinter.fingerprint(request).hex()
+        record = self.archive.get(fingerprint)
+        if record is None:
+            self.stats.inc_value("replay/missing", spider=spider)
+            raise IgnoreRequest(f"No recorded response for {request}")
+        header, body = record
+        headers = Headers(headers_raw_to_dict(header["headers"].encode("latin-1")))
+        respcls = responsetypes.from_args(headers=headers, url=header["url"], body=body)
+        self.stats.inc_value("replay/hit", spider=spider)
+        return respcls(
+            url=header["url"],
+            status=header["status"],
+            headers=headers,
+            body=body,
+            flags=header["flags"] + ["replayed"],
+            request=request,
+            protocol=header["protocol"],
+        )
+
+    def close(self):
+        self.archive.close()
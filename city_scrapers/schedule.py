@@ -0,0 +1,114 @@
+"""
+Helpers for deciding which spiders "scrapy schedule" runs and in what order.
+
+A spider's change interval is estimated from its runs in the history window as the
+time they span divided by the number of runs that found changed meetings. A spider
+is due when it doesn't have enough history yet, when its last run found changes
+(changes tend to come in bursts, like an agenda that's posted and then amended),
+when it's been at least its change interval since its last run, or when it's been
+the maximum staleness since its last run, whichever comes first.
+"""
+
+import heapq
+from collections import namedtuple
+from datetime import timedelta
+
+# Scheduled runs don't start at exactly the same time each day, so a spider that
+# ran 23 hours ago counts as having run a day ago
+SLACK = timedelta(hours=1)
+
+NEW = "new"
+CHANGED = "changed"
+INTERVAL = "interval"
+STALE = "stale"
+FORCED = "forced"
+SKIPPED = "skipped"
+
+SpiderPlan = namedtuple(
+    "SpiderPlan", ["name", "due", "reason", "interval", "last_run", "duration"]
+)
+
+
+def plan_spider(name, runs, now, max_staleness, min_runs):
+    """
+    Decide whether a spider is due from its (started_at, duration, changed) runs in
+    the history window, oldest first
+    """
+    if len(runs) < min_runs:
+        last_run, duration = (runs[-1][0], runs[-1][1]) if runs else (None, None)
+        return SpiderPlan(name, True, NEW, None, last_run, duration)
+
+    last_run, duration, last_changed = runs[-1]
+    # the first run's change was against a run before the window
+    changes = sum(changed for _, _, changed in runs[1:])
+    interval = (last_run - runs[0][0]) / changes if changes else None
+    since_last = now - last_run + SLACK
+    if last_changed:
+        reason = CHANGED
+    elif since_last >= max_staleness:
+        reason = STALE
+    elif interval is not None and since_last >= interval:
+        reason = INTERVAL
+    else:
+        reason = SKIPPED
+    return SpiderPlan(name, reason != SKIPPED, reason, interval, last_run, duration)
+
+
+def plan_spiders(history, spider_names, now, max_staleness, min_runs, window):
+    """Return a SpiderPlan for each spider from a CrawlHistory"""
+    return [
+        plan_spider(
+            name, history.runs(name, now - window), now, max_staleness, min_runs
+        )
+        for name in spider_names
+    ]
+
+
+def longest_first(plans):
+    """Sort plans by their last run's duration, with spiders that haven't run first"""
+    return sorted(
+        plans,
+        key=lambda plan: (plan.duration is not None, -(plan.duration or 0)),
+    )
+
+
+def assign_lanes(plans, lanes):
+    """
+    Split spiders into at most ``lanes`` lists to run one after another, giving each
+    spider (longest first) to the lane with the least work so far. Spiders that
+    haven't run are assumed to take as long as the longest one that has. With no
+    lane limit every spider gets its own lane.
+    """
+    ordered = longest_first(plans)
+    if not lanes:
+        return [[plan.name] for plan in ordered]
+    durations = [plan.duration for plan in ordered if plan.duration is not None]
+    default_duration = max(durations, default=0.0)
+    loads = [(0.0, index) for index in range(lanes)]
+    assigned = [[] for _ in range(lanes)]
+    for plan in ordered:
+        load, index = heapq.heappop(loads)
+        assigned[index].append(plan.name)
+        duration = default_duration if plan.duration is None else plan.duration
+        heapq.heappush(loads, (load + duration, index))
+    return [lane for lane in assigned if lane]
+
+
+def format_plan(plans):
+    """Format a plain-text table of whether each spider runs and why"""
+    width = max([len("spider")] + [len(plan.name) for plan in plans])
+    lines = [
+        f"{'spider':<{width}}  {'action':<6}  {'reason':<8}  {'interval':>8}  "
+        f"{'last run':<16}  {'seconds':>8}"
+    ]
+    for plan in plans:
+        interval = "-"
+        if plan.interval is not None:
+            interval = f"{plan.interval / timedelta(days=1):.1f}d"
+        last_run = plan.last_run.strftime("%Y-%m-%d %H:%M") if plan.last_run else "-"
+        duration = "-" if plan.duration is None else f"{plan.duration:.1f}"
+        lines.append(
+            f"{plan.name:<{width}}  {'run' if plan.due else 'skip':<6}  "
+            f"{plan.reason:<8}  {interval:>8}  {last_run:<16}  {duration:>8}"
+        )
+    return "\n".join(lines)
@@ -1,3 +1,5 @@
+import os
+
 from .base import *  # noqa
 
 USER_AGENT = (
@@ -11,8 +13,35 @@ ITEM_PIPELINES = {
 
 EXTENSIONS = {
     "scrapy.extensions.closespider.CloseSpider": None,
+    "city_scrapers.extensions.ProfilingExtension": 500,
 }
 
 SPIDER_MIDDLEWARES = {
+    "city_scrapers.middleware.MeetingStatusMiddleware": 975,
     "city_scrapers.middleware.CityScrapersWaybackMiddleware": 500,
 }
+
+# Backfill Cincinnati City Council meetings from CITY_SCRAPERS_BACKFILL_START (an
+# ISO date) up to CITY_SCRAPERS_BACKFILL_END (the end of this year by default) from
+# the Legistar Web API, in independent "year" or "month" windows fetched at most
+# CITY_SCRAPERS_BACKFILL_CONCURRENCY at a time. Finished windows are checkpointed in
+# the state directory, so an interrupted backfill resumes where it left off.
+CITY_SCRAPERS_BACKFILL_START = os.getenv("CITY_SCRAPERS_BACKFILL_START")
+CITY_SCRAPERS_BACKFILL_END = os.getenv("CITY_SCRAPERS_BACKFILL_END")
+CITY_SCRAPERS_BACKFILL_WINDOW = os.getenv("CITY_SCRAPERS_BACKFILL_WINDOW", "year")
+CITY_SCRAPERS_BACKFILL_CONCURRENCY = int(
+    os.getenv("CITY_SCRAPERS_BACKFILL_CONCURRENCY", 4)
+)
+
+# Search Hamilton County Board of Commissioners meetings from
+# CITY_SCRAPERS_ONBASE_ARCHIVE_START (an ISO date, unset by default so the daily
+# archive crawl doesn't repeat the search) in "year" or "month" windows, at most
+# CITY_SCRAPERS_ONBASE_ARCHIVE_CONCURRENCY at a time. Meetings before 2021-04-01
+# are in the separate OnBase archive.
+CITY_SCRAPERS_ONBASE_ARCHIVE_START = os.getenv("CITY_SCRAPERS_ONBASE_ARCHIVE_START")
+CITY_SCRAPERS_ONBASE_ARCHIVE_WINDOW = os.getenv(
+    "CITY_SCRAPERS_ONBASE_ARCHIVE_WINDOW", "month"
+)
+CITY_SCRAPERS_ONBASE_ARCHIVE_CONCURRENCY = int(
+    os.getenv("CITY_SCRAPERS_ONBASE_ARCHIVE_CONCURRENCY", 4)
+)
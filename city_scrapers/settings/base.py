@@ -14,6 +14,11 @@ BOT_NAME = "city_scrapers"
 SPIDER_MODULES = ["city_scrapers.spiders"]
 NEWSPIDER_MODULE = "city_scrapers.spiders"
 
+# Find spiders from city_scrapers/spiders/manifest.json (written by "scrapy
+# manifest") and only import the ones that run
+SPIDER_LOADER_CLASS = "city_scrapers.loader.ManifestSpiderLoader"
+CITY_SCRAPERS_SPIDER_MANIFEST = os.getenv("CITY_SCRAPERS_SPIDER_MANIFEST")
+
 # Crawl responsibly by identifying yourself (and your website) on the user-agent
 USER_AGENT = "City Scrapers [development mode]. Learn more and say hello at https://www.citybureau.org/city-scrapers/"  # noqa
 
@@ -23,8 +28,30 @@ ROBOTSTXT_OBEY = True
 # Disable cookies (enabled by default)
 COOKIES_ENABLED = False
 
-# Throttle results by default
-AUTOTHROTTLE_ENABLED = True
+# Adapt each host's concurrency to its latency and errors and stop requesting hosts
+# that are down (see HostThrottleMiddleware), or use AutoThrottle if disabled
+CITY_SCRAPERS_HOST_THROTTLE = (
+    os.getenv("CITY_SCRAPERS_HOST_THROTTLE", "true").lower() == "true"
+)
+# Concurrency each host starts at
+CONCURRENT_REQUESTS_PER_DOMAIN = 2
+CITY_SCRAPERS_HOST_MIN_CONCURRENCY = 1
+CITY_SCRAPERS_HOST_MAX_CONCURRENCY = 8
+# Seconds above which a response slows its host down
+CITY_SCRAPERS_HOST_TARGET_LATENCY = 2.0
+CITY_SCRAPERS_HOST_MAX_DELAY = float(os.getenv("AUTOTHROTTLE_MAX_DELAY", 30.0))
+# Overrides of the settings above by host
+CITY_SCRAPERS_HOST_PROFILES = {
+    "hcjfsonbase.jfs.hamilton-co.org": {"max_concurrency": 2, "target_latency": 5.0},
+}
+# Failed requests in a row before a host's requests are paused, and for how long
+# in seconds before a probe request (doubling each time the probe fails)
+CITY_SCRAPERS_CIRCUIT_FAILURES = 5
+CITY_SCRAPERS_CIRCUIT_COOLDOWN = 30.0
+CITY_SCRAPERS_CIRCUIT_MAX_COOLDOWN = 300.0
+
+# Throttle results with AutoThrottle when the host throttle is disabled
+AUTOTHROTTLE_ENABLED = not CITY_SCRAPERS_HOST_THROTTLE
 AUTOTHROTTLE_START_DELAY = float(os.getenv("AUTOTHROTTLE_START_DELAY", 1.0))
 AUTOTHROTTLE_MAX_DELAY = float(os.getenv("AUTOTHROTTLE_MAX_DELAY", 30.0))
 AUTOTHROTTLE_TARGET_CONCURRENCY = float(
@@ -33,23 +60,125 @@ AUTOTHROTTLE_TARGET_CONCURRENCY = float(
 
 # Configure item pipelines
 ITEM_PIPELINES = {
+    "city_scrapers.pipelines.DedupePipeline": 50,
+    "city_scrapers.pipelines.IncrementalPipeline": 100,
+    "city_scrapers.pipelines.EnrichmentPipeline": 150,
     "city_scrapers_core.pipelines.MeetingPipeline": 200,
 }
 
+# Directory (relative to .scrapy unless absolute) for state kept between runs
+CITY_SCRAPERS_STATE_DIR = os.getenv("CITY_SCRAPERS_STATE_DIR", "state")
+
+# Only output meetings that are new or changed since the last run. Use
+# "scrapy crawl --full" or CITY_SCRAPERS_INCREMENTAL_FULL to output everything.
+CITY_SCRAPERS_INCREMENTAL = os.getenv("CITY_SCRAPERS_INCREMENTAL", "").lower() == "true"
+CITY_SCRAPERS_INCREMENTAL_FULL = False
+
+# Drop meetings that another spider (or the same one) has already produced, matched
+# on agency, date, time and title, and merge their links into the meeting that's
+# kept. Titles of the same agency on the same day match when their word sets are at
+# least CITY_SCRAPERS_DEDUPE_THRESHOLD similar, and so do titles of agencies that
+# hold joint sessions together in CITY_SCRAPERS_DEDUPE_JOINT_AGENCIES.
+CITY_SCRAPERS_DEDUPE = os.getenv("CITY_SCRAPERS_DEDUPE", "").lower() == "true"
+CITY_SCRAPERS_DEDUPE_THRESHOLD = 0.8
+CITY_SCRAPERS_DEDUPE_MAX_AGE = 7
+CITY_SCRAPERS_DEDUPE_JOINT_AGENCIES = [
+    ["Cincinnati City Council", "Hamilton County Board of Commissioners"],
+]
+
+# Fetch detail or agenda pages for new and changed meetings to fill in fields the
+# index pages don't have, at most CITY_SCRAPERS_ENRICH_CONCURRENCY pages at a time
+# per host. Fetched pages are reused for CITY_SCRAPERS_ENRICH_PAGE_TTL hours.
+CITY_SCRAPERS_ENRICH = os.getenv("CITY_SCRAPERS_ENRICH", "").lower() == "true"
+CITY_SCRAPERS_ENRICH_CONCURRENCY = 2
+CITY_SCRAPERS_ENRICH_PAGE_TTL = 20
+
+# "scrapy schedule" skips spiders whose sources rarely change. A spider runs when
+# its last run found changes, when it's been as long as its source usually goes
+# between changes (from its runs in the last CITY_SCRAPERS_SCHEDULE_WINDOW days), or
+# when it hasn't run in CITY_SCRAPERS_SCHEDULE_MAX_STALENESS days. Spiders with
+# fewer than CITY_SCRAPERS_SCHEDULE_MIN_RUNS runs always run. Changes are found by
+# hashing each spider's meetings with ContentHashMiddleware.
+CITY_SCRAPERS_SCHEDULE_MAX_STALENESS = float(
+    os.getenv("CITY_SCRAPERS_SCHEDULE_MAX_STALENESS", 3)
+)
+CITY_SCRAPERS_SCHEDULE_MIN_RUNS = 3
+CITY_SCRAPERS_SCHEDULE_WINDOW = 60
+CITY_SCRAPERS_CONTENT_HASH = False
+
+# Fetch Cincinnati City Council meetings from the Legistar Web API instead of
+# paging through the calendar page. LEGISTAR_API_URL can point to a stand-in server.
+CITY_SCRAPERS_LEGISTAR_API = (
+    os.getenv("CITY_SCRAPERS_LEGISTAR_API", "").lower() == "true"
+)
+LEGISTAR_API_URL = os.getenv("LEGISTAR_API_URL", "https://webapi.legistar.com")
+
+# Search Hamilton County Board of Commissioners meetings from this many days back
+# to this many days ahead. Searches that reach the OnBase search limit are split
+# into smaller date ranges.
+CITY_SCRAPERS_ONBASE_DAYS_BACK = int(os.getenv("CITY_SCRAPERS_ONBASE_DAYS_BACK", 90))
+CITY_SCRAPERS_ONBASE_DAYS_AHEAD = int(os.getenv("CITY_SCRAPERS_ONBASE_DAYS_AHEAD", 180))
+
 # Enable or disable downloader middlewares
 # See http://scrapy.readthedocs.org/en/latest/topics/downloader-middleware.html
 DOWNLOADER_MIDDLEWARES = {
     "scrapy.downloadermiddlewares.robotstxt.RobotsTxtMiddleware": 543,
+    "city_scrapers.middleware.HostThrottleMiddleware": 600,
+    # before the cache, so it records the responses the spider gets
+    "city_scrapers.replay.RecordMiddleware": 850,
+    "scrapy.downloadermiddlewares.httpcache.HttpCacheMiddleware": None,
+    "city_scrapers.middleware.ConditionalHttpCacheMiddleware": 900,
+}
+
+# Persistent response cache that revalidates with ETag/Last-Modified on every run
+HTTPCACHE_ENABLED = os.getenv("HTTPCACHE_ENABLED", "").lower() == "true"
+HTTPCACHE_DIR = os.getenv("HTTPCACHE_DIR", "httpcache")
+HTTPCACHE_POLICY = "city_scrapers.middleware.RevalidatePolicy"
+HTTPCACHE_GZIP = True
+
+# Ignore responses that are unchanged since the last crawl instead of parsing them
+CITY_SCRAPERS_SKIP_UNCHANGED = False
+
+# Write every response to a per-spider archive that the settings in
+# city_scrapers.settings.replay can serve offline
+CITY_SCRAPERS_RECORD = os.getenv("CITY_SCRAPERS_RECORD", "").lower() == "true"
+CITY_SCRAPERS_ARCHIVE_DIR = os.getenv("CITY_SCRAPERS_ARCHIVE_DIR", "archive")
+
+# Spiders yield meetings without a status or ID, and MeetingStatusMiddleware sets
+# them for each callback's output before anything else sees it
+SPIDER_MIDDLEWARES = {
+    "city_scrapers.middleware.MeetingStatusMiddleware": 975,
+    "city_scrapers.middleware.ContentHashMiddleware": 950,
 }
 
-SPIDER_MIDDLEWARES = {}
+# Wayback Machine archiving when CityScrapersWaybackMiddleware is enabled. URLs are
+# submitted to WAYBACK_ENDPOINT + url from a background queue, at most once every
+# WAYBACK_HOST_DELAY seconds per host, and skipped if archived in the last
+# WAYBACK_TTL_DAYS.
+WAYBACK_ENDPOINT = os.getenv("WAYBACK_ENDPOINT", "https://web.archive.org/save/")
+WAYBACK_TTL_DAYS = 30
+WAYBACK_QUEUE_SIZE = 1000
+WAYBACK_BATCH_SIZE = 20
+WAYBACK_HOST_DELAY = 1.0
+# Seconds to pause all submissions after the archive responds with a 429
+WAYBACK_BACKOFF = 60.0
+# Seconds to keep submitting queued URLs after the spider closes
+WAYBACK_DRAIN_TIMEOUT = 120.0
 
-# Use commands from city_scrapers_core package
+# Project commands, which also re-export the commands from city_scrapers_core
 
-COMMANDS_MODULE = "city_scrapers_core.commands"
+COMMANDS_MODULE = "city_scrapers.commands"
 
 EXTENSIONS = {
     "scrapy.extensions.closespider.CloseSpider": None,
+    "city_scrapers.extensions.ProfilingExtension": 500,
 }
 
-CLOSESPIDER_ERRORCOUNT = 5
+# Time callbacks, middleware and pipelines and write a JSON report per spider next
+# to the feed output (or to CITY_SCRAPERS_PROFILE_DIR if feeds aren't local)
+CITY_SCRAPERS_PROFILE = os.getenv("CITY_SCRAPERS_PROFILE", "").lower() == "true"
+CITY_SCRAPERS_PROFILE_DIR = os.getenv("CITY_SCRAPERS_PROFILE_DIR", "profile")
+CITY_SCRAPERS_PROFILE_METHODS = ["parse", "parse_legistar"]
+# Run cProfile on a sample of one spider's callbacks, saved as <spider>.pstats
+CITY_SCRAPERS_PROFILE_SPIDER = os.getenv("CITY_SCRAPERS_PROFILE_SPIDER")
+CITY_SCRAPERS_PROFILE_SAMPLE = float(os.getenv("CITY_SCRAPERS_PROFILE_SAMPLE", 1.0))
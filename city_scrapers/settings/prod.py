@@ -6,7 +6,10 @@ USER_AGENT = "City Scrapers [production mode]. Learn more and say hello at https
 
 # Configure item pipelines
 ITEM_PIPELINES = {
-    "city_scrapers_core.pipelines.AzureDiffPipeline": 200,
+    "city_scrapers.pipelines.LocalDiffPipeline": 200,
+    "city_scrapers.pipelines.DedupePipeline": 225,
+    "city_scrapers.pipelines.IncrementalPipeline": 250,
+    "city_scrapers.pipelines.EnrichmentPipeline": 275,
     "city_scrapers_core.pipelines.MeetingPipeline": 300,
     "city_scrapers_core.pipelines.OpenCivicDataPipeline": 400,
 }
@@ -17,6 +20,7 @@ EXTENSIONS = {
     "city_scrapers_core.extensions.AzureBlobStatusExtension": 100,
     "scrapy_sentry_errors.extensions.Errors": 10,
     "scrapy.extensions.closespider.CloseSpider": None,
+    "city_scrapers.extensions.ProfilingExtension": 500,
 }
 
 FEED_EXPORTERS = {
@@ -27,7 +31,8 @@ FEED_EXPORTERS = {
 FEED_FORMAT = "jsonlines"
 
 FEED_STORAGES = {
-    "azure": "city_scrapers_core.extensions.AzureBlobFeedStorage",
+    "azure": "city_scrapers.feeds.AzureChunkedFeedStorage",
+    "file": "city_scrapers.feeds.FileChunkedFeedStorage",
 }
 
 AZURE_ACCOUNT_NAME = os.getenv("AZURE_ACCOUNT_NAME")
@@ -35,7 +40,24 @@ AZURE_ACCOUNT_KEY = os.getenv("AZURE_ACCOUNT_KEY")
 AZURE_CONTAINER = os.getenv("AZURE_CONTAINER")
 CITY_SCRAPERS_STATUS_CONTAINER = os.getenv("AZURE_STATUS_CONTAINER")
 
-FEED_URI = (
+# Optional remote copy of each spider's diff store, e.g.
+# azure://<account_name>:<account_key>@<container>/state/%(name)s.diff.db, used when
+# the state directory doesn't have one
+CITY_SCRAPERS_DIFF_SNAPSHOT_URI = os.getenv("CITY_SCRAPERS_DIFF_SNAPSHOT_URI")
+
+# Feeds are uploaded in chunks of this many bytes while the spider runs
+CITY_SCRAPERS_FEED_CHUNK_SIZE = int(
+    os.getenv("CITY_SCRAPERS_FEED_CHUNK_SIZE", 4 * 1024 * 1024)
+)
+
+# Optionally compress feeds as they're written, either "gzip" or "zstd". Seeding a
+# new diff store reads the previous feed uncompressed, and combinefeeds reads gzip
+# but not zstd feeds.
+CITY_SCRAPERS_FEED_COMPRESSION = os.getenv("CITY_SCRAPERS_FEED_COMPRESSION", "")
+
+# Set CITY_SCRAPERS_FEED_URI (e.g. to a file:// URI) to write feeds somewhere other
+# than the Azure container
+FEED_URI = os.getenv("CITY_SCRAPERS_FEED_URI") or (
     "azure://{account_name}:{account_key}@{container}"
     "/%(year)s/%(month)s/%(day)s/%(hour_min)s/%(name)s.json"
 ).format(
@@ -43,3 +65,21 @@ FEED_URI = (
     account_key=AZURE_ACCOUNT_KEY,
     container=AZURE_CONTAINER,
 )
+
+FEED_POSTPROCESSING = []
+if CITY_SCRAPERS_FEED_COMPRESSION == "gzip":
+    FEED_URI += ".gz"
+    FEED_POSTPROCESSING = ["scrapy.extensions.postprocessing.GzipPlugin"]
+elif CITY_SCRAPERS_FEED_COMPRESSION == "zstd":
+    FEED_URI += ".zst"
+    FEED_POSTPROCESSING = ["city_scrapers.feeds.ZstdPlugin"]
+
+# FEED_URI is still set for the city_scrapers_core pipelines and commands that read
+# it, and FEEDS adds the export options for the same feed
+FEEDS = {
+    FEED_URI: {
+        "format": FEED_FORMAT,
+        "postprocessing": FEED_POSTPROCESSING,
+        "gzip_compresslevel": 6,
+    }
+}
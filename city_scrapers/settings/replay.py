@@ -0,0 +1,20 @@
+from .base import *  # noqa
+
+# Serve every response from archives recorded with CITY_SCRAPERS_RECORD=true
+# instead of the network, e.g.
+#
+#     SCRAPY_SETTINGS_MODULE=city_scrapers.settings.replay scrapy crawl <spider>
+
+DOWNLOAD_HANDLERS = {
+    "http": "city_scrapers.replay.ReplayDownloadHandler",
+    "https": "city_scrapers.replay.ReplayDownloadHandler",
+}
+
+CITY_SCRAPERS_RECORD = False
+HTTPCACHE_ENABLED = False
+
+# Nothing is downloaded, so don't wait between requests
+AUTOTHROTTLE_ENABLED = False
+CITY_SCRAPERS_HOST_THROTTLE = False
+DOWNLOAD_DELAY = 0
+CONCURRENT_REQUESTS_PER_DOMAIN = 16
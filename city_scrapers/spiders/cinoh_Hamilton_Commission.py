@@ -1,64 +1,212 @@
-from urllib.parse import urljoin
+from collections import namedtuple
+from datetime import date, timedelta
+from urllib.parse import urlencode
 
+import scrapy
 from city_scrapers_core.constants import COMMISSION
-from city_scrapers_core.items import Meeting
 from city_scrapers_core.spiders import CityScrapersSpider
-from dateutil.parser import parse
+from lxml import etree
+
+from city_scrapers.dates import date_windows, parse_datetime
+from city_scrapers.items import CompactMeeting
+
+ONBASE_URL = "https://hcjfsonbase.jfs.hamilton-co.org/OnBaseAgendaOnline"
+# OnBase returns at most a fixed number of meetings per search, and says so in the
+# results footer
+SEARCH_LIMIT_MESSAGE = b"The Search Limit has been reached"
+# large pages are fed to the incremental parser this many bytes at a time
+PARSE_CHUNK_BYTES = 64 * 1024
+
+# Compiled once per process and shared by every response
+MEETING_ROWS = etree.XPath(
+    "//tr[contains(concat(' ', normalize-space(@class), ' '), ' meeting-row ')]"
+)
+
+OnBaseRow = namedtuple("OnBaseRow", ["title", "date", "href"])
+
+
+def _text_nodes(el):
+    """Yield an element's own text nodes, like the ::text pseudo-element."""
+    if el.text:
+        yield el.text
+    for child in el:
+        if child.tail:
+            yield child.tail
+
+
+def extract_row(row):
+    """
+    Pull the title (first text of the .visible-xs cell), date (third text node across
+    the row's cells) and first href from a meeting row in a single traversal.
+    """
+    title = date = href = None
+    cell_texts = 0
+    for el in row.iter(tag=etree.Element):
+        if title is None and "visible-xs" in (el.get("class") or "").split():
+            title = next(_text_nodes(el), None)
+        if date is None and el.tag == "td":
+            for text in _text_nodes(el):
+                cell_texts += 1
+                if cell_texts == 3:
+                    date = text
+                    break
+        if href is None:
+            href = el.get("href")
+    return OnBaseRow(title, date, href)
+
+
+def iter_rows(root):
+    """Extract every meeting row from a parsed document."""
+    for row in MEETING_ROWS(root):
+        yield extract_row(row)
+
+
+def iter_rows_incremental(body):
+    """
+    Extract meeting rows while parsing an HTML document, discarding each table row
+    once it's been read so large pages never have a full tree in memory.
+    """
+    parser = etree.HTMLPullParser(events=("end",), tag="tr")
+    for start in range(0, len(body), PARSE_CHUNK_BYTES):
+        parser.feed(body[start : start + PARSE_CHUNK_BYTES])
+        yield from read_rows(parser)
+    parser.close()
+    yield from read_rows(parser)
+
+
+def read_rows(parser):
+    """Extract the meeting rows a pull parser has finished since it was last read"""
+    for _, el in parser.read_events():
+        if "meeting-row" in (el.get("class") or "").split():
+            yield extract_row(el)
+        el.clear()
+        parent = el.getparent()
+        while el.getprevious() is not None:
+            del parent[0]
 
 
 class CinohHamiltonCommissionSpider(CityScrapersSpider):
     name = "cinoh_Hamilton_Commission"
     agency = "Hamilton County Board of Commissioners"
     timezone = "America/New_York"
-    start_urls = ["https://hcjfsonbase.jfs.hamilton-co.org/OnBaseAgendaOnline"]
+    start_urls = [ONBASE_URL]
+    # pages larger than this are parsed incrementally instead of as a full tree
+    incremental_parse_bytes = 5 * 1024 * 1024
+    # meetings are searched for this many days back and ahead, unless overridden by
+    # CITY_SCRAPERS_ONBASE_DAYS_BACK and CITY_SCRAPERS_ONBASE_DAYS_AHEAD
+    days_back = 90
+    days_ahead = 180
+
+    @classmethod
+    def update_settings(cls, settings):
+        super().update_settings(settings)
+        if settings.get("CITY_SCRAPERS_ONBASE_ARCHIVE_START"):
+            # archive windows don't depend on each other, so search them in parallel
+            concurrency = settings.getint("CITY_SCRAPERS_ONBASE_ARCHIVE_CONCURRENCY", 4)
+            settings.set("CONCURRENT_REQUESTS_PER_DOMAIN", concurrency, "spider")
+            settings.set("AUTOTHROTTLE_TARGET_CONCURRENCY", concurrency, "spider")
+            host = ONBASE_URL.split("/")[2]
+            profiles = dict(settings.getdict("CITY_SCRAPERS_HOST_PROFILES"))
+            profiles[host] = {**profiles.get(host, {}), "max_concurrency": concurrency}
+            settings.set("CITY_SCRAPERS_HOST_PROFILES", profiles, "spider")
 
-    def parse(self, response):
+    def start_requests(self):
+        """
+        Search the days around today, or every window since
+        CITY_SCRAPERS_ONBASE_ARCHIVE_START in archive mode, instead of loading the
+        default meetings list, which grows with every meeting.
+        """
+        settings = getattr(self, "settings", None)
+        days_back, days_ahead = self.days_back, self.days_ahead
+        if settings is not None:
+            days_back = settings.getint("CITY_SCRAPERS_ONBASE_DAYS_BACK", days_back)
+            days_ahead = settings.getint("CITY_SCRAPERS_ONBASE_DAYS_AHEAD", days_ahead)
+        today = date.today()
+        end = today + timedelta(days=days_ahead + 1)
+        archive_start = settings and settings.get("CITY_SCRAPERS_ONBASE_ARCHIVE_START")
+        if not archive_start:
+            yield self._search_request((today - timedelta(days=days_back), end))
+            return
+        size = settings.get("CITY_SCRAPERS_ONBASE_ARCHIVE_WINDOW", "month")
+        for window in date_windows(date.fromisoformat(archive_start), end, size):
+            yield self._search_request(window)
+
+    def parse(self, response, window=None):
         """
         Parse upcoming and past meetings from the
         Hamilton County Board of Commissioners meetings table.
+
+        Searches (with a window of dates from start up to end) that hit the OnBase
+        search limit are split in half and searched again, so no meetings are
+        missed, and meetings outside the window are skipped.
         """
+        if window is not None and SEARCH_LIMIT_MESSAGE in response.body:
+            start, end = window
+            if end - start > timedelta(days=1):
+                middle = start + (end - start) / 2
+                self.crawler.stats.inc_value("onbase/windows_split", spider=self)
+                yield self._search_request((start, middle))
+                yield self._search_request((middle, end))
+                return
+
         location = {
             "name": "Todd B. Portune Center for County Government",
             "address": "138 East Court Street, Room 603, Cincinnati, OH 45202",
         }
 
-        for item in response.css(".meeting-row"):
-            meeting = Meeting(
-                title=self._parse_title(item),
+        if len(response.body) > self.incremental_parse_bytes:
+            rows = iter_rows_incremental(response.body)
+        else:
+            rows = iter_rows(response.selector.root)
+
+        for row in rows:
+            start = self._parse_start(row)
+            if window is not None and not window[0] <= start.date() < window[1]:
+                continue
+            meeting = CompactMeeting(
+                title=self._parse_title(row),
                 description="",
                 classification=COMMISSION,
-                start=self._parse_start(item),
+                start=start,
                 end=None,
                 all_day=False,
                 time_notes="",
                 location=location,
-                links=self._parse_links(item),
-                source="https://hcjfsonbase.jfs.hamilton-co.org/OnBaseAgendaOnline",
+                links=self._parse_links(row, response),
+                source=ONBASE_URL,
             )
 
-            meeting["status"] = self._get_status(meeting)
-            meeting["id"] = self._get_id(meeting)
-
             yield meeting
 
-    def _parse_title(self, item):
+    def _search_request(self, window):
+        """Search for meetings from the start of a window up to its end"""
+        start, end = window
+        params = {
+            # custom date range, with the start and end dates included
+            "dropid": 11,
+            "dropsv": start.strftime("%m/%d/%Y"),
+            "dropev": (end - timedelta(days=1)).strftime("%m/%d/%Y"),
+        }
+        return scrapy.Request(
+            f"{ONBASE_URL}/Meetings/Search?{urlencode(params)}",
+            callback=self.parse,
+            cb_kwargs={"window": window},
+        )
+
+    def _parse_title(self, row):
         """Parse meeting title."""
-        string = item.css(".visible-xs::text").get()
-        return string.strip()
+        return row.title.strip()
 
-    def _parse_start(self, item):
+    def _parse_start(self, row):
         """Parse start datetime as a naive datetime object."""
-        date = item.css("td::text")[2].get()
-        return parse(date, fuzzy=True)
+        return parse_datetime(row.date, fuzzy=True)
 
     # all three link types on the table--Agenda, Minutes,
     # and View Media--all link to the same page
-    def _parse_links(self, item):
+    def _parse_links(self, row, response):
         """Parse links."""
-        url_first_half = "https://hcjfsonbase.jfs.hamilton-co.org"
-        url_second_half = item.css("::attr(href)").get()
-        url = urljoin(url_first_half, url_second_half)
-        if url == "https://hcjfsonbase.jfs.hamilton-co.org":
+        if not row.href:
             return []
-        else:
-            return [{"title": "Agenda, Notes, and Media", "href": url}]
+        return [
+            {"title": "Agenda, Notes, and Media", "href": response.urljoin(row.href)}
+        ]
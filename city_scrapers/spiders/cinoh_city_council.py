@@ -1,9 +1,42 @@
-from datetime import datetime
+from datetime import date, datetime
+from urllib.parse import quote, urlencode
 
+import scrapy
 from city_scrapers_core.constants import CITY_COUNCIL, COMMITTEE
 from city_scrapers_core.items import Meeting
 from city_scrapers_core.spiders import LegistarSpider
-from dateutil.parser import parse
+
+from city_scrapers.dates import date_windows, parse_datetime
+from city_scrapers.items import CompactMeeting
+from city_scrapers.status import meeting_id
+from city_scrapers.store import BackfillCheckpoint
+
+# Legistar columns that can hold links, with the title used for each link. Columns
+# without a link (e.g. "Not available") hold plain strings instead of dicts.
+LINK_COLUMNS = (
+    ("Name", "meeting page"),
+    ("iCalendar", "iCalendar"),
+    ("Meeting Details", "Meeting Details"),
+    ("Agenda", "Agenda"),
+    ("Agenda Packet", "Agenda Packet"),
+    ("Minutes", "Minutes"),
+    ("Video", "Video"),
+)
+
+NOT_AVAILABLE = "Not\u00a0available"
+
+
+class LegistarRow:
+    """Legistar calendar row with the values the spider uses parsed once."""
+
+    __slots__ = ("title", "start", "location", "links", "source")
+
+    def __init__(self, title, start, location, links, source):
+        self.title = title
+        self.start = start
+        self.location = location
+        self.links = links
+        self.source = source
 
 
 class CinohCityCouncilSpider(LegistarSpider):
@@ -11,6 +44,191 @@ class CinohCityCouncilSpider(LegistarSpider):
     agency = "Cincinnati City Council"
     timezone = "America/New_York"
     start_urls = ["https://cincinnatioh.legistar.com/Calendar.aspx"]
+    # Legistar Web API client and page size (the most the API returns), used
+    # instead of the calendar when CITY_SCRAPERS_LEGISTAR_API is enabled
+    api_client = "cincinnatioh"
+    api_page_size = 1000
+    # item class for parsed meetings, CompactMeeting in backfills
+    meeting_class = Meeting
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # date ranges are relative to the time the crawl started
+        self.now = datetime.now()
+        self.body_guids = {}
+        self.checkpoint = None
+        self.backfill_ids = set()
+
+    @classmethod
+    def update_settings(cls, settings):
+        super().update_settings(settings)
+        if settings.get("CITY_SCRAPERS_BACKFILL_START"):
+            # backfill windows don't depend on each other, so fetch them in parallel
+            concurrency = settings.getint("CITY_SCRAPERS_BACKFILL_CONCURRENCY", 4)
+            settings.set("CONCURRENT_REQUESTS_PER_DOMAIN", concurrency, "spider")
+            settings.set("AUTOTHROTTLE_TARGET_CONCURRENCY", concurrency, "spider")
+            settings.set("CITY_SCRAPERS_HOST_MAX_CONCURRENCY", concurrency, "spider")
+
+    def start_requests(self):
+        settings = getattr(self, "settings", None)
+        if settings is None or not (
+            settings.getbool("CITY_SCRAPERS_LEGISTAR_API")
+            or settings.get("CITY_SCRAPERS_BACKFILL_START")
+        ):
+            yield from super().start_requests()
+            return
+        # Body GUIDs are needed for the same "meeting page" links as the calendar
+        yield scrapy.Request(self._api_url("bodies"), callback=self.parse_api_bodies)
+
+    def parse_api_bodies(self, response):
+        self.body_guids = {body["BodyId"]: body["BodyGuid"] for body in response.json()}
+        if self.settings.get("CITY_SCRAPERS_BACKFILL_START"):
+            yield from self.start_backfill()
+        else:
+            yield self._api_events_request(0)
+
+    def start_backfill(self):
+        """
+        Request each backfill window from the API independently, and parse windows
+        finished by an earlier run from the checkpoint instead of fetching them again.
+        """
+        settings = self.settings
+        start = date.fromisoformat(settings.get("CITY_SCRAPERS_BACKFILL_START"))
+        end = settings.get("CITY_SCRAPERS_BACKFILL_END")
+        end = date.fromisoformat(end) if end else date(self.now.year + 1, 1, 1)
+        size = settings.get("CITY_SCRAPERS_BACKFILL_WINDOW", "year")
+        # backfills parse years of meetings, most of which are only compared
+        self.meeting_class = CompactMeeting
+        self.checkpoint = BackfillCheckpoint.from_settings(settings)
+        resumed = []
+        for window in date_windows(start, end, size):
+            events = self.checkpoint.get(self.name, *window)
+            if events is None:
+                yield self._backfill_request(window)
+            else:
+                resumed.append(events)
+        self.crawler.stats.set_value(
+            "backfill/windows_resumed", len(resumed), spider=self
+        )
+        for events in resumed:
+            yield from self._parse_backfill_events(events)
+
+    def parse_backfill_events(self, response, window, skip, events):
+        """
+        Collect a window's pages of events, then checkpoint the window and parse it.
+        Windows that haven't ended yet can still change, so they aren't checkpointed.
+        """
+        page = response.json()
+        events = events + page
+        if len(page) == self.api_page_size:
+            yield self._backfill_request(window, skip + self.api_page_size, events)
+            return
+        if window[1] <= self.now.date():
+            self.checkpoint.save(self.name, *window, events, datetime.now())
+        self.crawler.stats.inc_value("backfill/windows_fetched", spider=self)
+        yield from self._parse_backfill_events(events)
+
+    def _parse_backfill_events(self, events):
+        """Parse events, skipping meetings already output from another window"""
+        for meeting in self.parse_legistar(self._api_row(event) for event in events):
+            meeting["id"] = meeting_id(self.name, meeting)
+            if meeting["id"] in self.backfill_ids:
+                self.crawler.stats.inc_value("backfill/duplicates", spider=self)
+                continue
+            self.backfill_ids.add(meeting["id"])
+            yield meeting
+
+    def closed(self, reason):
+        if self.checkpoint is not None:
+            self.checkpoint.close()
+
+    def parse_api_events(self, response, skip):
+        """
+        Parse a page of events from the Legistar Web API as calendar rows, and
+        request the next page if this one was full.
+        """
+        events = response.json()
+        yield from self.parse_legistar(self._api_row(event) for event in events)
+        if len(events) == self.api_page_size:
+            yield self._api_events_request(skip + self.api_page_size)
+
+    def _api_url(self, path, params=None):
+        base_url = self.settings.get("LEGISTAR_API_URL", "https://webapi.legistar.com")
+        url = f"{base_url.rstrip('/')}/v1/{self.api_client}/{path}"
+        if params:
+            url = f"{url}?{urlencode(params, quote_via=quote)}"
+        return url
+
+    def _api_events_request(self, skip, start=None, end=None):
+        """
+        Request a page of events from start up to end, by default over the same
+        years as the calendar
+        """
+        since = (start or date(self.since_year, 1, 1)).isoformat()
+        until = (end or date(self.now.year + 1, 1, 1)).isoformat()
+        params = {
+            "$filter": (
+                f"EventDate ge datetime'{since}' and EventDate lt datetime'{until}'"
+            ),
+            "$orderby": "EventId",
+            "$top": self.api_page_size,
+            "$skip": skip,
+        }
+        return scrapy.Request(
+            self._api_url("events", params),
+            callback=self.parse_api_events,
+            cb_kwargs={"skip": skip},
+        )
+
+    def _backfill_request(self, window, skip=0, events=()):
+        return self._api_events_request(skip, *window).replace(
+            callback=self.parse_backfill_events,
+            cb_kwargs={"window": window, "skip": skip, "events": list(events)},
+        )
+
+    def _api_row(self, event):
+        """
+        Map a Legistar Web API event to the calendar row shape used by
+        parse_legistar. The API doesn't say whether there's an agenda packet, so
+        those links are only available from the calendar.
+        """
+        site = self.start_urls[0].rsplit("/", 1)[0]
+        event_id, guid = event["EventId"], event["EventGuid"]
+        body_url = f"{site}/DepartmentDetail.aspx?ID={event['EventBodyId']}"
+        if event["EventBodyId"] in self.body_guids:
+            body_url += f"&GUID={self.body_guids[event['EventBodyId']]}"
+        date = parse_datetime(event["EventDate"][:10])
+
+        def view_link(label, mode, published):
+            if not published:
+                return NOT_AVAILABLE
+            url = f"{site}/View.ashx?M={mode}&ID={event_id}&GUID={guid}"
+            return {"label": label, "url": url}
+
+        details = NOT_AVAILABLE
+        if event.get("EventAgendaFile") or event.get("EventMinutesFile"):
+            details = {
+                "label": "Meeting\u00a0details",
+                "url": f"{site}/MeetingDetail.aspx?ID={event_id}&GUID={guid}"
+                "&Options=info|&Search=",
+            }
+        video = NOT_AVAILABLE
+        if event.get("EventVideoPath"):
+            video = {"label": "Video", "url": event["EventVideoPath"]}
+        return {
+            "Name": {"label": event["EventBodyName"], "url": body_url},
+            "Meeting Date": f"{date.month}/{date.day}/{date.year}",
+            "iCalendar": {"url": f"{site}/View.ashx?M=IC&ID={event_id}&GUID={guid}"},
+            "Meeting Time": event.get("EventTime") or "",
+            "Meeting Location": " ".join(
+                filter(None, [event.get("EventLocation"), event.get("EventComment")])
+            ),
+            "Meeting Details": details,
+            "Agenda": view_link("Agenda", "A", event.get("EventAgendaFile")),
+            "Agenda Packet": NOT_AVAILABLE,
+            "Minutes": view_link("Minutes", "M", event.get("EventMinutesFile")),
+            "Video": video,
+        }
 
     def parse_legistar(self, response):
         """
@@ -22,76 +240,80 @@ class CinohCityCouncilSpider(LegistarSpider):
         but when they are, they are in the form of links.
         """
         for obj in response:
-            meeting = Meeting(
-                title=obj["Name"]["label"],
+            row = self._normalize_row(obj)
+            meeting = self.meeting_class(
+                title=row.title,
                 description="",
-                classification=self._parse_classification(obj),
-                start=self.legistar_start(obj),
+                classification=self._parse_classification(row),
+                start=row.start,
                 end=None,
                 all_day=False,
                 time_notes="",
-                status=self._parse_status(obj),
-                location=self._parse_location(obj),
-                links=self._parse_links(obj),
-                source=self.legistar_source(obj),
+                location=self._parse_location(row),
+                links=self._parse_links(row),
+                source=row.source,
             )
 
-            meeting["id"] = self._get_id(meeting)
-
             yield meeting
 
-    def _parse_classification(self, obj):
-        if obj["Name"]["label"] == "Cincinnati City Council":
+    def _normalize_row(self, obj):
+        """Read everything needed from a Legistar row in a single pass."""
+        links = []
+        for column, title in LINK_COLUMNS:
+            value = obj.get(column)
+            if isinstance(value, dict) and value.get("url"):
+                links.append((title, value["url"]))
+        return LegistarRow(
+            title=obj["Name"]["label"],
+            start=self.legistar_start(obj),
+            location=obj["Meeting Location"],
+            links=tuple(links),
+            source=self.legistar_source(obj),
+        )
+
+    def _parse_classification(self, row):
+        if row.title == "Cincinnati City Council":
             return CITY_COUNCIL
         else:
             return COMMITTEE
 
-    def _parse_status(self, obj):
-
-        date = obj["Meeting Date"]
-        parsed_date = parse(date, fuzzy=True)
-
-        if (
-            obj["Meeting Location"]
-            == "Council Chambers, Room 300 NOTICE OF CANCELLATION"
-        ):
-            return "cancelled"
-        elif parsed_date < datetime.today():
-            return "passed"
-        else:
-            return "tentative"
+    def _parse_location(self, row):
+        return {"address": "801 Plum St. Cincinnati, OH 45202", "name": row.location}
 
-    def _parse_location(self, obj):
-        room = obj["Meeting Location"]
-        return {"address": "801 Plum St. Cincinnati, OH 45202", "name": f"{room}"}
+    def _parse_links(self, row):
+        return [{"title": title, "href": href} for title, href in row.links]
 
-    def _parse_links(self, obj):
-
-        links = []
+    def enrich_request(self, item):
+        """Request the meeting details page, for EnrichmentPipeline"""
+        for link in item["links"]:
+            if link["title"] == "Meeting Details":
+                return scrapy.Request(link["href"])
+        return None
 
-        if obj.get("Name"):
-            links.append({"title": "meeting page", "href": obj["Name"]["url"]})
-
-        if obj.get("iCalendar"):
-            links.append({"title": "iCalendar", "href": obj["iCalendar"]["url"]})
-
-        if not obj.get("Meeting Details") == "Meeting\u00a0details":
-            links.append(
-                {"title": "Meeting Details", "href": obj["Meeting Details"]["url"]}
-            )
-
-        if not obj.get("Agenda") == "Not\u00a0available":
-            links.append({"title": "Agenda", "href": obj["Agenda"]["url"]})
+    def parse_enrichment(self, item, response):
+        """
+        Read the full location and the agenda item titles from a meeting details
+        page. The titles are used as the description, one per line.
+        """
+        fields = {}
+        location = " ".join(
+            " ".join(
+                response.css("#ctl00_ContentPlaceHolder1_hypLocation *::text").getall()
+            ).split()
+        )
+        if location and item["status"] != "cancelled":
+            fields["location"] = {**item["location"], "name": location}
 
-        if not obj.get("Agenda Packet") == "Not\u00a0available":
-            links.append(
-                {"title": "Agenda Packet", "href": obj["Agenda Packet"]["url"]}
+        table = response.css("#ctl00_ContentPlaceHolder1_gridMain_ctl00")
+        headers = [
+            " ".join(th.css("*::text").getall()).strip() for th in table.css("thead th")
+        ]
+        if "Title" in headers:
+            column = headers.index("Title") + 1
+            cells = (
+                row.css(f"td:nth-child({column}) *::text").getall()
+                for row in table.css("tbody tr")
             )
-
-        if not obj.get("Minutes") == "Not\u00a0available":
-            links.append({"title": "Minutes", "href": obj["Minutes"]["url"]})
-
-        if not obj.get("Video") == "Not\u00a0available":
-            links.append({"title": "Video", "href": obj["Video"]["url"]})
-
-        return links
+            titles = (" ".join(" ".join(cell).split()) for cell in cells)
+            fields["description"] = "\n".join(title for title in titles if title)
+        return fields
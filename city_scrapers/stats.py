@@ -0,0 +1,49 @@
+"""Timing statistics shared by the extensions and middleware"""
+
+
+class Histogram:
+    """
+    Latency histogram with power-of-two microsecond buckets, so recording a timing
+    is a single integer operation.
+    """
+
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = {}
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        bucket = int(seconds * 1_000_000).bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, fraction):
+        """Upper bound in milliseconds of the bucket containing the percentile"""
+        target = fraction * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= target:
+                return min((1 << bucket) / 1000, self.max * 1000)
+        return self.max * 1000
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_s": round(self.total, 6),
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0,
+            "p50_ms": round(self.percentile(0.5), 3),
+            "p95_ms": round(self.percentile(0.95), 3),
+            "p99_ms": round(self.percentile(0.99), 3),
+            "max_ms": round(self.max * 1000, 3),
+            "buckets_us": {
+                f"<{1 << bucket}": count
+                for bucket, count in sorted(self.buckets.items())
+            },
+        }
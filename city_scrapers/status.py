@@ -0,0 +1,77 @@
+"""
+Meeting status and ID rules shared by every spider. Spiders yield meetings without a
+status or ID, and MeetingStatusMiddleware sets them for each callback's meetings at
+once, with the same rules as CityScrapersSpider._get_status and _get_id.
+"""
+
+import re
+from datetime import datetime
+from functools import lru_cache
+
+from city_scrapers_core.constants import CANCELLED, PASSED, TENTATIVE
+
+from city_scrapers.items import MEETING_TYPES
+
+# Words in a meeting's title, description or location name (like "Council Chambers,
+# Room 300 NOTICE OF CANCELLATION") that mean it isn't happening as scheduled
+CANCELLED_RE = re.compile(r"cancel|rescheduled|postpone", re.IGNORECASE)
+
+# CityScrapersSpider._clean_title and _get_id, compiled once
+CANCELLED_TITLE_RE = re.compile(
+    r"([\s:-]{1,3})?(cancel\w+|rescheduled)([\s:-]{1,3})?", re.IGNORECASE
+)
+TITLE_EDGES_RE = re.compile(r"(^[|\-:]\s+|\s*[|\-:]$)")
+NON_ALPHANUMERIC_RE = re.compile(r"[^A-Z^a-z^0-9^]+")
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def title_slug(title):
+    """Return the part of a meeting ID from its title, e.g. "budget_committee" """
+    clean = TITLE_EDGES_RE.sub("", CANCELLED_TITLE_RE.sub("", title).strip()).strip()
+    return WHITESPACE_RE.sub("_", NON_ALPHANUMERIC_RE.sub(" ", clean)).lower()
+
+
+def meeting_status(item, now):
+    """Return whether a meeting is cancelled, passed as of ``now``, or tentative"""
+    location = item.get("location") or {}
+    text = " ".join(
+        [
+            item.get("title") or "",
+            item.get("description") or "",
+            location.get("name") or "",
+        ]
+    )
+    if CANCELLED_RE.search(text):
+        return CANCELLED
+    if item["start"] < now:
+        return PASSED
+    return TENTATIVE
+
+
+def meeting_id(spider_name, item, identifier=None):
+    """Return a meeting's ID from its spider, start time, title and any identifier"""
+    return "/".join(
+        [
+            spider_name,
+            item["start"].strftime("%Y%m%d%H%M"),
+            (identifier or "x").replace("/", "-"),
+            title_slug(item["title"]),
+        ]
+    )
+
+
+def set_status_and_ids(spider, items, now=None):
+    """
+    Set the status and ID of meetings that don't have them in a batch of a spider's
+    output, with statuses as of one reference time for the whole batch, and pass
+    everything else through
+    """
+    now = now or datetime.now()
+    for item in items:
+        if isinstance(item, MEETING_TYPES):
+            if "status" not in item:
+                item["status"] = meeting_status(item, now)
+            if "id" not in item:
+                item["id"] = meeting_id(spider.name, item)
+        yield item
@@ -0,0 +1,654 @@
+import json
+import os
+import sqlite3
+import zlib
+from datetime import date, datetime
+from hashlib import sha1
+from pathlib import Path
+
+from scrapy.utils.project import data_path
+
+from city_scrapers.items import FIELDS
+
+NEW = "new"
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+VANISHED = "vanished"
+
+
+def state_path(settings, name):
+    """Return the path of a file in the project's state directory, creating it"""
+    state_dir = Path(data_path(settings.get("CITY_SCRAPERS_STATE_DIR", "state")))
+    state_dir.mkdir(parents=True, exist_ok=True)
+    return str(state_dir / name)
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def meeting_hash(item):
+    """
+    Hash the normalized contents of a meeting so equal meetings always match. Only
+    Meeting fields are hashed, not keys pipelines add like the diff pipelines' _id.
+    """
+    values = {key: value for key, value in dict(item).items() if key in FIELDS}
+    normalized = json.dumps(
+        values, default=_json_default, separators=(",", ":"), sort_keys=True
+    )
+    return sha1(normalized.encode()).hexdigest()
+
+
+class MeetingIndex:
+    """
+    SQLite index of the meetings each spider has produced, keyed by spider name and
+    meeting ID, used to tell whether a scraped meeting is new, changed or unchanged
+    since a previous run and which meetings have stopped appearing. The exported feed
+    line of each meeting is kept as well, so combinefeeds can rebuild a spider's full
+    set of meetings from an incremental feed. Every write is committed right away,
+    since spiders crawled in the same process share the database.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS meetings (
+                spider TEXT NOT NULL,
+                id TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                start TEXT,
+                last_seen TEXT NOT NULL,
+                vanished INTEGER NOT NULL DEFAULT 0,
+                item TEXT,
+                PRIMARY KEY (spider, id)
+            )
+            """
+        )
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(meetings)")]
+        if "item" not in columns:
+            # indexes from before feed lines were kept
+            self.conn.execute("ALTER TABLE meetings ADD COLUMN item TEXT")
+        self.conn.commit()
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(state_path(settings, "meetings.db"))
+
+    def get_hash(self, spider_name, meeting_id):
+        """Return a meeting's hash, or None if it hasn't been exported or vanished"""
+        row = self.conn.execute(
+            "SELECT hash, vanished, item IS NULL FROM meetings "
+            "WHERE spider = ? AND id = ?",
+            (spider_name, meeting_id),
+        ).fetchone()
+        if row is None or row[1] or row[2]:
+            return None
+        return row[0]
+
+    def record(self, spider_name, item, item_hash, seen_at):
+        """Store the latest hash for a meeting and return how it compares to the
+        previously stored version
+        """
+        previous_hash = self.get_hash(spider_name, item["id"])
+        self.conn.execute(
+            """
+            INSERT INTO meetings (spider, id, hash, start, last_seen, vanished)
+            VALUES (?, ?, ?, ?, ?, 0)
+            ON CONFLICT (spider, id) DO UPDATE SET
+                hash = excluded.hash,
+                start = excluded.start,
+                last_seen = excluded.last_seen,
+                vanished = 0
+            """,
+            (
+                spider_name,
+                item["id"],
+                item_hash,
+                item["start"].isoformat(),
+                seen_at.isoformat(),
+            ),
+        )
+        self.conn.commit()
+        if previous_hash is None:
+            return NEW
+        if previous_hash != item_hash:
+            return CHANGED
+        return UNCHANGED
+
+    def save_item(self, spider_name, meeting_id, line, seen_at):
+        """Keep the feed line a meeting was exported as in a run"""
+        self.conn.execute(
+            "UPDATE meetings SET item = ?, last_seen = ?, vanished = 0 "
+            "WHERE spider = ? AND id = ?",
+            (line, seen_at.isoformat(), spider_name, meeting_id),
+        )
+        self.conn.commit()
+
+    def latest_items(self, spider_name):
+        """
+        Yield the feed lines of the meetings seen in a spider's last run, exported
+        in that run or an earlier one
+        """
+        yield from (
+            row[0]
+            for row in self.conn.execute(
+                "SELECT item FROM meetings WHERE spider = ? AND vanished = 0 "
+                "AND item IS NOT NULL AND last_seen = "
+                "(SELECT MAX(last_seen) FROM meetings WHERE spider = ?)",
+                (spider_name, spider_name),
+            )
+        )
+
+    def has_items(self, spider_name):
+        row = self.conn.execute(
+            "SELECT 1 FROM meetings WHERE spider = ? AND item IS NOT NULL LIMIT 1",
+            (spider_name,),
+        ).fetchone()
+        return row is not None
+
+    def mark_vanished(self, spider_name, seen_before, start_after):
+        """Mark upcoming meetings that weren't seen in the current run as vanished and
+        return their IDs
+        """
+        params = (spider_name, seen_before.isoformat(), start_after.isoformat())
+        where = "spider = ? AND vanished = 0 AND last_seen < ? AND start >= ?"
+        ids = [
+            row[0]
+            for row in self.conn.execute(
+                f"SELECT id FROM meetings WHERE {where}", params
+            )
+        ]
+        self.conn.execute(f"UPDATE meetings SET vanished = 1 WHERE {where}", params)
+        self.conn.commit()
+        return ids
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+class ArchivedUrls:
+    """SQLite record of URLs submitted to the Wayback Machine and when"""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS archived_urls (
+                url TEXT PRIMARY KEY,
+                archived_at TEXT NOT NULL
+            )
+            """
+        )
+
+    def since(self, cutoff):
+        """Return the set of URLs archived at or after the cutoff"""
+        return {
+            row[0]
+            for row in self.conn.execute(
+                "SELECT url FROM archived_urls WHERE archived_at >= ?",
+                (cutoff.isoformat(),),
+            )
+        }
+
+    def add(self, urls, archived_at):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO archived_urls (url, archived_at) VALUES (?, ?)",
+            [(url, archived_at.isoformat()) for url in urls],
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class BackfillCheckpoint:
+    """
+    SQLite record of the backfill windows a spider has finished, with the raw events
+    fetched for each, so an interrupted backfill can resume without refetching them
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS backfill_windows (
+                spider TEXT NOT NULL,
+                start TEXT NOT NULL,
+                end TEXT NOT NULL,
+                events TEXT NOT NULL,
+                completed_at TEXT NOT NULL,
+                PRIMARY KEY (spider, start, end)
+            )
+            """
+        )
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(state_path(settings, "backfill.db"))
+
+    def get(self, spider_name, start, end):
+        """Return the events saved for a finished window, or None"""
+        row = self.conn.execute(
+            "SELECT events FROM backfill_windows "
+            "WHERE spider = ? AND start = ? AND end = ?",
+            (spider_name, start.isoformat(), end.isoformat()),
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def save(self, spider_name, start, end, events, completed_at):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO backfill_windows "
+            "(spider, start, end, events, completed_at) VALUES (?, ?, ?, ?, ?)",
+            (
+                spider_name,
+                start.isoformat(),
+                end.isoformat(),
+                json.dumps(events, separators=(",", ":")),
+                completed_at.isoformat(),
+            ),
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class DiffStore:
+    """
+    SQLite store of the last output (in OCD format) of each of a spider's meetings,
+    keyed by meeting ID and indexed by start, used by LocalDiffPipeline
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS diff_meetings (
+                id TEXT PRIMARY KEY,
+                ocd_id TEXT NOT NULL,
+                start TEXT NOT NULL,
+                item TEXT NOT NULL
+            )
+            """
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS diff_meetings_start ON diff_meetings (start)"
+        )
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM diff_meetings").fetchone()[0]
+
+    def ocd_ids(self):
+        """Return a dict of meeting IDs to the OCD IDs they were last output with"""
+        return dict(self.conn.execute("SELECT id, ocd_id FROM diff_meetings"))
+
+    def save(self, item):
+        """Store a meeting as it was output, in OCD format"""
+        extras = item.get("extras") or item.get("extra") or {}
+        meeting_id = extras.get("cityscrapers/id") or extras.get("cityscrapers.org/id")
+        self.conn.execute(
+            "INSERT OR REPLACE INTO diff_meetings (id, ocd_id, start, item) "
+            "VALUES (?, ?, ?, ?)",
+            (
+                meeting_id,
+                item["_id"],
+                item["start_time"][:19],
+                json.dumps(item, separators=(",", ":")),
+            ),
+        )
+
+    def upcoming(self, after):
+        """Yield (meeting ID, item) for meetings starting at or after an ISO datetime
+        string, reading one row at a time
+        """
+        for meeting_id, item in self.conn.execute(
+            "SELECT id, item FROM diff_meetings WHERE start >= ? ORDER BY start",
+            (after,),
+        ):
+            yield meeting_id, json.loads(item)
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+class CrawlHistory:
+    """
+    SQLite history of each spider's runs, with how long each took and the hash of
+    the meetings it found, used by "scrapy schedule" to tell how often a spider's
+    source changes
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS crawl_runs (
+                spider TEXT NOT NULL,
+                started_at TEXT NOT NULL,
+                duration REAL NOT NULL,
+                content_hash TEXT NOT NULL,
+                changed INTEGER NOT NULL,
+                items INTEGER NOT NULL,
+                PRIMARY KEY (spider, started_at)
+            )
+            """
+        )
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(state_path(settings, "schedule.db"))
+
+    def runs(self, spider_name, since):
+        """Return (started_at, duration, changed) for a spider's runs since a
+        datetime, oldest first
+        """
+        return [
+            (datetime.fromisoformat(started_at), duration, bool(changed))
+            for started_at, duration, changed in self.conn.execute(
+                "SELECT started_at, duration, changed FROM crawl_runs "
+                "WHERE spider = ? AND started_at >= ? ORDER BY started_at",
+                (spider_name, since.isoformat()),
+            )
+        ]
+
+    def last(self, spider_name):
+        """Return (started_at, duration, changed) for a spider's last run, or None"""
+        row = self.conn.execute(
+            "SELECT started_at, duration, changed FROM crawl_runs WHERE spider = ? "
+            "ORDER BY started_at DESC LIMIT 1",
+            (spider_name,),
+        ).fetchone()
+        if row is None:
+            return None
+        return datetime.fromisoformat(row[0]), row[1], bool(row[2])
+
+    def record(self, spider_name, started_at, duration, content_hash, items):
+        """Save a run, returning whether its content changed since the last one. A
+        spider's first run counts as a change.
+        """
+        row = self.conn.execute(
+            "SELECT content_hash FROM crawl_runs WHERE spider = ? "
+            "ORDER BY started_at DESC LIMIT 1",
+            (spider_name,),
+        ).fetchone()
+        changed = row is None or row[0] != content_hash
+        self.conn.execute(
+            "INSERT OR REPLACE INTO crawl_runs "
+            "(spider, started_at, duration, content_hash, changed, items) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                spider_name,
+                started_at.isoformat(),
+                duration,
+                content_hash,
+                int(changed),
+                items,
+            ),
+        )
+        self.conn.commit()
+        return changed
+
+    def close(self):
+        self.conn.close()
+
+
+class EnrichmentCache:
+    """
+    Cache for EnrichmentPipeline. Pages are stored on disk by the hash of their
+    content (so identical pages are only stored once) with an SQLite index of the
+    request fingerprint each one was fetched for, alongside the fields parsed for
+    each meeting and the hash of the meeting they were parsed for.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.directory / "enrich.db"))
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS enrich_pages (
+                fingerprint TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                content_type TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                fetched_at TEXT NOT NULL
+            )
+            """
+        )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS enrich_meetings (
+                spider TEXT NOT NULL,
+                id TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                fields TEXT NOT NULL,
+                enriched_at TEXT NOT NULL,
+                PRIMARY KEY (spider, id)
+            )
+            """
+        )
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(state_path(settings, "enrich"))
+
+    def blob_path(self, content_hash):
+        return self.directory / content_hash[:2] / content_hash
+
+    def get_page(self, fingerprint, since):
+        """Return (url, content type, body) for a page fetched since a datetime, or
+        None
+        """
+        row = self.conn.execute(
+            "SELECT url, content_type, content_hash FROM enrich_pages "
+            "WHERE fingerprint = ? AND fetched_at >= ?",
+            (fingerprint, since.isoformat()),
+        ).fetchone()
+        if row is None:
+            return None
+        url, content_type, content_hash = row
+        try:
+            body = zlib.decompress(self.blob_path(content_hash).read_bytes())
+        except FileNotFoundError:
+            return None
+        return url, content_type, body
+
+    def save_page(self, fingerprint, url, content_type, body, fetched_at):
+        """Store a page's body under its content hash, returning the hash"""
+        content_hash = sha1(body).hexdigest()
+        path = self.blob_path(content_hash)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.tmp")
+            tmp_path.write_bytes(zlib.compress(body))
+            os.replace(tmp_path, path)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO enrich_pages "
+            "(fingerprint, url, content_type, content_hash, fetched_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (fingerprint, url, content_type, content_hash, fetched_at.isoformat()),
+        )
+        self.conn.commit()
+        return content_hash
+
+    def get_fields(self, spider_name, meeting_id, item_hash):
+        """Return the fields parsed for a meeting if it hasn't changed, or None"""
+        row = self.conn.execute(
+            "SELECT fields FROM enrich_meetings "
+            "WHERE spider = ? AND id = ? AND hash = ?",
+            (spider_name, meeting_id, item_hash),
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def save_fields(self, spider_name, meeting_id, item_hash, fields, enriched_at):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO enrich_meetings "
+            "(spider, id, hash, fields, enriched_at) VALUES (?, ?, ?, ?, ?)",
+            (
+                spider_name,
+                meeting_id,
+                item_hash,
+                json.dumps(fields, default=_json_default, separators=(",", ":")),
+                enriched_at.isoformat(),
+            ),
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class DedupeIndex:
+    """
+    SQLite index of the meetings every spider has produced, keyed by spider name and
+    meeting ID, with the normalized key, agency and same-day bucket DedupePipeline
+    matches them on. Duplicates point to the spider and meeting ID of the meeting they
+    duplicate, and keep their links so they can be merged into it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS dedupe_meetings (
+                spider TEXT NOT NULL,
+                id TEXT NOT NULL,
+                key TEXT NOT NULL,
+                agency TEXT NOT NULL DEFAULT '',
+                day TEXT NOT NULL,
+                time TEXT NOT NULL,
+                tokens TEXT NOT NULL,
+                links TEXT NOT NULL,
+                seen_order INTEGER NOT NULL,
+                last_seen TEXT NOT NULL,
+                duplicate_of_spider TEXT,
+                duplicate_of_id TEXT,
+                PRIMARY KEY (spider, id)
+            )
+            """
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS dedupe_meetings_key ON dedupe_meetings (key)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS dedupe_meetings_day ON dedupe_meetings (day)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS dedupe_meetings_duplicate_of "
+            "ON dedupe_meetings (duplicate_of_spider, duplicate_of_id)"
+        )
+        columns = [
+            row[1] for row in self.conn.execute("PRAGMA table_info(dedupe_meetings)")
+        ]
+        if "agency" not in columns:
+            # indexes from before agencies were kept
+            self.conn.execute(
+                "ALTER TABLE dedupe_meetings ADD COLUMN agency TEXT NOT NULL DEFAULT ''"
+            )
+        self.conn.commit()
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(state_path(settings, "dedupe.db"))
+
+    def seen_order(self, spider_name, meeting_id):
+        """Return where a meeting comes in the order meetings were first seen, or
+        None if it's new
+        """
+        row = self.conn.execute(
+            "SELECT seen_order FROM dedupe_meetings WHERE spider = ? AND id = ?",
+            (spider_name, meeting_id),
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def candidates(self, key, day, seen_order, seen_since):
+        """
+        Return (spider, id, whether the key matches, agency, time, tokens) for
+        meetings on the same day that aren't duplicates themselves and were last seen
+        since ``seen_since``, exact matches first. Meetings already in the index are
+        only matched against the ones first seen before them (by ``seen_order``), and
+        new ones (with ``seen_order`` None) against all of them.
+        """
+        return self.conn.execute(
+            "SELECT spider, id, key = ?, agency, time, tokens FROM dedupe_meetings "
+            "WHERE day = ? AND duplicate_of_id IS NULL AND last_seen >= ? "
+            "AND (? IS NULL OR seen_order < ?) ORDER BY key = ? DESC, seen_order",
+            (key, day, seen_since, seen_order, seen_order, key),
+        ).fetchall()
+
+    def save(
+        self,
+        spider_name,
+        meeting_id,
+        agency,
+        parts,
+        links,
+        seen_order,
+        seen_at,
+        duplicate_of,
+    ):
+        """Save a meeting with its normalized agency, (key, day, time, tokens) parts
+        and the (spider, id) it duplicates, or None. New meetings (with
+        ``seen_order`` None) come after every meeting seen so far.
+        """
+        key, day, time, tokens = parts
+        duplicate_spider, duplicate_id = duplicate_of or (None, None)
+        if seen_order is None:
+            seen_order = self.conn.execute(
+                "SELECT COALESCE(MAX(seen_order), 0) + 1 FROM dedupe_meetings"
+            ).fetchone()[0]
+        self.conn.execute(
+            "INSERT OR REPLACE INTO dedupe_meetings (spider, id, key, agency, day, "
+            "time, tokens, links, seen_order, last_seen, duplicate_of_spider, "
+            "duplicate_of_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                spider_name,
+                meeting_id,
+                key,
+                agency,
+                day,
+                time,
+                " ".join(sorted(tokens)),
+                json.dumps(links, separators=(",", ":")),
+                seen_order,
+                seen_at,
+                duplicate_spider,
+                duplicate_id,
+            ),
+        )
+        self.conn.commit()
+
+    def duplicate_links(self, spider_name, meeting_id):
+        """Return the links of every meeting that duplicates a meeting"""
+        links = []
+        for (row_links,) in self.conn.execute(
+            "SELECT links FROM dedupe_meetings "
+            "WHERE duplicate_of_spider = ? AND duplicate_of_id = ? ORDER BY seen_order",
+            (spider_name, meeting_id),
+        ):
+            links.extend(json.loads(row_links))
+        return links
+
+    def close(self):
+        self.conn.close()
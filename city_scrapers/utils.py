@@ -0,0 +1,29 @@
+import re
+from json import JSONDecodeError, JSONDecoder
+
+_decoder = JSONDecoder()
+_whitespace = re.compile(r"\s*")
+
+
+def iter_json_array(text):
+    """
+    Yield the values of a top-level JSON array one at a time instead of decoding the
+    whole document up front, so callers can stop reading once they have what they
+    need.
+    """
+    idx = _whitespace.match(text).end()
+    if text[idx : idx + 1] != "[":
+        raise JSONDecodeError("Expecting '['", text, idx)
+    idx = _whitespace.match(text, idx + 1).end()
+    if text[idx : idx + 1] == "]":
+        return
+    while True:
+        value, idx = _decoder.raw_decode(text, idx)
+        yield value
+        idx = _whitespace.match(text, idx).end()
+        char = text[idx : idx + 1]
+        if char == "]":
+            return
+        if char != ",":
+            raise JSONDecodeError("Expecting ',' delimiter", text, idx)
+        idx = _whitespace.match(text, idx + 1).end()
@@ -0,0 +1,41 @@
+from os.path import dirname, join
+
+import pytest
+from city_scrapers_core.utils import file_response
+from freezegun import freeze_time
+from scrapy.utils.test import get_crawler
+
+from city_scrapers.spiders.cinoh_Civil_Service import CinohCivilServiceSpider
+from city_scrapers.status import set_status_and_ids
+
+FILES_DIR = join(dirname(__file__), "files")
+
+
+@pytest.fixture
+def parsed_items():
+    """Civil Service meetings from the test meetings list, as of 2024-11-06"""
+    response = file_response(
+        join(FILES_DIR, "cinoh_Civil_Service.json"),
+        url="https://go.boarddocs.com/oh/csc/Board.nsf/BD-GetMeetingsList",
+    )
+    spider = CinohCivilServiceSpider()
+    with freeze_time("2024-11-06"):
+        return list(set_status_and_ids(spider, spider.parse(response)))
+
+
+@pytest.fixture
+def get_state_crawler():
+    """
+    Return a function that creates a Civil Service crawler and spider with state
+    kept in a directory, for pipelines that keep state between runs
+    """
+
+    def get_state_crawler(state_dir, **settings):
+        crawler = get_crawler(
+            CinohCivilServiceSpider,
+            {"CITY_SCRAPERS_STATE_DIR": str(state_dir), **settings},
+        )
+        crawler.spider = crawler._create_spider()
+        return crawler
+
+    return get_state_crawler
@@ -0,0 +1,39 @@
+from benchmarks.run import BENCHMARKS, regressions
+
+baseline = {
+    "cinoh_city_council": {
+        "items_per_sec": 1000,
+        "peak_rss_mb": 50.0,
+        "alloc_bytes_per_item": 2000,
+    }
+}
+
+
+def test_generators_parse():
+    for name, setup in BENCHMARKS.items():
+        assert len(list(setup(25)())) == 25, name
+
+
+def test_regressions_within_threshold():
+    results = {
+        "cinoh_city_council": {
+            "items_per_sec": 800,
+            "peak_rss_mb": 60.0,
+            "alloc_bytes_per_item": 2400,
+        }
+    }
+    assert regressions(results, baseline, 0.25) == []
+
+
+def test_regressions_past_threshold():
+    results = {
+        "cinoh_city_council": {
+            "items_per_sec": 700,
+            "peak_rss_mb": 40.0,
+            "alloc_bytes_per_item": 2600,
+        }
+    }
+    failures = regressions(results, baseline, 0.25)
+    assert len(failures) == 2
+    assert failures[0].startswith("cinoh_city_council items_per_sec: 700")
+    assert failures[1].startswith("cinoh_city_council alloc_bytes_per_item: 2600")
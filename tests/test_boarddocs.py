@@ -0,0 +1,106 @@
+from os.path import dirname, join
+
+from city_scrapers_core.spiders import CityScrapersSpider
+from city_scrapers_core.utils import file_response
+from freezegun import freeze_time
+from scrapy.http import TextResponse
+from scrapy.utils.test import get_crawler
+
+from city_scrapers.mixins import BoardDocsCommittee, BoardDocsMixin
+from city_scrapers.status import set_status_and_ids
+
+test_response = file_response(
+    join(dirname(__file__), "files", "cinoh_Civil_Service.json"),
+    url="https://go.boarddocs.com/oh/csc/Board.nsf/BD-GetMeetingsList",
+)
+
+
+class BoardDocsTestSpider(BoardDocsMixin, CityScrapersSpider):
+    name = "boarddocs_test"
+    agency = "BoardDocs Test"
+    timezone = "America/New_York"
+    committees = [
+        BoardDocsCommittee(
+            "oh/csc", "A9HCN931D6BA", "Civil Service", {"name": "A", "address": ""}
+        ),
+        BoardDocsCommittee(
+            "oh/test", "B1234567890C", "Test Board", {"name": "B", "address": ""}
+        ),
+    ]
+
+
+crawler = get_crawler(BoardDocsTestSpider)
+spider = crawler._create_spider()
+requests = list(spider.start_requests())
+
+with freeze_time("2024-11-06"):
+    response = TextResponse(
+        requests[1].url, body=test_response.body, request=requests[1]
+    )
+    response.meta["download_latency"] = 0.25
+    parsed_items = list(
+        set_status_and_ids(spider, spider.parse(response, **requests[1].cb_kwargs))
+    )
+
+
+def test_requests():
+    assert [request.url for request in requests] == [
+        "https://go.boarddocs.com/oh/csc/Board.nsf/BD-GetMeetingsList",
+        "https://go.boarddocs.com/oh/test/Board.nsf/BD-GetMeetingsList",
+    ]
+    assert requests[1].body == b"current_committee_id=B1234567890C"
+    # separate slots so committees on the same host are requested at once
+    assert len({request.meta["download_slot"] for request in requests}) == 2
+
+
+def test_committee_fields():
+    item = parsed_items[0]
+    assert item["location"] == {"name": "B", "address": ""}
+    assert item["source"] == (
+        "https://go.boarddocs.com/oh/test/Board.nsf/vpublic?open#tab-meetings"
+    )
+    assert item["links"][0]["href"].startswith(
+        "https://go.boarddocs.com/oh/test/Board.nsf/Download-AgendaDetailed?open"
+    )
+    assert item["links"][0]["href"].endswith("&current_committee_id=B1234567890C")
+
+
+def test_committee_ids():
+    # both committees have meetings with the same title and start
+    first = TextResponse(requests[0].url, body=test_response.body, request=requests[0])
+    with freeze_time("2024-11-06"):
+        first_items = list(
+            set_status_and_ids(spider, spider.parse(first, **requests[0].cb_kwargs))
+        )
+    title = "november_7_2024_civil_service_commission"
+    assert first_items[0]["id"] == f"boarddocs_test/202411070000/A9HCN931D6BA/{title}"
+    assert parsed_items[0]["id"] == f"boarddocs_test/202411070000/B1234567890C/{title}"
+    assert spider.meeting_agency(first_items[0]) == "Civil Service"
+    assert spider.meeting_agency(parsed_items[0]) == "Test Board"
+
+
+def test_committee_stats():
+    stats = crawler.stats
+    assert stats.get_value("boarddocs/B1234567890C/meetings") == 12
+    assert stats.get_value("boarddocs/B1234567890C/download_ms") == 250
+
+
+def test_enrichment():
+    item = parsed_items[0]
+    request = spider.enrich_request(item)
+    assert request.url == "https://go.boarddocs.com/oh/test/Board.nsf/BD-GetAgenda"
+    assert request.body.endswith(b"&current_committee_id=B1234567890C")
+    assert request.meta["download_slot"] == "boarddocs/B1234567890C"
+
+    agenda = file_response(
+        join(dirname(__file__), "files", "cinoh_Civil_Service_agenda.html"),
+        url=request.url,
+    )
+    assert spider.parse_enrichment(item, agenda)["description"].split("\n") == [
+        "Call to Order",
+        "Approval of Minutes",
+        "Minutes of the October 17, 2024 Meeting",
+        "Old Business",
+        "Appeal of Police Officer examination results",
+        "Request for eligible list extension",
+    ]
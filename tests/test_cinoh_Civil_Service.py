@@ -1,3 +1,4 @@
+import json
 from datetime import datetime
 from os.path import dirname, join
 
@@ -5,8 +6,10 @@ import pytest
 from city_scrapers_core.constants import COMMISSION
 from city_scrapers_core.utils import file_response
 from freezegun import freeze_time
+from scrapy.http import TextResponse
 
 from city_scrapers.spiders.cinoh_Civil_Service import CinohCivilServiceSpider
+from city_scrapers.status import set_status_and_ids
 
 test_response = file_response(
     join(dirname(__file__), "files", "cinoh_Civil_Service.json"),
@@ -17,7 +20,23 @@ spider = CinohCivilServiceSpider()
 freezer = freeze_time("2024-11-06")
 freezer.start()
 
-parsed_items = [item for item in spider.parse(test_response)]
+parsed_items = list(set_status_and_ids(spider, spider.parse(test_response)))
+
+# move a recent meeting after some that are past the cutoff
+rows = json.loads(test_response.text)
+rows.insert(15, rows.pop(3))
+unsorted_response = TextResponse(
+    url=test_response.url, body=json.dumps(rows), encoding="utf-8"
+)
+unsorted_items = list(set_status_and_ids(spider, spider.parse(unsorted_response)))
+
+# rows well past the cutoff shouldn't be read at all
+truncated_response = TextResponse(
+    url=test_response.url,
+    body=test_response.text[: test_response.text.index("20150924")],
+    encoding="utf-8",
+)
+truncated_items = list(set_status_and_ids(spider, spider.parse(truncated_response)))
 
 freezer.stop()
 
@@ -87,3 +106,13 @@ def test_classification():
 @pytest.mark.parametrize("item", parsed_items)
 def test_all_day(item):
     assert item["all_day"] is False
+
+
+def test_stops_early():
+    assert len(truncated_items) == 12
+
+
+def test_unsorted():
+    assert sorted(item["id"] for item in unsorted_items) == sorted(
+        item["id"] for item in parsed_items
+    )
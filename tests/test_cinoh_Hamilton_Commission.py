@@ -1,14 +1,17 @@
-from datetime import datetime
+from datetime import date, datetime
 from os.path import dirname, join
 
 import pytest
 from city_scrapers_core.constants import COMMISSION
 from city_scrapers_core.utils import file_response
 from freezegun import freeze_time
+from scrapy.http import HtmlResponse
+from scrapy.utils.test import get_crawler
 
 from city_scrapers.spiders.cinoh_Hamilton_Commission import (
     CinohHamiltonCommissionSpider,
 )
+from city_scrapers.status import set_status_and_ids
 
 test_response = file_response(
     join(dirname(__file__), "files", "cinoh_Hamilton_Commission.html"),
@@ -19,7 +22,13 @@ spider = CinohHamiltonCommissionSpider()
 freezer = freeze_time("2024-12-31")
 freezer.start()
 
-parsed_items = [item for item in spider.parse(test_response)]
+parsed_items = list(set_status_and_ids(spider, spider.parse(test_response)))
+
+incremental_spider = CinohHamiltonCommissionSpider()
+incremental_spider.incremental_parse_bytes = 0
+incremental_items = list(
+    set_status_and_ids(incremental_spider, incremental_spider.parse(test_response))
+)
 
 freezer.stop()
 
@@ -80,6 +89,10 @@ def test_links():
     ]
 
 
+def test_incremental_parse():
+    assert incremental_items == parsed_items
+
+
 def test_classification():
     assert parsed_items[0]["classification"] == COMMISSION
 
@@ -87,3 +100,72 @@ def test_classification():
 @pytest.mark.parametrize("item", parsed_items)
 def test_all_day(item):
     assert item["all_day"] is False
+
+
+def search_spider(**settings):
+    crawler = get_crawler(CinohHamiltonCommissionSpider, settings)
+    crawler.stats.open_spider(None)
+    return crawler._create_spider()
+
+
+def search_response(request, body=test_response.body):
+    return HtmlResponse(request.url, body=body, request=request)
+
+
+@freeze_time("2024-12-31")
+def test_search_window():
+    search = search_spider(
+        CITY_SCRAPERS_ONBASE_DAYS_BACK=30, CITY_SCRAPERS_ONBASE_DAYS_AHEAD=60
+    )
+    (request,) = search.start_requests()
+    assert request.url == (
+        "https://hcjfsonbase.jfs.hamilton-co.org/OnBaseAgendaOnline/Meetings/Search"
+        "?dropid=11&dropsv=12%2F01%2F2024&dropev=03%2F01%2F2025"
+    )
+    body = test_response.body.replace(b"The Search Limit has been reached", b"")
+    response = search_response(request, body)
+    items = list(
+        set_status_and_ids(search, search.parse(response, **request.cb_kwargs))
+    )
+    assert items == [
+        item
+        for item in parsed_items
+        if datetime(2024, 12, 1) <= item["start"] < datetime(2025, 3, 2)
+    ]
+    assert 0 < len(items) < len(parsed_items)
+
+
+@freeze_time("2024-12-31")
+def test_search_limit_splits_window():
+    search = search_spider()
+    (request,) = search.start_requests()
+    first, second = search.parse(search_response(request), **request.cb_kwargs)
+    assert first.cb_kwargs["window"] == (date(2024, 10, 2), date(2025, 2, 14))
+    assert second.cb_kwargs["window"] == (date(2025, 2, 14), date(2025, 6, 30))
+    assert search.crawler.stats.get_value("onbase/windows_split") == 1
+
+    # a single day is parsed even if it reaches the limit
+    day = search._search_request((date(2025, 1, 7), date(2025, 1, 8)))
+    assert "dropsv=01%2F07%2F2025&dropev=01%2F07%2F2025" in day.url
+    items = list(search.parse(search_response(day), **day.cb_kwargs))
+    assert [item["start"] for item in items] == [datetime(2025, 1, 7, 10, 0)]
+
+
+@freeze_time("2024-12-31")
+def test_archive_windows():
+    archive = search_spider(
+        CITY_SCRAPERS_ONBASE_ARCHIVE_START="2024-01-01",
+        CITY_SCRAPERS_ONBASE_ARCHIVE_WINDOW="year",
+        CITY_SCRAPERS_ONBASE_ARCHIVE_CONCURRENCY=3,
+        CITY_SCRAPERS_HOST_PROFILES={
+            "hcjfsonbase.jfs.hamilton-co.org": {"max_concurrency": 2}
+        },
+    )
+    assert archive.settings.getint("CONCURRENT_REQUESTS_PER_DOMAIN") == 3
+    assert archive.settings.getdict("CITY_SCRAPERS_HOST_PROFILES") == {
+        "hcjfsonbase.jfs.hamilton-co.org": {"max_concurrency": 3}
+    }
+    assert [request.cb_kwargs["window"] for request in archive.start_requests()] == [
+        (date(2024, 1, 1), date(2025, 1, 1)),
+        (date(2025, 1, 1), date(2025, 6, 30)),
+    ]
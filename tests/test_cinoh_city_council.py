@@ -1,12 +1,16 @@
 import json
-from datetime import datetime
+from datetime import date, datetime
 from os.path import dirname, join
 
 import pytest
 from city_scrapers_core.constants import CITY_COUNCIL, COMMITTEE
+from city_scrapers_core.items import Meeting
 from freezegun import freeze_time
+from scrapy.http import HtmlResponse, TextResponse
+from scrapy.utils.test import get_crawler
 
 from city_scrapers.spiders.cinoh_city_council import CinohCityCouncilSpider
+from city_scrapers.status import set_status_and_ids
 
 freezer = freeze_time("2024-10-18")
 freezer.start()
@@ -17,7 +21,36 @@ with open(
     test_response = json.load(f)
 
 spider = CinohCityCouncilSpider()
-parsed_items = [item for item in spider.parse_legistar(test_response)]
+parsed_items = list(set_status_and_ids(spider, spider.parse_legistar(test_response)))
+
+URL = "https://webapi.legistar.com/v1/cincinnatioh/events"
+
+api_crawler = get_crawler(
+    CinohCityCouncilSpider,
+    {"CITY_SCRAPERS_LEGISTAR_API": True, "LEGISTAR_API_URL": "http://127.0.0.1:8080"},
+)
+api_spider = api_crawler._create_spider()
+with open(
+    join(dirname(__file__), "files", "cinoh_city_council_api_bodies.json"), "rb"
+) as f:
+    bodies_request = next(api_spider.start_requests())
+    events_request = next(
+        api_spider.parse_api_bodies(
+            TextResponse(bodies_request.url, body=f.read(), request=bodies_request)
+        )
+    )
+with open(
+    join(dirname(__file__), "files", "cinoh_city_council_api_events.json"), "rb"
+) as f:
+    api_results = list(
+        set_status_and_ids(
+            api_spider,
+            api_spider.parse_api_events(
+                TextResponse(events_request.url, body=f.read(), request=events_request),
+                **events_request.cb_kwargs,
+            ),
+        )
+    )
 
 freezer.stop()
 
@@ -122,3 +155,185 @@ def test_classification():
 @pytest.mark.parametrize("item", parsed_items)
 def test_all_day(item):
     assert item["all_day"] is False
+
+
+def test_normalize_row():
+    row = spider._normalize_row(test_response[8])
+    assert row.start == datetime(2024, 10, 17, 12, 30)
+    assert row.location == "Council Chambers, Room 300 SPECIAL SESSION"
+    assert [title for title, href in row.links] == [
+        "meeting page",
+        "iCalendar",
+        "Meeting Details",
+        "Agenda",
+        "Agenda Packet",
+    ]
+    assert not hasattr(row, "__dict__")
+
+
+def test_enrichment():
+    item = next(
+        item
+        for item in parsed_items
+        if "Meeting Details" in [link["title"] for link in item["links"]]
+    )
+    request = spider.enrich_request(item)
+    assert request.url.startswith(
+        "https://cincinnatioh.legistar.com/MeetingDetail.aspx?ID="
+    )
+    with open(
+        join(dirname(__file__), "files", "cinoh_city_council_detail.html"), "rb"
+    ) as f:
+        detail = HtmlResponse(request.url, body=f.read(), request=request)
+    fields = spider.parse_enrichment(item, detail)
+    assert fields["location"] == {
+        "address": "801 Plum St. Cincinnati, OH 45202",
+        "name": "Council Chambers, Room 300 City Hall",
+    }
+    assert fields["description"].split("\n") == [
+        "ORDINANCE (EMERGENCY) submitted by Sheryl M. M. Long, City Manager, on "
+        "10/30/2024, AUTHORIZING the transfer of funds.",
+        "REPORT, dated 10/30/2024, submitted by the City Manager, regarding the "
+        "Fiscal Year 2025 budget update.",
+    ]
+
+
+def test_enrichment_without_details():
+    item = next(
+        item
+        for item in parsed_items
+        if "Meeting Details" not in [link["title"] for link in item["links"]]
+    )
+    assert spider.enrich_request(item) is None
+
+
+def test_api_requests():
+    assert bodies_request.url == "http://127.0.0.1:8080/v1/cincinnatioh/bodies"
+    assert events_request.url == (
+        "http://127.0.0.1:8080/v1/cincinnatioh/events"
+        "?%24filter=EventDate%20ge%20datetime%272023-01-01%27%20and%20"
+        "EventDate%20lt%20datetime%272025-01-01%27"
+        "&%24orderby=EventId&%24top=1000&%24skip=0"
+    )
+    # a short page is the last one
+    assert all(isinstance(item, Meeting) for item in api_results)
+    assert len(api_results) == 21
+
+
+@freeze_time("2024-10-18")
+def test_api_next_page():
+    page_spider = get_crawler(CinohCityCouncilSpider)._create_spider()
+    page_spider.api_page_size = 2
+    with open(
+        join(dirname(__file__), "files", "cinoh_city_council_api_events.json"), "rb"
+    ) as f:
+        body = json.dumps(json.load(f)[:2]).encode()
+    results = list(page_spider.parse_api_events(TextResponse(URL, body=body), skip=4))
+    assert len(results) == 3
+    assert results[-1].url.endswith("&%24top=2&%24skip=6")
+    assert results[-1].cb_kwargs == {"skip": 6}
+
+
+def test_api_matches_calendar():
+    # the API doesn't have agenda packet links, everything else is the same
+    calendar_items = []
+    for item in parsed_items:
+        item = item.copy()
+        item["links"] = [
+            link for link in item["links"] if link["title"] != "Agenda Packet"
+        ]
+        calendar_items.append(item)
+    assert api_results == calendar_items
+
+
+def backfill_spider(state_dir, **settings):
+    crawler = get_crawler(
+        CinohCityCouncilSpider,
+        {
+            "CITY_SCRAPERS_BACKFILL_START": "2024-09-01",
+            "CITY_SCRAPERS_BACKFILL_END": "2024-11-01",
+            "CITY_SCRAPERS_BACKFILL_WINDOW": "month",
+            "CITY_SCRAPERS_STATE_DIR": str(state_dir),
+            **settings,
+        },
+    )
+    crawler.stats.open_spider(None)
+    return crawler._create_spider()
+
+
+def backfill_response(request, events):
+    return TextResponse(request.url, body=json.dumps(events).encode(), request=request)
+
+
+@freeze_time("2024-11-18")
+def test_backfill(tmp_path):
+    with open(
+        join(dirname(__file__), "files", "cinoh_city_council_api_events.json"), "rb"
+    ) as f:
+        events = json.load(f)
+    backfill = backfill_spider(tmp_path)
+    assert backfill.settings.getint("CONCURRENT_REQUESTS_PER_DOMAIN") == 4
+    assert backfill.settings.getfloat("AUTOTHROTTLE_TARGET_CONCURRENCY") == 4
+
+    bodies = next(backfill.start_requests())
+    september, october = backfill.parse_api_bodies(backfill_response(bodies, []))
+    assert september.cb_kwargs["window"] == (date(2024, 9, 1), date(2024, 10, 1))
+    assert (
+        "datetime%272024-10-01%27%20and%20EventDate%20lt%20datetime%272024-11-01"
+        in (october.url)
+    )
+
+    # a full page is held until the rest of the window is fetched
+    backfill.api_page_size = 20
+    next_page = next(
+        backfill.parse_backfill_events(
+            backfill_response(october, events[:20]), **october.cb_kwargs
+        )
+    )
+    assert next_page.cb_kwargs["skip"] == 20
+    items = list(
+        backfill.parse_backfill_events(
+            backfill_response(next_page, events[20:]), **next_page.cb_kwargs
+        )
+    )
+    assert len(items) == 21
+    # meetings already output from another window are skipped
+    assert (
+        list(
+            backfill.parse_backfill_events(
+                backfill_response(september, events), **september.cb_kwargs
+            )
+        )
+        == []
+    )
+    assert backfill.crawler.stats.get_value("backfill/duplicates") == 21
+    backfill.closed("finished")
+
+    # both windows have ended, so resuming parses them without any requests
+    resumed = backfill_spider(tmp_path)
+    resumed.body_guids = backfill.body_guids
+    assert [item["id"] for item in resumed.start_backfill()] == [
+        item["id"] for item in items
+    ]
+    assert resumed.crawler.stats.get_value("backfill/windows_resumed") == 2
+    resumed.closed("finished")
+
+
+@freeze_time("2024-10-18")
+def test_backfill_current_window_not_checkpointed(tmp_path):
+    backfill = backfill_spider(tmp_path)
+    october = list(backfill.start_backfill())[1]
+    list(
+        backfill.parse_backfill_events(
+            backfill_response(october, []), **october.cb_kwargs
+        )
+    )
+    backfill.closed("finished")
+
+    resumed = backfill_spider(tmp_path)
+    requests = list(resumed.start_backfill())
+    assert [request.cb_kwargs["window"] for request in requests] == [
+        (date(2024, 9, 1), date(2024, 10, 1)),
+        (date(2024, 10, 1), date(2024, 11, 1)),
+    ]
+    resumed.closed("finished")
@@ -0,0 +1,192 @@
+import gzip
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+from freezegun import freeze_time
+from scrapy.settings import Settings
+
+from city_scrapers.combine import RunCache, iter_lines, write_outputs
+from city_scrapers.commands.combinefeeds import Command
+from city_scrapers.store import MeetingIndex
+
+SPIDERS = ["cinoh_city_council", "cinoh_Civil_Service"]
+
+
+def meeting(spider, start):
+    return {"id": f"{spider}/{start}", "start": start}
+
+
+def write_feed(path, meetings, compress=False):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = "\n".join(json.dumps(m) for m in meetings).encode()
+    path.write_bytes(gzip.compress(data) if compress else data)
+
+
+def read_jsonlines(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def get_command(tmp_path):
+    command = Command()
+    command.settings = Settings(
+        {
+            "FEED_URI": (tmp_path / "feeds").as_uri()
+            + "/%(year)s/%(month)s/%(day)s/%(hour_min)s/%(name)s.json",
+            "CITY_SCRAPERS_STATE_DIR": str(tmp_path / "state"),
+        }
+    )
+    command.crawler_process = SimpleNamespace(
+        spider_loader=SimpleNamespace(list=lambda: SPIDERS)
+    )
+    return command
+
+
+def test_iter_lines():
+    data = b'{"a": 1}\n{"b": "\xc3\xa9"}\n{"c": 3}'
+    chunks = [data[i : i + 5] for i in range(0, len(data), 5)]
+    assert list(iter_lines(chunks)) == ['{"a": 1}', '{"b": "é"}', '{"c": 3}']
+    compressed = gzip.compress(data)
+    chunks = [compressed[i : i + 5] for i in range(0, len(compressed), 5)]
+    assert list(iter_lines(chunks, gzipped=True)) == list(iter_lines([data]))
+
+
+def test_merge_and_outputs(tmp_path):
+    runs = RunCache(tmp_path / "runs")
+    feeds = {
+        "a": ["2024-11-03T10:00:00", "2024-11-01T10:00:00", "2024-11-05T10:00:00"],
+        "b": ["2024-11-04T10:00:00", "2024-11-02T10:00:00"],
+    }
+    for spider, starts in feeds.items():
+        lines = [json.dumps(meeting(spider, start)) for start in starts]
+        runs.build(spider, f"{spider}.json", "hash", lines, "start")
+    paths, count = write_outputs(
+        runs.merged(["a", "b"]), tmp_path, "2024-11-03T12:00:00"
+    )
+    assert count == 5
+    latest = read_jsonlines(paths["latest.json"])
+    assert [m["start"][8:10] for m in latest] == ["01", "02", "03", "04", "05"]
+    assert json.loads(paths["latest.array.json"].read_text()) == latest
+    assert [m["start"][8:10] for m in read_jsonlines(paths["upcoming.json"])] == [
+        "04",
+        "05",
+    ]
+
+
+def test_empty_outputs(tmp_path):
+    paths, count = write_outputs(iter([]), tmp_path, "2024-11-03T12:00:00")
+    assert count == 0
+    assert json.loads(paths["latest.array.json"].read_text()) == []
+    assert paths["latest.json"].read_text() == ""
+
+
+@freeze_time("2024-11-06 12:00:00")
+def test_combine_local(tmp_path, caplog):
+    feeds = tmp_path / "feeds"
+    council = feeds / "2024/11/06/0600/cinoh_city_council.json"
+    write_feed(
+        council,
+        [
+            meeting("council", "2024-11-20T13:00:00"),
+            meeting("council", "2024-10-01T13:00:00"),
+        ],
+    )
+    # an older run of the same spider is ignored
+    write_feed(feeds / "2024/11/06/0100/cinoh_city_council.json", [])
+    write_feed(
+        feeds / "2024/11/06/0600/cinoh_Civil_Service.json.gz",
+        [meeting("csc", "2024-11-07T09:00:00")],
+        compress=True,
+    )
+    # profiling reports next to the feed sort after it but aren't feeds
+    (feeds / "2024/11/06/0600/cinoh_city_council.profile.json").write_text("{}")
+    (feeds / "2024/11/06/0600/cinoh_city_council.pstats").write_bytes(b"\0")
+
+    command = get_command(tmp_path)
+    command.run([], None)
+    latest = read_jsonlines(feeds / "latest.json")
+    assert [m["id"] for m in latest] == [
+        "council/2024-10-01T13:00:00",
+        "csc/2024-11-07T09:00:00",
+        "council/2024-11-20T13:00:00",
+    ]
+    assert len(read_jsonlines(feeds / "upcoming.json")) == 2
+    assert json.loads((feeds / "latest.array.json").read_text()) == latest
+    assert (feeds / "cinoh_city_council.json").read_bytes() == council.read_bytes()
+
+    # unchanged feeds reuse their sorted runs
+    caplog.set_level("INFO")
+    write_feed(council, [meeting("council", "2024-11-21T13:00:00")])
+    command.run([], None)
+    assert [r.message for r in caplog.records if "unchanged" in r.message] == [
+        "Feed 2024/11/06/0600/cinoh_Civil_Service.json.gz is unchanged, "
+        "reusing its sorted run"
+    ]
+    assert [m["id"] for m in read_jsonlines(feeds / "latest.json")] == [
+        "csc/2024-11-07T09:00:00",
+        "council/2024-11-21T13:00:00",
+    ]
+
+
+@freeze_time("2024-11-06 12:00:00")
+def test_combine_local_keeps_skipped_spiders(tmp_path):
+    feeds = tmp_path / "feeds"
+    write_feed(
+        feeds / "2024/11/06/0600/cinoh_city_council.json",
+        [meeting("council", "2024-11-20T13:00:00")],
+    )
+    # Civil Service last ran two days ago
+    write_feed(
+        feeds / "2024/11/04/0600/cinoh_Civil_Service.json",
+        [meeting("csc", "2024-11-07T09:00:00")],
+    )
+    write_feed(feeds / "2024/11/01/0600/cinoh_Civil_Service.json", [])
+
+    get_command(tmp_path).run([], None)
+    assert [m["id"] for m in read_jsonlines(feeds / "latest.json")] == [
+        "csc/2024-11-07T09:00:00",
+        "council/2024-11-20T13:00:00",
+    ]
+
+
+@freeze_time("2024-11-06 12:00:00")
+def test_combine_local_incremental(tmp_path):
+    feeds = tmp_path / "feeds"
+    (tmp_path / "state").mkdir()
+    index = MeetingIndex(str(tmp_path / "state" / "meetings.db"))
+    runs = [datetime(2024, 11, 5, 6), datetime(2024, 11, 6, 6)]
+    unchanged = meeting("council", "2024-11-20T13:00:00")
+    changed = meeting("council", "2024-11-27T13:00:00")
+    vanished = meeting("council", "2024-11-13T13:00:00")
+    for run, meetings in zip(runs, [[unchanged, changed, vanished], [unchanged]]):
+        for m in meetings:
+            item = {**m, "start": datetime.fromisoformat(m["start"])}
+            index.record("cinoh_city_council", item, "hash", run)
+            index.save_item("cinoh_city_council", m["id"], json.dumps(m), run)
+    index.record(
+        "cinoh_city_council",
+        {**changed, "start": datetime(2024, 11, 27, 13)},
+        "new hash",
+        runs[1],
+    )
+    changed["title"] = "Changed"
+    index.save_item("cinoh_city_council", changed["id"], json.dumps(changed), runs[1])
+    index.mark_vanished("cinoh_city_council", runs[1], runs[1])
+    index.close()
+
+    # the incremental feed only has the changed meeting
+    write_feed(feeds / "2024/11/06/0600/cinoh_city_council.json", [changed])
+    write_feed(
+        feeds / "2024/11/06/0600/cinoh_Civil_Service.json",
+        [meeting("csc", "2024-11-07T09:00:00")],
+    )
+    command = get_command(tmp_path)
+    command.settings.set("CITY_SCRAPERS_INCREMENTAL", True)
+    command.run([], None)
+    latest = read_jsonlines(feeds / "latest.json")
+    assert [m["id"] for m in latest] == [
+        "csc/2024-11-07T09:00:00",
+        "council/2024-11-20T13:00:00",
+        "council/2024-11-27T13:00:00",
+    ]
+    assert latest[2]["title"] == "Changed"
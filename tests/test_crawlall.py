@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+from city_scrapers.commands.crawlall import format_summary
+
+runs = [
+    SimpleNamespace(
+        name="cinoh_Civil_Service",
+        elapsed=0.4,
+        items=12,
+        errors=0,
+        failed=False,
+        reason="finished",
+    ),
+    SimpleNamespace(
+        name="cinoh_city_council",
+        elapsed=12.25,
+        items=21,
+        errors=2,
+        failed=True,
+        reason="DNS lookup failed",
+    ),
+]
+
+summary_lines = format_summary(runs).split("\n")
+
+
+def test_header():
+    assert summary_lines[0].split() == [
+        "spider",
+        "seconds",
+        "items",
+        "errors",
+        "status",
+    ]
+
+
+def test_slowest_first():
+    assert summary_lines[1].startswith("cinoh_city_council")
+    assert summary_lines[2].startswith("cinoh_Civil_Service")
+
+
+def test_row():
+    assert summary_lines[1].split() == [
+        "cinoh_city_council",
+        "12.2",
+        "21",
+        "2",
+        "failed",
+        "(DNS",
+        "lookup",
+        "failed)",
+    ]
+    assert summary_lines[2].split()[1:] == ["0.4", "12", "0", "ok", "(finished)"]
@@ -0,0 +1,66 @@
+from datetime import date, datetime
+
+import pytest
+
+from city_scrapers.dates import clear_cache, date_windows, parse_datetime, parse_stats
+
+
+@pytest.fixture(autouse=True)
+def reset_cache():
+    clear_cache()
+    yield
+    clear_cache()
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("20241107", datetime(2024, 11, 7)),
+        ("10/17/2024", datetime(2024, 10, 17)),
+        ("10/17/2024 12:30 PM", datetime(2024, 10, 17, 12, 30)),
+        ("10/17/2024 12:15 AM", datetime(2024, 10, 17, 0, 15)),
+        ("1/7/2025 10:00:00 AM", datetime(2025, 1, 7, 10, 0)),
+        ("1/7/2025 1:30:15 pm", datetime(2025, 1, 7, 13, 30, 15)),
+        ("  1/7/2025 10:00:00 AM\n", datetime(2025, 1, 7, 10, 0)),
+    ],
+)
+def test_fast_path(text, expected):
+    assert parse_datetime(text, fuzzy=True) == expected
+    assert parse_stats()["fast"] == 1
+    assert parse_stats()["fallback"] == 0
+
+
+def test_fallback():
+    assert parse_datetime("2024-11-07") == datetime(2024, 11, 7)
+    assert parse_datetime("Meeting on Jan 7, 2025", fuzzy=True) == datetime(2025, 1, 7)
+    assert parse_stats()["fallback"] == 2
+
+
+def test_invalid_date_falls_back():
+    with pytest.raises(ValueError):
+        parse_datetime("20241332")
+    assert parse_stats()["fallback"] == 1
+
+
+def test_cache():
+    for _ in range(3):
+        parse_datetime("10/17/2024")
+    stats = parse_stats()
+    assert stats["fast"] == 1
+    assert stats["cache_hits"] == 2
+    assert stats["cache_misses"] == 1
+
+
+def test_date_windows():
+    assert list(date_windows(date(2023, 6, 15), date(2025, 3, 1))) == [
+        (date(2023, 6, 15), date(2024, 1, 1)),
+        (date(2024, 1, 1), date(2025, 1, 1)),
+        (date(2025, 1, 1), date(2025, 3, 1)),
+    ]
+    assert list(date_windows(date(2024, 11, 1), date(2025, 2, 1), "month")) == [
+        (date(2024, 11, 1), date(2024, 12, 1)),
+        (date(2024, 12, 1), date(2025, 1, 1)),
+        (date(2025, 1, 1), date(2025, 2, 1)),
+    ]
+    with pytest.raises(ValueError):
+        list(date_windows(date(2024, 1, 1), date(2025, 1, 1), "week"))
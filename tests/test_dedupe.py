@@ -0,0 +1,169 @@
+import json
+from datetime import datetime
+
+import pytest
+from city_scrapers_core.items import Meeting
+from freezegun import freeze_time
+from scrapy.exceptions import DropItem, NotConfigured
+from scrapy.utils.test import get_crawler
+
+from city_scrapers.pipelines import DedupePipeline
+from city_scrapers.pipelines.dedupe import dedupe_parts, similarity, title_tokens
+from city_scrapers.spiders.cinoh_city_council import CinohCityCouncilSpider
+from city_scrapers.spiders.cinoh_Hamilton_Commission import (
+    CinohHamiltonCommissionSpider,
+)
+
+START = datetime(2024, 11, 6, 13, 0)
+JOINT_AGENCIES = [["Cincinnati City Council", "Hamilton County Board of Commissioners"]]
+
+
+def meeting(meeting_id, title, start=START, href=None):
+    return Meeting(
+        id=meeting_id,
+        title=title,
+        start=start,
+        links=[
+            {"title": "Agenda", "href": href or f"https://example.com/{meeting_id}"}
+        ],
+    )
+
+
+class Run:
+    """A spider's pipeline for one run, sharing the state directory"""
+
+    def __init__(self, tmp_path, spidercls, **settings):
+        crawler = get_crawler(
+            spidercls,
+            {
+                "CITY_SCRAPERS_DEDUPE": True,
+                "CITY_SCRAPERS_STATE_DIR": str(tmp_path),
+                **settings,
+            },
+        )
+        self.spider = crawler._create_spider()
+        self.stats = crawler.stats
+        self.pipeline = DedupePipeline.from_crawler(crawler)
+        self.pipeline.open_spider(self.spider)
+
+    def process(self, item):
+        try:
+            return self.pipeline.process_item(item, self.spider)
+        except DropItem:
+            return None
+
+    def close(self):
+        self.pipeline.spider_closed(self.spider)
+
+
+def read_decisions(tmp_path, spider_name):
+    path = tmp_path / f"{spider_name}.dedupe.jsonl"
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_disabled(tmp_path):
+    with pytest.raises(NotConfigured):
+        Run(tmp_path, CinohCityCouncilSpider, CITY_SCRAPERS_DEDUPE=False)
+
+
+def test_normalized_key():
+    key, day, time, tokens = dedupe_parts(
+        "Cincinnati City Council", meeting("a", "The Budget & Finance Committee")
+    )
+    assert (day, time) == ("2024-11-06", "13:00")
+    assert tokens == {"budget", "finance", "committee"}
+    assert (
+        key
+        == dedupe_parts(
+            "Cincinnati  City Council", meeting("b", "Budget and Finance committee")
+        )[0]
+    )
+    assert similarity(title_tokens("Joint Session"), title_tokens("joint")) == 1.0
+    assert similarity(title_tokens("Regular Meeting"), title_tokens("Session")) == 0.0
+
+
+def test_same_agency_duplicate(tmp_path):
+    run = Run(tmp_path, CinohCityCouncilSpider)
+    assert run.process(meeting("a", "Budget and Finance Committee"))
+    assert run.process(meeting("a", "Budget and Finance Committee")) is None
+    assert run.process(meeting("b", "Budget & Finance Committee")) is None
+    assert run.stats.get_value("dedupe/duplicates/key") == 1
+    run.close()
+    assert read_decisions(tmp_path, "cinoh_city_council") == [
+        {
+            "id": "b",
+            "duplicate_of": {"spider": "cinoh_city_council", "id": "a"},
+            "match": "key",
+            "score": 1.0,
+        }
+    ]
+
+
+def test_stop_word_titles_not_matched(tmp_path):
+    run = Run(tmp_path, CinohCityCouncilSpider)
+    assert run.process(meeting("a", "Regular Meeting"))
+    # without a time, so only the title could match
+    assert run.process(meeting("b", "Regular Session", START.replace(hour=0)))
+    assert run.stats.get_value("dedupe/duplicates") is None
+
+
+def test_other_agency_not_matched(tmp_path):
+    council = Run(tmp_path, CinohCityCouncilSpider)
+    county = Run(tmp_path, CinohHamiltonCommissionSpider)
+    assert council.process(meeting("council/budget", "Budget Committee Meeting"))
+    assert county.process(meeting("county/budget", "Budget Committee"))
+
+
+def test_cross_spider_duplicate(tmp_path):
+    council = Run(tmp_path, CinohCityCouncilSpider)
+    county = Run(
+        tmp_path,
+        CinohHamiltonCommissionSpider,
+        CITY_SCRAPERS_DEDUPE_JOINT_AGENCIES=JOINT_AGENCIES,
+    )
+    title = "Joint Session of City Council and Board of County Commissioners"
+    assert council.process(meeting("council/joint", title))
+    assert county.process(meeting("county/other-time", title, START.replace(hour=9)))
+    assert county.process(meeting("county/other-day", title, START.replace(day=7)))
+    assert (
+        county.process(
+            meeting("county/joint", "City Council and County Commissioners Joint")
+        )
+        is None
+    )
+    assert county.stats.get_value("dedupe/duplicates/title") == 1
+    council.close()
+    county.close()
+    assert read_decisions(tmp_path, "cinoh_Hamilton_Commission")[0]["score"] == 0.833
+
+
+def test_links_merged_across_runs(tmp_path):
+    title = "Joint Session of City Council and Board of County Commissioners"
+    settings = {"CITY_SCRAPERS_DEDUPE_JOINT_AGENCIES": JOINT_AGENCIES}
+    with freeze_time("2024-11-01"):
+        council = Run(tmp_path, CinohCityCouncilSpider, **settings)
+        county = Run(tmp_path, CinohHamiltonCommissionSpider, **settings)
+        assert council.process(meeting("council/joint", title))
+        assert county.process(meeting("county/joint", title)) is None
+        council.close()
+        county.close()
+
+    # the meeting first seen is kept, with its duplicate's links
+    with freeze_time("2024-11-02"):
+        county = Run(tmp_path, CinohHamiltonCommissionSpider, **settings)
+        assert county.process(meeting("county/joint", title)) is None
+        county.close()
+        council = Run(tmp_path, CinohCityCouncilSpider, **settings)
+        item = council.process(meeting("council/joint", title))
+        assert [link["href"] for link in item["links"]] == [
+            "https://example.com/council/joint",
+            "https://example.com/county/joint",
+        ]
+        assert council.stats.get_value("dedupe/merged_links") == 1
+        council.close()
+
+    # meetings that haven't been seen in a while aren't matched
+    with freeze_time("2024-11-20"):
+        county = Run(tmp_path, CinohHamiltonCommissionSpider, **settings)
+        assert county.process(meeting("county/joint", title))
+        county.close()
@@ -0,0 +1,98 @@
+from types import SimpleNamespace
+
+import pytest
+from city_scrapers_core.constants import CANCELLED
+from city_scrapers_core.pipelines import MeetingPipeline, OpenCivicDataPipeline
+from freezegun import freeze_time
+from scrapy.exceptions import DontCloseSpider, DropItem
+from scrapy.utils.test import get_crawler
+
+from city_scrapers.pipelines import LocalDiffPipeline
+from city_scrapers.spiders.cinoh_Civil_Service import CinohCivilServiceSpider
+from city_scrapers.store import DiffStore
+
+
+@pytest.fixture
+def run_pipeline(get_state_crawler):
+    def run_pipeline(state_dir, items, **settings):
+        """
+        Run items through the diff, meeting and OCD pipelines like a crawl,
+        returning the output, the meetings output again as cancelled and the crawler
+        """
+        crawler = get_state_crawler(
+            state_dir,
+            ITEM_PIPELINES={
+                "city_scrapers.pipelines.LocalDiffPipeline": 200,
+                "city_scrapers_core.pipelines.OpenCivicDataPipeline": 400,
+            },
+            **settings,
+        )
+        ocd = OpenCivicDataPipeline()
+        cancelled = []
+        crawler.engine = SimpleNamespace(
+            scraper=SimpleNamespace(
+                _process_spidermw_output=lambda item, *args: cancelled.append(item)
+            )
+        )
+        output = []
+        with freeze_time("2024-11-06"):
+            pipeline = LocalDiffPipeline.from_crawler(crawler)
+            for item in items + [items[0]]:
+                try:
+                    item = pipeline.process_item(item.copy(), crawler.spider)
+                except DropItem:
+                    continue
+                item = MeetingPipeline().process_item(item, crawler.spider)
+                item = ocd.process_item(item, crawler.spider)
+                pipeline.item_scraped(item, None, crawler.spider)
+                output.append(item)
+            with pytest.raises(DontCloseSpider):
+                pipeline.spider_idle(crawler.spider)
+            for item in cancelled:
+                pipeline.process_item(item, crawler.spider)
+                pipeline.item_scraped(item, None, crawler.spider)
+            pipeline.spider_closed(crawler.spider)
+        return output, cancelled, crawler
+
+    return run_pipeline
+
+
+def test_requires_ocd(tmp_path):
+    crawler = get_crawler(CinohCivilServiceSpider, {"ITEM_PIPELINES": {}})
+    with pytest.raises(ValueError):
+        LocalDiffPipeline.from_crawler(crawler)
+
+
+def test_keeps_ids_and_cancels_vanished(tmp_path, run_pipeline, parsed_items):
+    first, cancelled, _ = run_pipeline(tmp_path, parsed_items)
+    # the duplicate meeting is dropped
+    assert len(first) == len(parsed_items)
+    assert cancelled == []
+
+    second, cancelled, crawler = run_pipeline(tmp_path, parsed_items[1:])
+    assert [item["_id"] for item in second] == [item["_id"] for item in first[1:]]
+    assert crawler.stats.get_value("diff/matched") == len(parsed_items) - 1
+    # the upcoming meeting that wasn't scraped is output again as cancelled
+    assert [item["_id"] for item in cancelled] == [first[0]["_id"]]
+    assert cancelled[0]["status"] == CANCELLED
+    assert crawler.stats.get_value("diff/cancelled") == 1
+
+    # and carried forward until it's in the past
+    _, cancelled, _ = run_pipeline(tmp_path, parsed_items[1:])
+    assert [item["_id"] for item in cancelled] == [first[0]["_id"]]
+
+
+def test_snapshot(tmp_path, run_pipeline, parsed_items):
+    snapshot_uri = f"file://{tmp_path}/remote/%(name)s.diff.db"
+    first, _, _ = run_pipeline(
+        tmp_path / "a", parsed_items, CITY_SCRAPERS_DIFF_SNAPSHOT_URI=snapshot_uri
+    )
+    snapshot = DiffStore(str(tmp_path / "remote" / "cinoh_Civil_Service.diff.db"))
+    assert len(snapshot) == len(parsed_items)
+    snapshot.close()
+
+    # a new state directory starts from the snapshot
+    second, _, _ = run_pipeline(
+        tmp_path / "b", parsed_items, CITY_SCRAPERS_DIFF_SNAPSHOT_URI=snapshot_uri
+    )
+    assert [item["_id"] for item in second] == [item["_id"] for item in first]
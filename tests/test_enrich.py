@@ -0,0 +1,134 @@
+from os.path import dirname, join
+from types import SimpleNamespace
+
+import pytest
+from freezegun import freeze_time
+from scrapy.exceptions import NotConfigured
+from scrapy.http import HtmlResponse
+from twisted.internet import defer
+
+from city_scrapers.pipelines import EnrichmentPipeline
+
+with open(
+    join(dirname(__file__), "files", "cinoh_Civil_Service_agenda.html"), "rb"
+) as f:
+    AGENDA = f.read()
+
+
+class FakeEngine:
+    """Engine whose downloads wait until they're answered"""
+
+    def __init__(self):
+        self.pending = []
+
+    def download(self, request):
+        deferred = defer.Deferred()
+        self.pending.append((request, deferred))
+        return deferred
+
+    def respond(self, status=200):
+        request, deferred = self.pending.pop(0)
+        deferred.callback(
+            HtmlResponse(request.url, status=status, body=AGENDA, request=request)
+        )
+
+
+@pytest.fixture
+def get_pipeline(tmp_path, get_state_crawler):
+    def get_pipeline(**settings):
+        crawler = get_state_crawler(
+            tmp_path, **{"CITY_SCRAPERS_ENRICH": True, **settings}
+        )
+        crawler.engine = FakeEngine()
+        return EnrichmentPipeline.from_crawler(crawler), crawler
+
+    return get_pipeline
+
+
+def process(pipeline, item):
+    """Run an item through the pipeline, returning the result once it's ready"""
+    results = []
+    defer.maybeDeferred(
+        pipeline.process_item, item.copy(), pipeline.crawler.spider
+    ).addCallback(results.append)
+    return results
+
+
+def test_disabled(get_pipeline):
+    with pytest.raises(NotConfigured):
+        get_pipeline(CITY_SCRAPERS_ENRICH=False)
+
+
+def test_enrich_and_cache(get_pipeline, parsed_items):
+    pipeline, crawler = get_pipeline()
+    results = process(pipeline, parsed_items[0])
+    assert results == []
+    request, _ = crawler.engine.pending[0]
+    assert request.url.endswith("/oh/csc/Board.nsf/BD-GetAgenda")
+    crawler.engine.respond()
+    assert results[0]["description"].split("\n")[:2] == [
+        "Call to Order",
+        "Approval of Minutes",
+    ]
+    assert crawler.stats.get_value("enrich/fetched") == 1
+    assert crawler.stats.get_value("enrich/enriched") == 1
+    pipeline.spider_closed(crawler.spider)
+
+    # an unchanged meeting gets the same fields without a fetch
+    pipeline, crawler = get_pipeline()
+    results = process(pipeline, parsed_items[0])
+    assert results[0]["description"].startswith("Call to Order")
+    assert crawler.engine.pending == []
+    assert crawler.stats.get_value("enrich/cached") == 1
+
+    # a changed meeting is enriched again, from the page cache
+    changed = parsed_items[0].copy()
+    changed["title"] = "Special Meeting"
+    results = process(pipeline, changed)
+    assert results[0]["description"].startswith("Call to Order")
+    assert crawler.engine.pending == []
+    assert crawler.stats.get_value("enrich/page_cached") == 1
+    assert crawler.stats.get_value("enrich/enriched") == 1
+    pipeline.spider_closed(crawler.spider)
+
+
+def test_page_cache_expires(get_pipeline, parsed_items):
+    pipeline, crawler = get_pipeline()
+    with freeze_time("2024-11-06 06:00"):
+        process(pipeline, parsed_items[0])
+        crawler.engine.respond()
+    changed = parsed_items[0].copy()
+    changed["title"] = "Special Meeting"
+    with freeze_time("2024-11-07 06:00"):
+        process(pipeline, changed)
+    assert len(crawler.engine.pending) == 1
+    pipeline.spider_closed(crawler.spider)
+
+
+def test_concurrency_per_host(get_pipeline, parsed_items):
+    pipeline, crawler = get_pipeline(CITY_SCRAPERS_ENRICH_CONCURRENCY=2)
+    results = [process(pipeline, item) for item in parsed_items[:4]]
+    assert len(crawler.engine.pending) == 2
+    crawler.engine.respond()
+    assert len(crawler.engine.pending) == 2
+    while crawler.engine.pending:
+        crawler.engine.respond()
+    assert all(result[0]["description"] for result in results)
+    pipeline.spider_closed(crawler.spider)
+
+
+def test_failed_fetch(get_pipeline, parsed_items):
+    pipeline, crawler = get_pipeline()
+    results = process(pipeline, parsed_items[0])
+    crawler.engine.respond(status=404)
+    assert results[0]["description"] == ""
+    assert crawler.stats.get_value("enrich/failed") == 1
+    assert crawler.stats.get_value("enrich/fetched") is None
+    pipeline.spider_closed(crawler.spider)
+
+
+def test_spider_without_enrichment(get_pipeline, parsed_items):
+    pipeline, crawler = get_pipeline()
+    item = parsed_items[0].copy()
+    assert pipeline.process_item(item, SimpleNamespace(name="other")) is item
+    pipeline.spider_closed(crawler.spider)
@@ -0,0 +1,125 @@
+import json
+from pathlib import Path
+
+import pytest
+from scrapy import Request, Spider
+from scrapy.exceptions import NotConfigured
+from scrapy.http import TextResponse
+from scrapy.settings import Settings
+from scrapy.utils.test import get_crawler
+
+from city_scrapers.extensions import ProfilingExtension, report_dir
+
+
+class Pipeline:
+    def process_item(self, item, spider):
+        return item
+
+
+def add_extra_param(params, spider):
+    params["extra"] = "extra"
+
+
+class ProfiledSpider(Spider):
+    name = "test_profiled"
+
+    def parse(self, response):
+        for i in range(3):
+            yield {"id": self._get_id(i)}
+
+    def _get_id(self, i):
+        return f"test_{i}"
+
+
+def get_extension(tmp_path, **settings):
+    crawler = get_crawler(
+        ProfiledSpider,
+        {
+            "CITY_SCRAPERS_PROFILE": True,
+            "CITY_SCRAPERS_PROFILE_DIR": str(tmp_path),
+            "CITY_SCRAPERS_PROFILE_METHODS": ["parse", "_get_id", "missing"],
+            "ITEM_PIPELINES": {"tests.test_extensions.Pipeline": 100},
+            "SPIDER_MIDDLEWARES": {
+                "city_scrapers.middleware.MeetingStatusMiddleware": 975
+            },
+            **settings,
+        },
+    )
+    spider = crawler._create_spider()
+    crawler.spider = spider
+    crawler.engine = crawler._create_engine()
+    ext = ProfilingExtension.from_crawler(crawler)
+    ext.spider_opened(spider)
+    return ext, spider, crawler
+
+
+def test_disabled():
+    with pytest.raises(NotConfigured):
+        ProfilingExtension.from_crawler(get_crawler(ProfiledSpider))
+
+
+def test_report(tmp_path):
+    ext, spider, crawler = get_extension(tmp_path)
+    request = Request("https://example.com", meta={"download_latency": 0.25})
+    response = TextResponse(request.url, body=b"abc", request=request)
+    ext.response_downloaded(response, request, spider)
+    # MeetingStatusMiddleware has the highest order, so it's first in the chain
+    spidermw = crawler.engine.scraper.spidermw
+    process_spider_output = spidermw.methods["process_spider_output"][0]
+    output = process_spider_output(response, spider.parse(response), spider)
+    assert [item["id"] for item in output] == [
+        "test_0",
+        "test_1",
+        "test_2",
+    ]
+    itemproc = crawler.engine.scraper.itemproc
+    itemproc.process_item({}, spider)
+    crawler.stats.set_value("item_scraped_count", 3, spider=spider)
+    ext.spider_closed(spider, "finished")
+
+    report = json.loads((tmp_path / "test_profiled.profile.json").read_text())
+    assert report["items"] == 3
+    assert report["bytes_downloaded"] == 3
+    timings = report["timings"]
+    assert timings["spider/parse"]["count"] == 1
+    assert (
+        timings["spidermw/MeetingStatusMiddleware.process_spider_output"]["count"] == 1
+    )
+    assert timings["spider/_get_id"]["count"] == 3
+    assert timings["download"]["max_ms"] == 250
+    assert timings["pipeline/Pipeline.process_item"]["count"] == 1
+    assert any(name.startswith("downloadermw/") for name in ext.timings)
+    assert not (tmp_path / "test_profiled.pstats").exists()
+
+
+def test_cprofile(tmp_path):
+    ext, spider, _ = get_extension(
+        tmp_path, CITY_SCRAPERS_PROFILE_SPIDER="test_profiled"
+    )
+    response = TextResponse("https://example.com", body=b"")
+    list(spider.parse(response))
+    ext.spider_closed(spider, "finished")
+    assert ext.profiled == 1
+    assert (tmp_path / "test_profiled.pstats").exists()
+
+
+def test_report_dir():
+    spider = ProfiledSpider()
+    settings = Settings({"CITY_SCRAPERS_PROFILE_DIR": "/tmp/profile"})
+    assert report_dir(settings, spider) == Path("/tmp/profile")
+    settings.set("FEEDS", {"out/%(name)s/%(time)s.json": {"format": "json"}})
+    assert report_dir(settings, spider) == Path("out/test_profiled")
+    settings.set("FEEDS", {"file:///tmp/feeds/%(name)s.json": {"format": "json"}})
+    assert report_dir(settings, spider) == Path("/tmp/feeds")
+    settings.set("FEEDS", {"azure://a:b@c/%(name)s.json": {"format": "json"}})
+    assert report_dir(settings, spider) == Path("/tmp/profile")
+
+    # every feed URI parameter is filled in, like the feed exporter does
+    spider.year = 2024
+    settings.set("FEEDS", {"out/%(year)s/%(batch_id)d/%(name)s.json": {}})
+    assert report_dir(settings, spider) == Path("out/2024/1")
+    settings.set(
+        "FEEDS",
+        {"out/%(year)s/%(extra)s/%(name)s.json": {"uri_params": add_extra_param}},
+    )
+    assert report_dir(settings, spider) == Path("out/2024/extra")
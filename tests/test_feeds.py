@@ -0,0 +1,120 @@
+import gzip
+import json
+import threading
+
+import pytest
+from scrapy.exporters import JsonLinesItemExporter
+from scrapy.extensions.postprocessing import PostProcessingManager
+from scrapy.utils.test import get_crawler
+
+from city_scrapers.feeds import FileChunkedFeedStorage, ZstdPlugin
+
+ITEMS = [{"id": f"test_{i}", "title": "Meeting " * 10} for i in range(100)]
+
+
+class UploadCounter(FileChunkedFeedStorage):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.uploads = []
+
+    def upload_chunk(self, index, data):
+        self.uploads.append((index, len(data)))
+        super().upload_chunk(index, data)
+
+
+def export(storage, feed_options=None):
+    writer = storage.open(None)
+    file = writer
+    if feed_options:
+        file = PostProcessingManager(
+            feed_options["postprocessing"], writer, feed_options
+        )
+    exporter = JsonLinesItemExporter(file)
+    exporter.start_exporting()
+    for item in ITEMS:
+        exporter.export_item(item)
+    exporter.finish_exporting()
+    if feed_options:
+        file.close()
+    assert not storage.path.exists()
+    writer.finish().result()
+
+
+def read_lines(data):
+    return [json.loads(line) for line in data.splitlines()]
+
+
+def test_file_chunked_storage(tmp_path):
+    path = tmp_path / "feeds" / "test.json"
+    storage = UploadCounter(path.as_uri(), feed_options={"chunk_size": 1000})
+    export(storage)
+    assert read_lines(path.read_bytes()) == ITEMS
+    assert not storage.part_path.exists()
+    assert [index for index, _ in storage.uploads] == list(range(len(storage.uploads)))
+    assert len(storage.uploads) > 5
+    assert all(size >= 1000 for _, size in storage.uploads[:-1])
+
+
+def test_uploads_falling_behind(tmp_path):
+    path = tmp_path / "test.json"
+    storage = UploadCounter(path.as_uri(), feed_options={"chunk_size": 10})
+    uploading = threading.Event()
+    start_upload = storage.start_upload
+    storage.start_upload = lambda: uploading.wait(10) and start_upload()
+    writer = storage.open(None)
+    assert writer.wait().called
+    # writes don't wait for uploads, but scraped items do
+    for i in range(4):
+        writer.write(b"0123456789")
+    assert not writer.wait().called
+    uploading.set()
+    writer.finish().result()
+    assert path.read_bytes() == b"0123456789" * 4
+
+
+def test_upload_error(tmp_path):
+    storage = UploadCounter((tmp_path / "test.json").as_uri())
+    storage.upload_chunk = lambda index, data: 1 / 0
+    writer = storage.open(None)
+    writer.write(b"data")
+    with pytest.raises(ZeroDivisionError):
+        writer.finish().result()
+    assert not storage.path.exists()
+
+
+def test_chunk_size_setting(tmp_path):
+    crawler = get_crawler(settings_dict={"CITY_SCRAPERS_FEED_CHUNK_SIZE": 10})
+    uri = (tmp_path / "test.json").as_uri()
+    assert FileChunkedFeedStorage.from_crawler(crawler, uri).chunk_size == 10
+    storage = FileChunkedFeedStorage.from_crawler(
+        crawler, uri, feed_options={"chunk_size": 20}
+    )
+    assert storage.chunk_size == 20
+
+
+def test_empty_feed(tmp_path):
+    path = tmp_path / "test.json"
+    storage = UploadCounter(path.as_uri())
+    storage.open(None).finish().result()
+    assert path.read_bytes() == b""
+    assert storage.uploads == []
+
+
+def test_gzip_streaming(tmp_path):
+    path = tmp_path / "test.json.gz"
+    storage = UploadCounter(path.as_uri(), feed_options={"chunk_size": 100})
+    export(
+        storage,
+        {"postprocessing": ["scrapy.extensions.postprocessing.GzipPlugin"]},
+    )
+    assert read_lines(gzip.decompress(path.read_bytes())) == ITEMS
+    assert len(storage.uploads) > 1
+
+
+def test_zstd_streaming(tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    path = tmp_path / "test.json.zst"
+    storage = FileChunkedFeedStorage(path.as_uri())
+    export(storage, {"postprocessing": [ZstdPlugin]})
+    data = zstandard.ZstdDecompressor().decompressobj().decompress(path.read_bytes())
+    assert read_lines(data) == ITEMS
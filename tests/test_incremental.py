@@ -0,0 +1,161 @@
+import json
+import sqlite3
+
+import pytest
+from city_scrapers_core.pipelines import DiffPipeline
+from freezegun import freeze_time
+from scrapy.exceptions import DropItem
+
+from city_scrapers.pipelines import IncrementalPipeline
+from city_scrapers.store import MeetingIndex
+
+
+@pytest.fixture
+def run_pipeline(get_state_crawler):
+    def run_pipeline(
+        state_dir, items, full=False, now="2024-11-06", during=None, before=None
+    ):
+        """
+        Run items through a fresh pipeline, returning the output and the crawler.
+        Each item goes through ``before`` first if it's given, like an earlier
+        pipeline. Items that aren't dropped are sent to item_scraped like the engine
+        does, and ``during`` is called before the spider is closed.
+        """
+        crawler = get_state_crawler(
+            state_dir,
+            CITY_SCRAPERS_INCREMENTAL=True,
+            CITY_SCRAPERS_INCREMENTAL_FULL=full,
+        )
+        spider = crawler.spider
+        pipeline = IncrementalPipeline.from_crawler(crawler)
+        output = []
+        with freeze_time(now):
+            pipeline.open_spider(spider)
+            for item in items:
+                item = item.copy()
+                if before:
+                    item = before(item)
+                try:
+                    output.append(pipeline.process_item(item, spider))
+                except DropItem:
+                    continue
+                pipeline.item_scraped(output[-1], spider)
+            if during:
+                during()
+            pipeline.spider_closed(spider, "finished")
+        return output, crawler
+
+    return run_pipeline
+
+
+def read_changes(state_dir):
+    with open(state_dir / "cinoh_Civil_Service.changes.jsonl") as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.fixture
+def state_dir(tmp_path, run_pipeline, parsed_items):
+    run_pipeline(tmp_path, parsed_items, now="2024-11-05")
+    return tmp_path
+
+
+def test_first_run_outputs_everything(tmp_path, run_pipeline, parsed_items):
+    output, crawler = run_pipeline(tmp_path, parsed_items)
+    assert len(output) == 12
+    assert crawler.stats.get_value("incremental/new") == 12
+    assert {change["change"] for change in read_changes(tmp_path)} == {"new"}
+
+
+def test_unchanged_dropped(state_dir, run_pipeline, parsed_items):
+    output, crawler = run_pipeline(state_dir, parsed_items)
+    assert output == []
+    assert crawler.stats.get_value("incremental/unchanged") == 12
+    assert read_changes(state_dir) == []
+
+
+def test_changed(state_dir, run_pipeline, parsed_items):
+    items = [item.copy() for item in parsed_items]
+    items[3]["title"] = "Rescheduled: " + items[3]["title"]
+    output, crawler = run_pipeline(state_dir, items)
+    assert [item["id"] for item in output] == [items[3]["id"]]
+    assert read_changes(state_dir) == [{"id": items[3]["id"], "change": "changed"}]
+
+
+def test_vanished(state_dir, run_pipeline, parsed_items):
+    output, crawler = run_pipeline(state_dir, parsed_items[1:])
+    assert output == []
+    # Only upcoming meetings are reported as vanished
+    assert parsed_items[0]["status"] == "tentative"
+    assert read_changes(state_dir) == [
+        {"id": parsed_items[0]["id"], "change": "vanished"}
+    ]
+
+    output, crawler = run_pipeline(state_dir, parsed_items)
+    assert [item["id"] for item in output] == [parsed_items[0]["id"]]
+    assert read_changes(state_dir) == [{"id": parsed_items[0]["id"], "change": "new"}]
+
+
+class PreviousFeedDiffPipeline(DiffPipeline):
+    """Diff pipeline with the previous feed's OCD events in the spider"""
+
+    def load_previous_results(self):
+        return self.crawler.spider.previous_results
+
+
+def test_unchanged_after_diff_pipeline(
+    state_dir, run_pipeline, parsed_items, get_state_crawler
+):
+    # the diff pipeline runs first in production and adds the previous OCD IDs
+    crawler = get_state_crawler(
+        state_dir,
+        ITEM_PIPELINES={"city_scrapers_core.pipelines.OpenCivicDataPipeline": 400},
+    )
+    crawler.spider.previous_results = [
+        {"_id": f"ocd-event/{i}", "extras": {"cityscrapers/id": item["id"]}}
+        for i, item in enumerate(parsed_items)
+    ]
+    diff = PreviousFeedDiffPipeline.from_crawler(crawler)
+
+    def add_ocd_id(item):
+        item = diff.process_item(item.to_meeting(), crawler.spider)
+        assert "_id" in item
+        return item
+
+    output, crawler = run_pipeline(state_dir, parsed_items, before=add_ocd_id)
+    assert output == []
+    assert crawler.stats.get_value("incremental/unchanged") == 12
+
+
+def test_full(state_dir, run_pipeline, parsed_items):
+    output, crawler = run_pipeline(state_dir, parsed_items, full=True)
+    assert len(output) == 12
+    assert read_changes(state_dir) == []
+
+
+def latest_ids(state_dir):
+    index = MeetingIndex(str(state_dir / "meetings.db"))
+    ids = [json.loads(line)["id"] for line in index.latest_items("cinoh_Civil_Service")]
+    index.close()
+    return sorted(ids)
+
+
+def test_latest_items_keep_unchanged(state_dir, run_pipeline, parsed_items):
+    items = [item.copy() for item in parsed_items]
+    items[3]["title"] = "Rescheduled: " + items[3]["title"]
+    run_pipeline(state_dir, items)
+    assert latest_ids(state_dir) == sorted(item["id"] for item in items)
+
+
+def test_latest_items_leave_out_vanished(state_dir, run_pipeline, parsed_items):
+    run_pipeline(state_dir, parsed_items[1:])
+    assert latest_ids(state_dir) == sorted(item["id"] for item in parsed_items[1:])
+
+
+def test_index_not_locked_during_crawl(tmp_path, run_pipeline, parsed_items):
+    def write_from_other_connection():
+        conn = sqlite3.connect(str(tmp_path / "meetings.db"), timeout=0)
+        conn.execute("UPDATE meetings SET vanished = 0")
+        conn.commit()
+        conn.close()
+
+    run_pipeline(tmp_path, parsed_items, during=write_from_other_connection)
@@ -0,0 +1,96 @@
+import io
+import json
+import pickle
+from datetime import datetime
+
+import pytest
+from city_scrapers_core.constants import COMMISSION, PASSED, TENTATIVE
+from city_scrapers_core.items import Meeting
+from city_scrapers_core.spiders import CityScrapersSpider
+from freezegun import freeze_time
+from itemadapter import ItemAdapter, is_item
+from scrapy.exporters import JsonLinesItemExporter
+
+from city_scrapers.items import CompactMeeting, Location
+from city_scrapers.store import meeting_hash
+
+LOCATION = {"name": "Council Chambers", "address": "801 Plum St"}
+
+
+def meeting_values(**values):
+    return {
+        "title": "Budget Committee",
+        "description": "",
+        "classification": COMMISSION,
+        "start": datetime(2024, 11, 4, 13),
+        "end": None,
+        "all_day": False,
+        "time_notes": "",
+        "location": dict(LOCATION),
+        "links": [{"title": "Agenda", "href": "https://example.com/agenda"}],
+        "source": "https://example.com/calendar",
+        **values,
+    }
+
+
+def test_same_as_meeting():
+    compact = CompactMeeting(meeting_values())
+    meeting = Meeting(meeting_values())
+    assert compact == meeting
+    assert dict(compact) == dict(meeting)
+    assert meeting_hash(compact) == meeting_hash(meeting)
+    assert "status" not in compact
+    assert compact.get("status") is None
+    with pytest.raises(KeyError):
+        compact["status"]
+    with pytest.raises(KeyError):
+        compact["agency"] = "Cincinnati City Council"
+
+
+def test_compact_values():
+    first = CompactMeeting(meeting_values())
+    second = CompactMeeting(meeting_values(title="Finance Committee"))
+    assert isinstance(first.location, Location)
+    assert first.location is second.location
+    assert first.links == (("Agenda", "https://example.com/agenda"),)
+    assert first["links"] == [{"title": "Agenda", "href": "https://example.com/agenda"}]
+    # reading a value doesn't share it with the meeting
+    first["links"].append({"title": "Minutes", "href": "https://example.com/minutes"})
+    assert len(first["links"]) == 1
+    # values that don't fit are kept as they are
+    location = {"name": "Room 300", "address": "", "url": "https://example.com"}
+    first["location"] = location
+    assert first["location"] is location
+
+
+@freeze_time("2024-11-01")
+def test_status_and_id():
+    spider = CityScrapersSpider(name="test")
+    compact = CompactMeeting(meeting_values())
+    meeting = Meeting(meeting_values())
+    assert spider._get_status(compact) == spider._get_status(meeting) == TENTATIVE
+    assert spider._get_id(compact) == spider._get_id(meeting)
+    compact["start"] = datetime(2024, 10, 1)
+    assert spider._get_status(compact) == PASSED
+
+
+def test_to_meeting():
+    compact = CompactMeeting(meeting_values(status=TENTATIVE, id="test/1"))
+    compact["_id"] = "ocd-event/1"
+    meeting = compact.to_meeting()
+    assert isinstance(meeting, Meeting)
+    assert meeting["location"] == LOCATION
+    assert meeting.get("_id") == "ocd-event/1"
+    assert pickle.loads(pickle.dumps(compact)) == compact
+
+
+def test_export():
+    compact = CompactMeeting(meeting_values(status=TENTATIVE, id="test/1"))
+    assert is_item(compact)
+    assert ItemAdapter(compact).asdict() == dict(Meeting(compact))
+    output = io.BytesIO()
+    exporter = JsonLinesItemExporter(output)
+    exporter.export_item(compact)
+    exported = json.loads(output.getvalue())
+    assert exported["location"] == LOCATION
+    assert exported["start"] == "2024-11-04 13:00:00"
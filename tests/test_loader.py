@@ -0,0 +1,79 @@
+import json
+import sys
+
+from scrapy.settings import Settings
+from scrapy.spiderloader import SpiderLoader
+
+from city_scrapers.loader import (
+    DEFAULT_MANIFEST,
+    ManifestSpiderLoader,
+    build_manifest,
+    read_manifest,
+)
+
+SPIDER_SOURCE = """
+from city_scrapers_core.spiders import CityScrapersSpider
+
+
+class LoaderTestSpider(CityScrapersSpider):
+    name = "loader_test"
+    agency = "Loader Test"
+    timezone = "America/New_York"
+"""
+
+
+def spider_settings(tmp_path, monkeypatch):
+    package = tmp_path / "loader_test_spiders"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    (package / "loader_test.py").write_text(SPIDER_SOURCE)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    settings = Settings(
+        {
+            "SPIDER_MODULES": ["loader_test_spiders"],
+            "CITY_SCRAPERS_SPIDER_MANIFEST": str(tmp_path / "manifest.json"),
+        }
+    )
+    manifest = build_manifest(
+        SpiderLoader.from_settings(settings), ["loader_test_spiders"]
+    )
+    (tmp_path / "manifest.json").write_text(json.dumps(manifest))
+    for name in list(sys.modules):
+        if name.startswith("loader_test_spiders"):
+            monkeypatch.delitem(sys.modules, name)
+    return settings
+
+
+def test_manifest_is_current():
+    settings = Settings({"SPIDER_MODULES": ["city_scrapers.spiders"]})
+    manifest = build_manifest(
+        SpiderLoader.from_settings(settings), ["city_scrapers.spiders"]
+    )
+    assert read_manifest(DEFAULT_MANIFEST) == manifest
+
+
+def test_list_without_import(tmp_path, monkeypatch):
+    loader = ManifestSpiderLoader.from_settings(spider_settings(tmp_path, monkeypatch))
+    assert loader.fallback is None
+    assert loader.list() == ["loader_test"]
+    assert "loader_test_spiders.loader_test" not in sys.modules
+
+    spidercls = loader.load("loader_test")
+    assert spidercls.__name__ == "LoaderTestSpider"
+    assert "loader_test_spiders.loader_test" in sys.modules
+
+
+def test_stale_manifest(tmp_path, monkeypatch):
+    settings = spider_settings(tmp_path, monkeypatch)
+    spider_path = tmp_path / "loader_test_spiders" / "loader_test.py"
+    spider_path.write_text(SPIDER_SOURCE.replace("loader_test", "loader_renamed"))
+    loader = ManifestSpiderLoader.from_settings(settings)
+    assert loader.fallback is not None
+    assert loader.list() == ["loader_renamed"]
+
+
+def test_missing_manifest(tmp_path, monkeypatch):
+    settings = spider_settings(tmp_path, monkeypatch)
+    (tmp_path / "manifest.json").unlink()
+    loader = ManifestSpiderLoader.from_settings(settings)
+    assert loader.list() == ["loader_test"]
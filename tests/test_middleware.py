@@ -0,0 +1,388 @@
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+from city_scrapers_core.items import Meeting
+from scrapy import FormRequest, Request, Spider
+from scrapy.core.downloader import Slot
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.http import TextResponse
+from scrapy.utils.test import get_crawler
+from twisted.internet import threads
+from twisted.internet.defer import Deferred, maybeDeferred
+
+from city_scrapers.middleware import (
+    CityScrapersWaybackMiddleware,
+    ConditionalHttpCacheMiddleware,
+    HostCircuit,
+    HostThrottleMiddleware,
+)
+from city_scrapers.store import ArchivedUrls, state_path
+
+URL = "https://go.boarddocs.com/oh/csc/Board.nsf/BD-GetMeetingsList"
+BODY = b'[{"numberdate": "20241107"}]'
+
+
+def get_middleware(tmp_path, **settings):
+    crawler = get_crawler(
+        Spider,
+        {
+            "HTTPCACHE_ENABLED": True,
+            "HTTPCACHE_DIR": str(tmp_path),
+            "HTTPCACHE_POLICY": "city_scrapers.middleware.RevalidatePolicy",
+            **settings,
+        },
+    )
+    spider = crawler._create_spider("test")
+    middleware = ConditionalHttpCacheMiddleware.from_crawler(crawler)
+    middleware.spider_opened(spider)
+    return middleware, spider, crawler.stats
+
+
+def make_request(committee_id="A9HCN931D6BA"):
+    return FormRequest(URL, formdata={"current_committee_id": committee_id})
+
+
+def fetch(middleware, spider, request, status=200, body=BODY, headers=None):
+    """Run a request through the middleware with a stand-in server response"""
+    cached = middleware.process_request(request, spider)
+    assert cached is None
+    response = TextResponse(
+        request.url, status=status, body=body, headers=headers, request=request
+    )
+    return middleware.process_response(request, response, spider)
+
+
+def test_first_fetch_is_stored(tmp_path):
+    middleware, spider, stats = get_middleware(tmp_path)
+    response = fetch(middleware, spider, make_request())
+    assert "cached" not in response.flags
+    assert stats.get_value("httpcache/miss") == 1
+    assert stats.get_value("httpcache/store") == 1
+
+
+def test_revalidates_with_validators(tmp_path):
+    middleware, spider, stats = get_middleware(tmp_path)
+    headers = {"ETag": '"abc"', "Last-Modified": "Wed, 06 Nov 2024 12:00:00 GMT"}
+    fetch(middleware, spider, make_request(), headers=headers)
+
+    request = make_request()
+    middleware.process_request(request, spider)
+    assert request.headers["If-None-Match"] == b'"abc"'
+    assert request.headers["If-Modified-Since"] == b"Wed, 06 Nov 2024 12:00:00 GMT"
+
+    response = middleware.process_response(
+        request, TextResponse(URL, status=304, body=b"", request=request), spider
+    )
+    assert response.body == BODY
+    assert "unchanged" in response.flags
+    assert request.meta["httpcache_unchanged"] is True
+    assert stats.get_value("httpcache/not_modified") == 1
+    assert stats.get_value("httpcache/bytes_saved") == len(BODY)
+
+
+def test_falls_back_to_content_hash(tmp_path):
+    middleware, spider, stats = get_middleware(tmp_path)
+    fetch(middleware, spider, make_request())
+    response = fetch(middleware, spider, make_request())
+    assert "unchanged" in response.flags
+    assert stats.get_value("httpcache/hash_match") == 1
+    assert stats.get_value("httpcache/bytes_saved") is None
+
+    changed = fetch(middleware, spider, make_request(), body=b"[]")
+    assert "unchanged" not in changed.flags
+    assert stats.get_value("httpcache/invalidate") == 1
+
+
+def test_key_includes_form_data(tmp_path):
+    middleware, spider, stats = get_middleware(tmp_path)
+    fetch(middleware, spider, make_request())
+    assert middleware.process_request(make_request("OTHER"), spider) is None
+    assert stats.get_value("httpcache/miss") == 2
+    assert middleware.process_request(Request(URL), spider) is None
+    assert stats.get_value("httpcache/miss") == 3
+
+
+def test_skip_unchanged(tmp_path):
+    middleware, spider, stats = get_middleware(
+        tmp_path, CITY_SCRAPERS_SKIP_UNCHANGED=True
+    )
+    fetch(middleware, spider, make_request())
+    with pytest.raises(IgnoreRequest):
+        fetch(middleware, spider, make_request())
+
+
+class ArchiveHandler(BaseHTTPRequestHandler):
+    """Stand-in for the Wayback Machine save endpoint"""
+
+    def do_GET(self):
+        url = self.path[len("/save/") :]
+        self.server.submitted.append(url)
+        self.send_response(429 if "rate-limited" in url else 200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def archive_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ArchiveHandler)
+    server.submitted = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def thread_calls(monkeypatch):
+    """Run functions deferred to a thread right away, since no reactor is running"""
+    calls = []
+
+    def defer_to_thread(f, *args, **kwargs):
+        calls.append(f)
+        return maybeDeferred(f, *args, **kwargs)
+
+    monkeypatch.setattr(threads, "deferToThread", defer_to_thread)
+    return calls
+
+
+def get_wayback_middleware(tmp_path, archive_server, **settings):
+    crawler = get_crawler(
+        Spider,
+        {
+            "CITY_SCRAPERS_STATE_DIR": str(tmp_path),
+            "WAYBACK_ENDPOINT": f"http://127.0.0.1:{archive_server.server_port}/save/",
+            "WAYBACK_TTL_DAYS": 30,
+            "WAYBACK_QUEUE_SIZE": 100,
+            "WAYBACK_BATCH_SIZE": 2,
+            "WAYBACK_HOST_DELAY": 0,
+            "WAYBACK_BACKOFF": 0,
+            "WAYBACK_DRAIN_TIMEOUT": 10,
+            **settings,
+        },
+    )
+    spider = crawler._create_spider("test")
+    middleware = CityScrapersWaybackMiddleware.from_crawler(crawler)
+    middleware.spider_opened(spider)
+    return middleware, spider, crawler
+
+
+def make_meeting(*hrefs, source="https://cincinnatioh.legistar.com/Calendar.aspx"):
+    return Meeting(
+        title="Council",
+        start=datetime(2024, 11, 6, 13),
+        links=[{"title": "Agenda", "href": href} for href in hrefs],
+        source=source,
+    )
+
+
+def run_spider_output(middleware, spider, items, method="GET"):
+    request = Request(URL, method=method)
+    response = TextResponse(URL, body=b"", request=request)
+    return list(middleware.process_spider_output(response, items, spider))
+
+
+def test_wayback_item_urls(tmp_path, archive_server):
+    middleware, spider, _ = get_wayback_middleware(tmp_path, archive_server)
+    assert middleware.get_item_urls(make_meeting()) == []
+    assert middleware.get_item_urls(make_meeting("https://a.com/1")) == [
+        "https://a.com/1"
+    ]
+    detail = "https://cincinnatioh.legistar.com/MeetingDetail.aspx?ID=1"
+    urls = middleware.get_item_urls(
+        make_meeting(*[f"https://a.com/{i}" for i in range(5)], source=detail)
+    )
+    assert urls[0] == detail
+    assert len(urls) == 4
+    assert middleware.get_item_urls({"documents": [{"url": None}]}) == []
+    middleware.spider_closed(spider)
+
+
+def test_wayback_submits_in_background(tmp_path, archive_server, thread_calls):
+    middleware, spider, crawler = get_wayback_middleware(tmp_path, archive_server)
+    items = [
+        make_meeting("https://a.com/1", "https://b.com/1"),
+        make_meeting("https://a.com/1", "https://web.archive.org/x"),
+    ]
+    assert run_spider_output(middleware, spider, items) == items
+    # the queue is drained off the reactor thread
+    assert isinstance(middleware.spider_closed(spider), Deferred)
+    assert thread_calls == [middleware.queue.close]
+
+    assert sorted(archive_server.submitted) == sorted(
+        [URL, "https://a.com/1", "https://b.com/1"]
+    )
+    stats = crawler.stats
+    assert stats.get_value("wayback/queued") == 3
+    assert stats.get_value("wayback/skipped") == 1
+    assert stats.get_value("wayback/submitted") == 3
+    assert stats.get_value("wayback/dropped") is None
+
+
+def test_wayback_skips_recently_archived(tmp_path, archive_server):
+    store = ArchivedUrls(
+        state_path({"CITY_SCRAPERS_STATE_DIR": str(tmp_path)}, "wayback.db")
+    )
+    store.add(["https://a.com/old"], datetime(2000, 1, 1))
+    store.add(["https://a.com/1"], datetime.now())
+    store.close()
+
+    middleware, spider, crawler = get_wayback_middleware(tmp_path, archive_server)
+    run_spider_output(
+        middleware,
+        spider,
+        [make_meeting("https://a.com/1", "https://a.com/old")],
+        method="POST",
+    )
+    middleware.spider_closed(spider)
+    assert archive_server.submitted == ["https://a.com/old"]
+    assert crawler.stats.get_value("wayback/skipped") == 1
+
+    # submissions are persisted for the next run
+    middleware, spider, crawler = get_wayback_middleware(tmp_path, archive_server)
+    run_spider_output(
+        middleware, spider, [make_meeting("https://a.com/old")], method="POST"
+    )
+    middleware.spider_closed(spider)
+    assert crawler.stats.get_value("wayback/queued") is None
+    assert crawler.stats.get_value("wayback/skipped") == 1
+
+
+def test_wayback_rate_limited(tmp_path, archive_server):
+    middleware, spider, crawler = get_wayback_middleware(tmp_path, archive_server)
+    run_spider_output(
+        middleware, spider, [make_meeting("https://a.com/rate-limited")], method="POST"
+    )
+    middleware.spider_closed(spider)
+    assert crawler.stats.get_value("wayback/rate_limited") == 1
+    assert crawler.stats.get_value("wayback/submitted") is None
+
+    # the URL wasn't archived so it's tried again next time
+    middleware, spider, crawler = get_wayback_middleware(tmp_path, archive_server)
+    run_spider_output(
+        middleware, spider, [make_meeting("https://a.com/rate-limited")], method="POST"
+    )
+    middleware.spider_closed(spider)
+    assert crawler.stats.get_value("wayback/queued") == 1
+
+
+def test_wayback_queue_full(tmp_path, archive_server):
+    middleware, spider, crawler = get_wayback_middleware(
+        tmp_path, archive_server, WAYBACK_QUEUE_SIZE=1
+    )
+    # stop the worker so nothing is taken off the queue
+    middleware.queue.stopped.set()
+    middleware.queue.thread.join()
+    run_spider_output(
+        middleware,
+        spider,
+        [make_meeting(*[f"https://a.com/{i}" for i in range(3)])],
+        method="POST",
+    )
+    assert crawler.stats.get_value("wayback/queued") == 1
+    assert crawler.stats.get_value("wayback/dropped") == 2
+    middleware.spider_closed(spider)
+    assert crawler.stats.get_value("wayback/dropped") == 3
+    assert archive_server.submitted == []
+
+
+def test_circuit():
+    circuit = HostCircuit(failures=2, cooldown=10, max_cooldown=15)
+    assert not circuit.failure(0)
+    assert circuit.failure(1)
+    assert not circuit.allow(5)
+    # one probe after the cooldown, others still fail fast
+    assert circuit.allow(11)
+    assert not circuit.allow(12)
+    assert circuit.failure(12)
+    assert circuit.open_until == 27
+    assert circuit.allow(27)
+    circuit.success()
+    assert circuit.allow(28)
+    assert circuit.cooldown == 10
+
+
+def get_throttle(**settings):
+    crawler = get_crawler(
+        Spider,
+        {
+            "CITY_SCRAPERS_HOST_THROTTLE": True,
+            "CITY_SCRAPERS_HOST_MAX_CONCURRENCY": 4,
+            "CITY_SCRAPERS_HOST_TARGET_LATENCY": 1.0,
+            "CITY_SCRAPERS_CIRCUIT_FAILURES": 3,
+            "CITY_SCRAPERS_HOST_PROFILES": {"slow.example.com": {"max_concurrency": 1}},
+            **settings,
+        },
+    )
+    spider = crawler._create_spider("test")
+    middleware = HostThrottleMiddleware.from_crawler(crawler)
+    slots = {
+        "go.boarddocs.com": Slot(2, 0, False),
+        "slow.example.com": Slot(1, 0, False),
+    }
+    crawler.engine = SimpleNamespace(downloader=SimpleNamespace(slots=slots))
+    return middleware, spider, slots, crawler.stats
+
+
+def throttle_fetch(middleware, spider, url=URL, status=200, latency=0.1):
+    request = Request(url)
+    middleware.process_request(request, spider)
+    request.meta["download_slot"] = request.url.split("/")[2]
+    request.meta["download_latency"] = latency
+    response = TextResponse(url, status=status, body=BODY, request=request)
+    return middleware.process_response(request, response, spider)
+
+
+def test_host_throttle_disabled():
+    with pytest.raises(NotConfigured):
+        get_throttle(CITY_SCRAPERS_HOST_THROTTLE=False)
+
+
+def test_host_throttle_adapts():
+    middleware, spider, slots, stats = get_throttle()
+    slot = slots["go.boarddocs.com"]
+    # a round of fast responses adds one concurrent request, up to the maximum
+    for _ in range(10):
+        throttle_fetch(middleware, spider)
+    assert slot.concurrency == 4
+    throttle_fetch(middleware, spider, latency=3.0)
+    assert slot.concurrency == 3
+    throttle_fetch(middleware, spider, status=503)
+    assert slot.concurrency == 1
+    assert slot.delay == 0.5
+    # hosts keep their own profile
+    for _ in range(5):
+        throttle_fetch(middleware, spider, url="https://slow.example.com/")
+    assert slots["slow.example.com"].concurrency == 1
+
+    middleware.spider_closed(spider)
+    assert stats.get_value("hosts/go.boarddocs.com/responses") == 11
+    assert stats.get_value("hosts/go.boarddocs.com/errors") == 1
+    assert stats.get_value("hosts/go.boarddocs.com/peak_concurrency") == 4
+    assert stats.get_value("hosts/go.boarddocs.com/latency_p50_ms") <= 131.072
+    assert stats.get_value("hosts/go.boarddocs.com/latency_p99_ms") == 3000
+
+
+def test_host_throttle_fails_fast():
+    middleware, spider, slots, stats = get_throttle()
+    queued = Deferred()
+    failures = []
+    queued.addErrback(failures.append)
+    slots["go.boarddocs.com"].queue.append((Request(URL), queued))
+    for _ in range(2):
+        throttle_fetch(middleware, spider, status=500)
+    middleware.process_exception(Request(URL), TimeoutError(), spider)
+    assert stats.get_value("hosts/go.boarddocs.com/circuit_opened") == 1
+    # requests already waiting in the slot are ignored too
+    assert failures[0].check(IgnoreRequest)
+    assert not slots["go.boarddocs.com"].queue
+    with pytest.raises(IgnoreRequest):
+        middleware.process_request(Request(URL), spider)
+    assert stats.get_value("hosts/go.boarddocs.com/failed_fast") == 2
+    # other hosts are unaffected
+    assert throttle_fetch(middleware, spider, url="https://slow.example.com/")
@@ -0,0 +1,135 @@
+import base64
+
+import pytest
+from scrapy import FormRequest, Request, Spider
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.http import HtmlResponse, TextResponse
+from scrapy.utils.test import get_crawler
+
+from city_scrapers.replay import (
+    ArchiveReader,
+    RecordMiddleware,
+    ReplayDownloadHandler,
+    archive_path,
+)
+
+URL = "https://go.boarddocs.com/oh/csc/Board.nsf/BD-GetMeetingsList"
+BODY = b'[{"numberdate": "20241107"}]'
+
+
+class ArchiveSpider(Spider):
+    name = "test_archive"
+
+
+def get_crawler_for(tmp_path, **settings):
+    return get_crawler(
+        ArchiveSpider, {"CITY_SCRAPERS_ARCHIVE_DIR": str(tmp_path), **settings}
+    )
+
+
+def make_request(committee_id="A9HCN931D6BA"):
+    return FormRequest(URL, formdata={"current_committee_id": committee_id})
+
+
+def record(tmp_path, pairs):
+    crawler = get_crawler_for(tmp_path, CITY_SCRAPERS_RECORD=True)
+    spider = crawler._create_spider()
+    middleware = RecordMiddleware.from_crawler(crawler)
+    middleware.spider_opened(spider)
+    for request, response in pairs:
+        assert middleware.process_response(request, response, spider) is response
+    middleware.spider_closed(spider)
+    return crawler.stats
+
+
+def get_handler(tmp_path):
+    crawler = get_crawler_for(tmp_path)
+    return ReplayDownloadHandler.from_crawler(crawler), crawler
+
+
+def test_record_disabled(tmp_path):
+    with pytest.raises(NotConfigured):
+        RecordMiddleware.from_crawler(get_crawler_for(tmp_path))
+
+
+def test_replay_without_archive(tmp_path):
+    with pytest.raises(NotConfigured):
+        get_handler(tmp_path)
+
+
+def test_record_and_replay(tmp_path):
+    page = Request("https://example.com/page")
+    stats = record(
+        tmp_path,
+        [
+            (
+                make_request(),
+                TextResponse(
+                    URL,
+                    body=BODY,
+                    headers={"Content-Type": "application/json"},
+                    flags=["cached", "unchanged"],
+                    request=make_request(),
+                ),
+            ),
+            (
+                make_request("OTHER"),
+                TextResponse(URL, body=b"[]", request=make_request("OTHER")),
+            ),
+            (
+                page,
+                HtmlResponse(
+                    page.url,
+                    status=404,
+                    body=b"<html></html>",
+                    headers={"Content-Type": "text/html", "Set-Cookie": ["a", "b"]},
+                    request=page,
+                ),
+            ),
+        ],
+    )
+    assert stats.get_value("record/responses") == 3
+    assert stats.get_value("record/bytes") == len(BODY) + 2 + 13
+
+    handler, crawler = get_handler(tmp_path)
+    spider = crawler._create_spider()
+    assert len(handler.archive) == 3
+
+    request = make_request()
+    response = handler.download_request(request, spider)
+    assert isinstance(response, TextResponse)
+    assert response.body == BODY
+    assert response.request is request
+    assert response.flags == ["replayed"]
+
+    # the request is kept with its headers and body
+    header, _ = handler.archive.get(
+        crawler.request_fingerprinter.fingerprint(request).hex()
+    )
+    assert header["request"]["method"] == "POST"
+    assert "Content-Type: application/x-www-form-urlencoded" in (
+        header["request"]["headers"]
+    )
+    assert base64.b64decode(header["request"]["body"]) == request.body
+
+    assert handler.download_request(make_request("OTHER"), spider).body == b"[]"
+
+    response = handler.download_request(Request("https://example.com/page"), spider)
+    assert isinstance(response, HtmlResponse)
+    assert response.status == 404
+    assert response.headers.getlist("Set-Cookie") == [b"a", b"b"]
+
+    with pytest.raises(IgnoreRequest):
+        handler.download_request(Request(URL), spider)
+    assert crawler.stats.get_value("replay/hit") == 3
+    assert crawler.stats.get_value("replay/missing") == 1
+    handler.close()
+
+
+def test_incomplete_archive(tmp_path):
+    crawler = get_crawler_for(tmp_path)
+    path = archive_path(crawler.settings, ArchiveSpider.name, create=True)
+    with open(path, "wb") as f:
+        f.write(b"CSARCHV1truncated")
+    with pytest.raises(ValueError):
+        ArchiveReader(path)
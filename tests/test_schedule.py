@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from city_scrapers_core.constants import CANCELLED, PASSED, TENTATIVE
+from city_scrapers_core.items import Meeting
+from scrapy import Spider
+from scrapy.utils.test import get_crawler
+
+from city_scrapers.middleware import ContentHashMiddleware
+from city_scrapers.schedule import (
+    CHANGED,
+    INTERVAL,
+    NEW,
+    SKIPPED,
+    STALE,
+    SpiderPlan,
+    assign_lanes,
+    format_plan,
+    plan_spider,
+)
+from city_scrapers.store import CrawlHistory
+
+NOW = datetime(2024, 11, 20, 6, 1)
+MAX_STALENESS = timedelta(days=3)
+
+
+def daily_runs(changes, days=10):
+    """Runs at 6:01 each day up to yesterday, changed on the given days ago"""
+    return [
+        (NOW - timedelta(days=days_ago), 30.0, days_ago in changes)
+        for days_ago in range(days, 0, -1)
+    ]
+
+
+def plan(runs):
+    return plan_spider("spider", runs, NOW, MAX_STALENESS, 3)
+
+
+def test_new_spider():
+    assert plan([]).reason == NEW
+    assert plan(daily_runs(set(), days=2)).due
+
+
+def test_changed_last_run():
+    result = plan(daily_runs({1}))
+    assert (result.due, result.reason) == (True, CHANGED)
+
+
+def test_stable_source_waits_for_max_staleness():
+    runs = daily_runs(set(), days=30)[::3]
+    assert runs[-1][0] == NOW - timedelta(days=3)
+    result = plan(runs)
+    assert (result.due, result.reason, result.interval) == (True, STALE, None)
+    # last ran two days ago
+    result = plan(runs[:-1] + [(NOW - timedelta(days=2), 30.0, False)])
+    assert (result.due, result.reason) == (False, SKIPPED)
+
+
+def test_change_interval():
+    # changed every other day, last checked yesterday
+    result = plan(daily_runs({9, 7, 5, 3}))
+    assert result.interval == timedelta(days=9) / 4
+    assert (result.due, result.reason) == (False, SKIPPED)
+    # later the next day the interval has passed
+    result = plan_spider(
+        "spider",
+        daily_runs({9, 7, 5, 3}),
+        NOW + timedelta(days=1, hours=6),
+        MAX_STALENESS,
+        3,
+    )
+    assert (result.due, result.reason) == (True, INTERVAL)
+
+
+def test_assign_lanes_longest_first():
+    plans = [
+        SpiderPlan(name, True, NEW, None, None, duration)
+        for name, duration in [("a", 10.0), ("b", 60.0), ("c", 30.0), ("d", None)]
+    ]
+    assert assign_lanes(plans, 0) == [["d"], ["b"], ["c"], ["a"]]
+    # "d" hasn't run, so it's assumed to take as long as "b"
+    assert assign_lanes(plans, 2) == [["d", "c"], ["b", "a"]]
+    assert assign_lanes(plans, 10) == [["d"], ["b"], ["c"], ["a"]]
+
+
+def test_format_plan():
+    lines = format_plan(
+        [
+            SpiderPlan("a", True, INTERVAL, timedelta(days=2.5), NOW, 12.34),
+            SpiderPlan("b", False, SKIPPED, None, None, None),
+        ]
+    ).split("\n")
+    assert lines[1].split() == [
+        "a",
+        "run",
+        INTERVAL,
+        "2.5d",
+        "2024-11-20",
+        "06:01",
+        "12.3",
+    ]
+    assert lines[2].split() == ["b", "skip", SKIPPED, "-", "-", "-"]
+
+
+def test_crawl_history(tmp_path):
+    history = CrawlHistory(str(tmp_path / "schedule.db"))
+    assert history.last("spider") is None
+    assert history.record("spider", NOW - timedelta(days=2), 5.0, "a", 10)
+    assert not history.record("spider", NOW - timedelta(days=1), 6.0, "a", 10)
+    assert history.record("spider", NOW, 7.0, "b", 11)
+    assert history.last("spider") == (NOW, 7.0, True)
+    assert history.runs("spider", NOW - timedelta(days=1)) == [
+        (NOW - timedelta(days=1), 6.0, False),
+        (NOW, 7.0, True),
+    ]
+    history.close()
+
+
+def test_content_hash():
+    crawler = get_crawler(Spider, {"CITY_SCRAPERS_CONTENT_HASH": True})
+    spider = crawler._create_spider("test")
+    middleware = ContentHashMiddleware.from_crawler(crawler)
+
+    def run_hash(statuses):
+        middleware.hashes = []
+        items = [
+            Meeting(title=f"Meeting {index}", status=status)
+            for index, status in enumerate(statuses)
+        ]
+        response = SimpleNamespace()
+        assert list(middleware.process_spider_output(response, items, spider)) == items
+        middleware.spider_closed(spider)
+        return crawler.stats.get_value("content/hash")
+
+    first = run_hash([TENTATIVE, TENTATIVE])
+    assert crawler.stats.get_value("content/meetings") == 2
+    # a meeting passing isn't a change in the source, but a cancellation is
+    assert run_hash([PASSED, TENTATIVE]) == first
+    assert run_hash([TENTATIVE, CANCELLED]) != first
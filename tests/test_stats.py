@@ -0,0 +1,13 @@
+from city_scrapers.stats import Histogram
+
+
+def test_histogram():
+    histogram = Histogram()
+    for ms in [1] * 90 + [100] * 10:
+        histogram.add(ms / 1000)
+    report = histogram.to_dict()
+    assert report["count"] == 100
+    assert report["p50_ms"] == 1.024
+    assert report["p95_ms"] == 100
+    assert report["max_ms"] == 100
+    assert sum(report["buckets_us"].values()) == 100
@@ -0,0 +1,105 @@
+from datetime import datetime
+
+import pytest
+from city_scrapers_core.constants import CANCELLED, PASSED, TENTATIVE
+from city_scrapers_core.items import Meeting
+from city_scrapers_core.spiders import CityScrapersSpider
+from freezegun import freeze_time
+from scrapy import Request, Spider
+from scrapy.http import TextResponse
+from scrapy.utils.test import get_crawler
+
+from city_scrapers.items import CompactMeeting
+from city_scrapers.middleware import MeetingStatusMiddleware
+from city_scrapers.status import meeting_id, meeting_status, title_slug
+
+spider = CityScrapersSpider(name="test")
+
+
+def make_meeting(title="Budget Committee", start=datetime(2024, 11, 6, 13), **values):
+    values.setdefault("description", "")
+    return CompactMeeting(
+        title=title,
+        start=start,
+        location={"name": "Council Chambers, Room 300", "address": "801 Plum St"},
+        **values,
+    )
+
+
+@pytest.mark.parametrize(
+    "title",
+    [
+        "Budget Committee",
+        "CANCELLED: Budget & Finance Committee",
+        "Budget Committee - Rescheduled",
+        "Law and Public Safety | Special Session",
+        "Meeting #4 (Re: 2025 ^ Plans)",
+        "   ",
+    ],
+)
+def test_same_ids_as_spider(title):
+    meeting = make_meeting(title)
+    assert meeting_id("test", meeting) == spider._get_id(meeting)
+    assert meeting_id("test", meeting, "1/2") == spider._get_id(meeting, "1/2")
+
+
+def test_title_slug_cached():
+    title_slug.cache_clear()
+    title_slug("Budget Committee")
+    title_slug("Budget Committee")
+    assert title_slug.cache_info().hits == 1
+
+
+def test_status():
+    now = datetime(2024, 11, 6, 12)
+    assert meeting_status(make_meeting(), now) == TENTATIVE
+    assert meeting_status(make_meeting(), datetime(2024, 11, 6, 14)) == PASSED
+    assert meeting_status(make_meeting("Postponed: Budget"), now) == CANCELLED
+    assert meeting_status(make_meeting(description="Cancelled"), now) == CANCELLED
+    cancelled = make_meeting()
+    cancelled["location"] = {
+        "name": "Council Chambers, Room 300 NOTICE OF CANCELLATION",
+        "address": "801 Plum St",
+    }
+    assert meeting_status(cancelled, now) == CANCELLED
+
+
+def test_middleware():
+    middleware = MeetingStatusMiddleware()
+    response = TextResponse("https://example.com", request=Request("https://a.com"))
+    items = [
+        make_meeting(start=datetime(2024, 11, 6, 12, 30)),
+        make_meeting("Finance Committee", start=datetime(2024, 11, 6, 12, 30)),
+        Meeting(make_meeting(status=CANCELLED, id="test/custom")),
+        {"_id": "ocd-event/1"},
+        Request("https://example.com/next"),
+    ]
+    with freeze_time("2024-11-06 12:00") as frozen:
+        output = middleware.process_spider_output(response, iter(items), spider)
+        first = next(output)
+        # the whole batch is compared against the time it started
+        frozen.move_to("2024-11-06 13:00")
+        rest = list(output)
+    assert first["status"] == TENTATIVE
+    assert first["id"] == "test/202411061230/x/budget_committee"
+    assert rest[0]["status"] == TENTATIVE
+    assert rest[1]["status"] == CANCELLED
+    assert rest[1]["id"] == "test/custom"
+    assert rest[2:] == items[3:]
+
+
+def test_middleware_core_diff_pipeline():
+    crawler = get_crawler(Spider)
+    assert not MeetingStatusMiddleware.from_crawler(crawler).to_meeting
+
+    crawler = get_crawler(
+        Spider,
+        {"ITEM_PIPELINES": {"city_scrapers_core.pipelines.AzureDiffPipeline": 200}},
+    )
+    middleware = MeetingStatusMiddleware.from_crawler(crawler)
+    response = TextResponse("https://example.com", request=Request("https://a.com"))
+    item = CompactMeeting(title="Budget", start=datetime(2024, 11, 6, 12, 30))
+    with freeze_time("2024-11-06 12:00"):
+        (output,) = middleware.process_spider_output(response, iter([item]), spider)
+    assert isinstance(output, Meeting)
+    assert output["id"] == "test/202411061230/x/budget"
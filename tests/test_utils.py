@@ -0,0 +1,26 @@
+import json
+
+import pytest
+
+from city_scrapers.utils import iter_json_array
+
+
+def test_iter_json_array():
+    text = ' [ {"a": [1, 2]}, "b" ,3,null ]\n'
+    assert list(iter_json_array(text)) == json.loads(text)
+
+
+def test_iter_json_array_empty():
+    assert list(iter_json_array("[ ]")) == []
+
+
+def test_iter_json_array_lazy():
+    values = iter_json_array('[{"numberdate": "20241107"}, not json')
+    assert next(values) == {"numberdate": "20241107"}
+    with pytest.raises(json.JSONDecodeError):
+        next(values)
+
+
+def test_iter_json_array_not_array():
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_array('{"a": 1}'))